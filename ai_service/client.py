@@ -0,0 +1,241 @@
+"""
+Client side of the inference daemon (ai_service.daemon).
+
+``classify(image)`` is what the web tier and Celery tasks call. With
+AI_INFERENCE_DAEMON on, it sends the image path (or bytes) to the daemon
+and never imports TensorFlow. Each thread keeps one open connection and
+reuses it. If the daemon cannot be reached or does not answer within
+AI_DAEMON_TIMEOUT, ``classify`` raises InferenceUnavailable: the report is
+left unanalysed and retried, rather than stored with a severity no model
+produced. A request the daemon rejects gets the fallback severity with
+``model_version`` None, as when no model is loaded.
+
+``classify_batch(images)`` sends many images in one request, so the daemon
+runs them through the models together.
+
+With AI_INFERENCE_DAEMON off (local development), it runs the classifier
+in this process instead.
+"""
+
+import logging
+import os
+import socket
+import threading
+
+from django.conf import settings
+
+from ai_service.protocol import (
+    BATCH_COUNT,
+    BATCH_ITEM,
+    FLAG_IMAGE_BYTES,
+    MAX_PAYLOAD_BYTES,
+    ProtocolError,
+    encode_batch_item,
+    encode_batch_request,
+    encode_request,
+    read_batch_response,
+    read_response,
+)
+from asphalt_aid.metrics import INFERENCE_FALLBACKS, INFERENCE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_SEVERITY = 1
+
+
+class InferenceUnavailable(Exception):
+    """The inference daemon could not be reached or did not answer in time"""
+
+
+def fallback_result():
+    return {
+        "severity": FALLBACK_SEVERITY,
+        "model_version": None,
+        "predicted_class": None,
+        "confidence": None,
+    }
+
+
+class InferenceClient:
+    def __init__(self, socket_path, connect_timeout, timeout):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(self.timeout)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def close(self):
+        sock = getattr(self.local, "sock", None)
+        self.local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def exchange(self, message, read):
+        if getattr(self.local, "sock", None) is None:
+            self.local.sock = self.connect()
+        try:
+            self.local.sock.sendall(message)
+            return read(self.local.sock)
+        except ProtocolError:
+            # The daemon answered; the connection is still in sync
+            raise
+        except BaseException:
+            self.close()
+            raise
+
+    def request(self, message, read=read_response):
+        reused = getattr(self.local, "sock", None) is not None
+        try:
+            return self.exchange(message, read)
+        except socket.timeout:
+            raise
+        except (EOFError, ConnectionError):
+            # A kept-alive connection may have been closed by a daemon
+            # restart; that is worth one attempt on a fresh one
+            if not reused:
+                raise
+            return self.exchange(message, read)
+
+    def classify(self, image):
+        """Classify an image path or the image's bytes"""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            message = encode_request(bytes(image), FLAG_IMAGE_BYTES)
+        else:
+            message = encode_request(os.fspath(image).encode("utf-8"))
+        with INFERENCE_LATENCY.labels(stage="daemon_request").time():
+            return self.request(message)
+
+    def classify_batch(self, images):
+        """Results for many images' bytes, in order; ProtocolError for rejected ones
+
+        Images are split across requests so each payload stays within
+        MAX_PAYLOAD_BYTES; an image too large on its own is rejected here.
+        """
+        results = [None] * len(images)
+        for positions, items in batch_requests(images):
+            if not items:
+                for position in positions:
+                    results[position] = ProtocolError("Image is too large")
+                continue
+            message = encode_batch_request(items)
+            with INFERENCE_LATENCY.labels(stage="daemon_request").time():
+                answers = self.request(
+                    message, lambda sock: read_batch_response(sock, len(items))
+                )
+            for position, answer in zip(positions, answers):
+                results[position] = answer
+        return results
+
+
+def batch_requests(images):
+    """``(positions, items)`` per request; oversized images come alone with no items"""
+    positions, items, size = [], [], BATCH_COUNT.size
+    for position, image in enumerate(images):
+        item_size = BATCH_ITEM.size + len(image)
+        if BATCH_COUNT.size + item_size > MAX_PAYLOAD_BYTES:
+            yield [position], []
+            continue
+        if items and size + item_size > MAX_PAYLOAD_BYTES:
+            yield positions, items
+            positions, items, size = [], [], BATCH_COUNT.size
+        positions.append(position)
+        items.append(encode_batch_item(bytes(image), FLAG_IMAGE_BYTES))
+        size += item_size
+    if items:
+        yield positions, items
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceClient(
+                    settings.AI_DAEMON_SOCKET,
+                    settings.AI_DAEMON_CONNECT_TIMEOUT,
+                    settings.AI_DAEMON_TIMEOUT,
+                )
+    return _client
+
+
+def classify(image):
+    """Severity, model version, class and confidence for an image path or bytes"""
+    if not settings.AI_INFERENCE_DAEMON:
+        from ai_service import pothole_classifier
+
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            import io
+
+            image = io.BytesIO(image)
+        return pothole_classifier.classify(image)
+
+    try:
+        return get_client().classify(image)
+    except socket.timeout as e:
+        INFERENCE_FALLBACKS.labels(reason="timeout").inc()
+        logger.error(f"✗ Inference daemon timed out after {settings.AI_DAEMON_TIMEOUT}s")
+        raise InferenceUnavailable(
+            f"no answer within {settings.AI_DAEMON_TIMEOUT}s"
+        ) from e
+    except ProtocolError as e:
+        INFERENCE_FALLBACKS.labels(reason="error").inc()
+        logger.error(f"✗ Inference daemon rejected the request: {str(e)}")
+        return fallback_result()
+    except (EOFError, OSError) as e:
+        INFERENCE_FALLBACKS.labels(reason="unavailable").inc()
+        logger.error(f"✗ Inference daemon unavailable: {str(e)}")
+        raise InferenceUnavailable(str(e)) from e
+
+
+def classify_batch(images):
+    """``classify`` for many images' bytes, with one round trip to the daemon"""
+    if not settings.AI_INFERENCE_DAEMON:
+        import io
+
+        from ai_service import pothole_classifier
+
+        return pothole_classifier.classify_images([io.BytesIO(image) for image in images])
+
+    try:
+        answers = get_client().classify_batch(images)
+    except socket.timeout as e:
+        INFERENCE_FALLBACKS.labels(reason="timeout").inc()
+        logger.error(f"✗ Inference daemon timed out after {settings.AI_DAEMON_TIMEOUT}s")
+        raise InferenceUnavailable(
+            f"no answer within {settings.AI_DAEMON_TIMEOUT}s"
+        ) from e
+    except (EOFError, OSError) as e:
+        INFERENCE_FALLBACKS.labels(reason="unavailable").inc()
+        logger.error(f"✗ Inference daemon unavailable: {str(e)}")
+        raise InferenceUnavailable(str(e)) from e
+
+    results = []
+    for answer in answers:
+        if isinstance(answer, ProtocolError):
+            INFERENCE_FALLBACKS.labels(reason="error").inc()
+            logger.error(f"✗ Inference daemon rejected an image: {str(answer)}")
+            answer = fallback_result()
+        results.append(answer)
+    return results
+
+
+def predict_severity(image):
+    """Predict pothole severity from image (0-3 scale)"""
+    try:
+        return classify(image)["severity"]
+    except InferenceUnavailable:
+        return FALLBACK_SEVERITY
@@ -0,0 +1,161 @@
+"""
+Inference daemon: the only process that loads TensorFlow and the model.
+
+    python -m ai_service.daemon [--socket PATH]
+
+Web workers and Celery tasks send it images through ai_service.client over
+a UNIX domain socket (wire format in ai_service.protocol). Each client
+connection gets a thread and is kept open across requests; at most
+AI_DAEMON_CONCURRENCY predictions run at once. A batch request is one
+prediction: its images go through the models together. The model registry hot
+reload works here as in any other process.
+
+Paths are only served from inside MEDIA_ROOT; anything else must be sent
+as image bytes.
+"""
+
+import argparse
+import io
+import logging
+import os
+import signal
+import socketserver
+import threading
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "asphalt_aid.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from ai_service import pothole_classifier  # noqa: E402
+from ai_service.protocol import (  # noqa: E402
+    FLAG_BATCH,
+    FLAG_IMAGE_BYTES,
+    ProtocolError,
+    decode_batch,
+    encode_error,
+    encode_response,
+    read_request,
+)
+from ai_service.registry import registry  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+inference_slots = threading.BoundedSemaphore(settings.AI_DAEMON_CONCURRENCY)
+
+
+def resolve_image(flags, payload):
+    """Turn a request payload into something classify() can open"""
+    if flags & FLAG_IMAGE_BYTES:
+        image = io.BytesIO(payload)
+        image.name = f"{len(payload)}-bytes"
+        return image
+
+    path = os.path.realpath(payload.decode("utf-8"))
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    if os.path.commonpath([path, media_root]) != media_root:
+        raise ProtocolError("Image path is outside MEDIA_ROOT")
+    return path
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                flags, payload = read_request(self.request)
+            except EOFError:
+                return
+            except ProtocolError as e:
+                # The stream position is unknown after a bad header
+                self.request.sendall(encode_error(str(e)))
+                return
+
+            if flags & FLAG_BATCH:
+                try:
+                    items = decode_batch(payload)
+                except ProtocolError as e:
+                    self.request.sendall(encode_error(str(e)))
+                    return
+                self.request.sendall(classify_items(items))
+                continue
+
+            try:
+                image = resolve_image(flags, payload)
+            except (ProtocolError, UnicodeDecodeError) as e:
+                self.request.sendall(encode_error(str(e)))
+                continue
+
+            with inference_slots:
+                result = pothole_classifier.classify(image)
+            self.request.sendall(encode_response(result))
+
+
+def classify_items(items):
+    """Responses to a batch, one per ``(flags, payload)`` item, in order"""
+    responses = [None] * len(items)
+    images = []
+    positions = []
+    for position, (flags, payload) in enumerate(items):
+        try:
+            images.append(resolve_image(flags, payload))
+            positions.append(position)
+        except (ProtocolError, UnicodeDecodeError) as e:
+            responses[position] = encode_error(str(e))
+
+    if images:
+        with inference_slots:
+            results = pothole_classifier.classify_images(images)
+        for position, result in zip(positions, results):
+            responses[position] = encode_response(result)
+    return b"".join(responses)
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path):
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        # Left behind by a previous run; binding would fail otherwise
+        os.remove(socket_path)
+
+    # Load (and warm) the model before accepting connections
+    registry.current()
+
+    server = InferenceServer(socket_path, InferenceHandler)
+    os.chmod(socket_path, 0o660)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever(), so call it from another thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    version = registry.active.version if registry.active else None
+    logger.info(f"✓ Inference daemon listening on {socket_path} (model version: {version})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info("Inference daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--socket",
+        default=settings.AI_DAEMON_SOCKET,
+        help="UNIX socket path (default: settings.AI_DAEMON_SOCKET)",
+    )
+    args = parser.parse_args()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
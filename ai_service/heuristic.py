@@ -0,0 +1,56 @@
+"""
+Built-in first stage for the model cascade, selected with
+``manage.py model_registry stage1 heuristic``.
+
+It needs no model file and no TensorFlow: a few colour and edge statistics
+of a 64x64 copy of the image tell plainly intact asphalt (even grey, no
+dark patches, few sharp edges) from everything else. Only that case gets a
+confident "normal road" answer; any sign of damage spreads the probability
+over the damage classes, so the image always escalates to the full model.
+
+The limits below are where its confidence drops to one half. Check them
+against labeled images with ``manage.py evaluate_cascade --stage1 heuristic``.
+"""
+
+import numpy as np
+
+from ai_service.registry import DEFAULT_SEVERITY_MAPPING, HEURISTIC_VERSION, LoadedModel
+
+INPUT_SHAPE = (1, 64, 64, 3)
+
+# Pixels darker than the image median by more than this look like holes,
+# cracks or water
+DARK_MARGIN = 0.15
+# Neighbouring pixels further apart than this are an edge
+EDGE_STEP = 0.08
+DARK_LIMIT = 0.01
+EDGE_LIMIT = 0.02
+# Mean spread between colour channels; asphalt is grey
+CHROMA_LIMIT = 0.25
+
+
+def road_statistics(batch):
+    """(dark fraction, edge fraction, chroma) per image of a [0, 1] RGB batch"""
+    grey = batch.mean(axis=3)
+    median = np.median(grey, axis=(1, 2), keepdims=True)
+    dark = (grey < median - DARK_MARGIN).mean(axis=(1, 2))
+    across = np.abs(np.diff(grey, axis=2))[:, :-1, :]
+    down = np.abs(np.diff(grey, axis=1))[:, :, :-1]
+    edges = (np.hypot(across, down) > EDGE_STEP).mean(axis=(1, 2))
+    chroma = (batch.max(axis=3) - batch.min(axis=3)).mean(axis=(1, 2))
+    return dark, edges, chroma
+
+
+class HeuristicStage1(LoadedModel):
+    def __init__(self):
+        super().__init__(HEURISTIC_VERSION, None, DEFAULT_SEVERITY_MAPPING, INPUT_SHAPE)
+
+    def predict(self, batch):
+        """Class probabilities: confident only for intact road (class 0)"""
+        dark, edges, chroma = road_statistics(np.asarray(batch, dtype="float32"))
+        anomaly = np.maximum.reduce(
+            [dark / DARK_LIMIT, edges / EDGE_LIMIT, chroma / CHROMA_LIMIT]
+        )
+        normal = 1 / (1 + anomaly**2)
+        damaged = (1 - normal) / 2
+        return np.stack([normal, damaged, damaged], axis=1)
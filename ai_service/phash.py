@@ -0,0 +1,51 @@
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+
+def dct_matrix(size):
+    """Orthonormal DCT-II basis, so that ``M @ x`` is the DCT of ``x``"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+DCT = dct_matrix(SAMPLE_SIZE)
+
+
+def perceptual_hash(image_file):
+    """64-bit DCT perceptual hash of an image (path or file object)
+
+    Small changes in angle, scale, exposure or compression flip only a few
+    bits, so near-identical photos are a small Hamming distance apart.
+    """
+    with Image.open(image_file) as image:
+        image.draft("L", (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))
+        pixels = np.asarray(
+            image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS),
+            dtype=np.float64,
+        )
+
+    frequencies = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # The DC term is overall brightness; leave it out of the threshold
+    bits = (frequencies > np.median(frequencies.flatten()[1:])).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def to_signed(value):
+    """Unsigned 64-bit hash -> value that fits a signed BIGINT column"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value & ((1 << 64) - 1)
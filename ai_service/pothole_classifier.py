@@ -1,116 +1,289 @@
 import os
+import random
+import threading
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
 
+from ai_service.registry import registry
+from asphalt_aid.metrics import (
+    CASCADE_DECISIONS,
+    INFERENCE_LATENCY,
+    SHADOW_PREDICTIONS,
+)
+
 logger = logging.getLogger(__name__)
 
-model = None
+DEFAULT_SEVERITY = 1
+
+# Shadow comparisons run off the request path, one at a time; samples that
+# arrive while one is running are skipped rather than queued.
+shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+shadow_slot = threading.Semaphore(1)
 
 
 def load_model():
-    """Load the TensorFlow model once globally"""
-    global model
-    try:
-        logger.info("Attempting to load TensorFlow model...")
-        import tensorflow as tf
+    """Load the active model version (see ai_service.registry)"""
+    return registry.current()
 
-        model_path = os.path.join(
-            settings.BASE_DIR, "Pothole Classification", "pothole_model.h5"
-        )
-        logger.info(f"Model path: {model_path}")
 
-        if os.path.exists(model_path):
-            model = tf.keras.models.load_model(model_path)
-            logger.info(
-                f"✓ Pothole classification model loaded successfully from {model_path}"
-            )
-        else:
-            logger.error(f"✗ Model file not found at {model_path}")
+def load_image(image_path):
+    """Decode an image once, for every model input size it is needed at"""
+    try:
+        logger.debug("Preprocessing image: %s", image_path)
+        from PIL import Image
+
+        with Image.open(image_path) as img:
+            return img.convert("RGB")
 
-    except ImportError:
-        logger.error("✗ TensorFlow not installed. Please install tensorflow.")
     except Exception as e:
-        logger.error(f"✗ Error loading model: {str(e)}")
+        logger.error(f"✗ Error preprocessing image: {str(e)}")
+        return None
 
 
-def preprocess_image(image_path):
-    """Preprocess image for model prediction"""
-    try:
-        logger.info(f"Preprocessing image: {image_path}")
-        import numpy as np
-        from PIL import Image
+def to_batch(img, size=(224, 224)):
+    """Resize and normalize a decoded image into a batch of one"""
+    import numpy as np
 
-        # Load and preprocess image to match training data
-        img = Image.open(image_path)
-        img = img.convert("RGB")
-        img = img.resize((224, 224))  # Match training size
-        logger.info(f"Image resized to 224x224")
+    # Match training size
+    img_array = np.array(img.resize(size))
+    img_array = np.expand_dims(img_array, axis=0)
+    img_array = img_array.astype("float32") / 255.0
+    logger.debug("Image preprocessed successfully. Shape: %s", img_array.shape)
+    return img_array
 
-        # Convert to numpy array and normalize
-        img_array = np.array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array = img_array.astype("float32") / 255.0
-        logger.info(f"Image preprocessed successfully. Shape: {img_array.shape}")
 
-        return img_array
+def preprocess_image(image_path, size=(224, 224)):
+    """Preprocess image for model prediction"""
+    img = load_image(image_path)
+    return None if img is None else to_batch(img, size)
 
-    except Exception as e:
-        logger.error(f"✗ Error preprocessing image: {str(e)}")
-        return None
 
+def default_result():
+    return {
+        "severity": DEFAULT_SEVERITY,
+        "model_version": None,
+        "predicted_class": None,
+        "confidence": None,
+    }
 
-def predict_severity(image_path):
-    """Predict pothole severity from image (0-3 scale)"""
-    global model
 
-    logger.info(f"=== AI PREDICTION START ===")
-    logger.info(f"Predicting severity for image: {image_path}")
-    logger.info(f"Model loaded: {model is not None}")
+def classify(image_path):
+    """Classify an image; returns severity (0-3), model version, class and confidence
 
-    if model is None:
-        logger.warning("Model not loaded. Loading now...")
-        load_model()
+    With a STAGE1 model in the registry, it runs first on a downscaled copy
+    and answers alone when its confidence reaches AI_CASCADE_THRESHOLD; only
+    uncertain images reach the full model. Falls back to the default
+    severity with ``model_version`` None when no model is available or the
+    image cannot be processed.
+    """
+    started = time.perf_counter()
+    logger.debug("Predicting severity for image: %s", image_path)
 
-    if model is None:
+    # Hold on to these versions for the whole prediction, even if new ones
+    # are swapped in meanwhile
+    loaded = registry.current()
+    stage1 = registry.stage1
+    if loaded is None:
         logger.error("Model still not available. Returning default severity.")
-        return 1
+        return default_result()
 
     try:
-        processed_image = preprocess_image(image_path)
-        if processed_image is None:
+        with INFERENCE_LATENCY.labels(stage="preprocess").time():
+            image = load_image(image_path)
+        if image is None:
             logger.error("Image preprocessing failed")
-            return 1
+            return default_result()
+
+        if stage1 is not None:
+            with INFERENCE_LATENCY.labels(stage="stage1_predict").time():
+                predictions = stage1.predict(to_batch(image, stage1.input_size))
+            early_exit = cascade_exit(predictions, settings.AI_CASCADE_THRESHOLD)
+            CASCADE_DECISIONS.labels(
+                stage1=stage1.version, outcome="exit" if early_exit else "escalate"
+            ).inc()
+            if early_exit:
+                return prediction_result(stage1, predictions, image_path, started)
+
+        with INFERENCE_LATENCY.labels(stage="predict").time():
+            predictions = loaded.predict(to_batch(image, loaded.input_size))
+        result = prediction_result(loaded, predictions, image_path, started)
+
+        shadow = registry.shadow
+        if shadow is not None and random.random() < settings.AI_SHADOW_SAMPLE_RATE:
+            submit_shadow(shadow, loaded, image, result["predicted_class"], image_path)
+
+        return result
+
+    except Exception as e:
+        logger.error(f"✗ Error during prediction: {str(e)}")
+        logger.exception("Full exception details:")
+        return default_result()
 
-        logger.info("Running model prediction...")
-        import numpy as np
 
-        predictions = model.predict(processed_image, verbose=0)
-        predicted_class = np.argmax(predictions)
-        confidence = np.max(predictions)
+def batch_inputs(image, loaded, stage1=None):
+    """Inputs for ``classify_batch``: the image resized for each model"""
+    return {
+        "image": image,
+        "full": to_batch(image, loaded.input_size),
+        "stage1": None if stage1 is None else to_batch(image, stage1.input_size),
+    }
 
-        logger.info(f"Raw predictions: {predictions}")
-        logger.info(f"Predicted class: {predicted_class}")
-        logger.info(f"Confidence: {confidence:.4f}")
 
-        # Map model output to severity (0-3)
-        severity_mapping = {
-            0: 0,  # Normal road - No severity
-            1: 1,  # Minor pothole - Low severity
-            2: 3,  # Major pothole - High severity
-        }
+def classify_batch(loaded, stage1, inputs, image_names):
+    """Classify many preprocessed images with one predict call per model
 
-        severity = severity_mapping.get(predicted_class, 1)
-        logger.info(f"✓ Final mapped severity: {severity}")
-        logger.info(f"=== AI PREDICTION COMPLETED ===")
+    ``inputs`` come from ``batch_inputs`` with these same models; a None entry
+    (an image that could not be decoded) gets the default result. Otherwise
+    it behaves like ``classify``, cascade and shadow sampling included.
+    """
+    import numpy as np
 
-        return severity
+    started = time.perf_counter()
+    results = [default_result() for _ in inputs]
+    pending = [index for index, entry in enumerate(inputs) if entry is not None]
+    if not pending:
+        return results
 
+    try:
+        if stage1 is not None:
+            with INFERENCE_LATENCY.labels(stage="stage1_predict").time():
+                predictions = stage1.predict(
+                    np.concatenate([inputs[index]["stage1"] for index in pending])
+                )
+            escalate = []
+            for index, row in zip(pending, predictions):
+                early_exit = cascade_exit(row, settings.AI_CASCADE_THRESHOLD)
+                CASCADE_DECISIONS.labels(
+                    stage1=stage1.version, outcome="exit" if early_exit else "escalate"
+                ).inc()
+                if early_exit:
+                    results[index] = prediction_result(
+                        stage1, row, image_names[index], started
+                    )
+                else:
+                    escalate.append(index)
+            pending = escalate
+        if not pending:
+            return results
+
+        with INFERENCE_LATENCY.labels(stage="predict").time():
+            predictions = loaded.predict(
+                np.concatenate([inputs[index]["full"] for index in pending])
+            )
+        shadow = registry.shadow
+        for index, row in zip(pending, predictions):
+            results[index] = prediction_result(loaded, row, image_names[index], started)
+            if shadow is not None and random.random() < settings.AI_SHADOW_SAMPLE_RATE:
+                submit_shadow(
+                    shadow,
+                    loaded,
+                    inputs[index]["image"],
+                    results[index]["predicted_class"],
+                    image_names[index],
+                )
     except Exception as e:
-        logger.error(f"✗ Error during prediction: {str(e)}")
+        logger.error(f"✗ Error during batch prediction: {str(e)}")
         logger.exception("Full exception details:")
-        return 1  # Default severity on error
+    return results
+
+
+def classify_images(images):
+    """Decode and classify many image paths or files together (see ``classify_batch``)"""
+    loaded = registry.current()
+    stage1 = registry.stage1
+    if loaded is None:
+        logger.error("Model still not available. Returning default severity.")
+        return [default_result() for _ in images]
+
+    inputs = []
+    with INFERENCE_LATENCY.labels(stage="preprocess").time():
+        for image_path in images:
+            image = load_image(image_path)
+            inputs.append(None if image is None else batch_inputs(image, loaded, stage1))
+    return classify_batch(loaded, stage1, inputs, images)
+
+
+def cascade_exit(predictions, threshold):
+    """Whether a first-stage prediction is confident enough to skip the full model"""
+    return float(predictions.max()) >= threshold
+
+
+def prediction_result(loaded, predictions, image_path, started):
+    import numpy as np
+
+    predicted_class = int(np.argmax(predictions))
+    confidence = float(np.max(predictions))
+    severity = loaded.severity(predicted_class)
+
+    logger.debug("Raw predictions: %s", predictions)
+
+    # One structured line per prediction; sampled by HotPathSampler
+    logger.info(
+        "prediction image=%s version=%s class=%d confidence=%.4f severity=%d duration_ms=%.1f",
+        os.path.basename(str(getattr(image_path, "name", image_path))),
+        loaded.version,
+        predicted_class,
+        confidence,
+        severity,
+        (time.perf_counter() - started) * 1000,
+    )
+
+    return {
+        "severity": severity,
+        "model_version": loaded.version,
+        "predicted_class": predicted_class,
+        "confidence": confidence,
+    }
+
+
+def predict_severity(image_path):
+    """Predict pothole severity from image (0-3 scale)"""
+    return classify(image_path)["severity"]
+
+
+def submit_shadow(shadow, primary, image, primary_class, image_path):
+    if not shadow_slot.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            import numpy as np
+
+            with INFERENCE_LATENCY.labels(stage="shadow_predict").time():
+                predictions = shadow.predict(to_batch(image, shadow.input_size))
+            shadow_class = int(np.argmax(predictions))
+            agreement = (
+                "same_class"
+                if shadow_class == primary_class
+                else "same_severity"
+                if shadow.severity(shadow_class) == primary.severity(primary_class)
+                else "different"
+            )
+            SHADOW_PREDICTIONS.labels(
+                primary=primary.version, shadow=shadow.version, agreement=agreement
+            ).inc()
+            logger.info(
+                "shadow image=%s primary=%s class=%d shadow=%s class=%d confidence=%.4f agreement=%s",
+                os.path.basename(str(getattr(image_path, "name", image_path))),
+                primary.version,
+                primary_class,
+                shadow.version,
+                shadow_class,
+                float(np.max(predictions)),
+                agreement,
+            )
+        except Exception as e:
+            logger.error(f"✗ Shadow prediction with {shadow.version} failed: {str(e)}")
+        finally:
+            shadow_slot.release()
+
+    shadow_executor.submit(run)
 
 
 # Load model when module is imported
-logger.info("AI service module imported. Loading model...")
-load_model()
+if settings.AI_PRELOAD_MODEL:
+    logger.info("AI service module imported. Loading model...")
+    load_model()
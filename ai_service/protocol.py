@@ -0,0 +1,156 @@
+"""
+Wire format between the inference daemon and its clients.
+
+Both sides use it over a UNIX stream socket that stays open for many
+requests. Every message is a fixed header followed by a variable part.
+
+Request::
+
+    !BBI   protocol version, flags, payload length
+    bytes  payload: a UTF-8 image path, or the image itself with FLAG_IMAGE_BYTES
+
+With FLAG_BATCH the payload holds many images, classified together with one
+predict call per model::
+
+    !I     image count
+    !BI    per image: flags (FLAG_IMAGE_BYTES or 0), length; then the image
+
+Response::
+
+    !BbbfH status, severity, predicted class (-1: none),
+           confidence (NaN: none), text length
+    bytes  text: model version (STATUS_OK) or error message
+
+A batch gets one response per image, in request order.
+
+This module is shared by the web tier, so it must not import TensorFlow or
+the classifier.
+"""
+
+import math
+import struct
+
+PROTOCOL_VERSION = 1
+
+FLAG_IMAGE_BYTES = 0x01
+FLAG_BATCH = 0x02
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("!BBI")
+RESPONSE_HEADER = struct.Struct("!BbbfH")
+BATCH_COUNT = struct.Struct("!I")
+BATCH_ITEM = struct.Struct("!BI")
+
+MAX_PAYLOAD_BYTES = 32 * 1024 * 1024
+MAX_TEXT_BYTES = 0xFFFF
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def recv_exact(sock, size):
+    """Read exactly ``size`` bytes; raises EOFError if the peer hung up first"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise EOFError("Connection closed")
+        received += count
+    return bytes(buffer)
+
+
+def encode_request(payload, flags=0):
+    return REQUEST_HEADER.pack(PROTOCOL_VERSION, flags, len(payload)) + payload
+
+
+def encode_batch_item(payload, flags=0):
+    return BATCH_ITEM.pack(flags, len(payload)) + payload
+
+
+def encode_batch_request(items):
+    """A FLAG_BATCH request from ``encode_batch_item`` parts"""
+    payload = BATCH_COUNT.pack(len(items)) + b"".join(items)
+    return encode_request(payload, FLAG_BATCH)
+
+
+def decode_batch(payload):
+    """``[(flags, payload), ...]`` of a FLAG_BATCH request payload"""
+    view = memoryview(payload)
+    try:
+        (count,) = BATCH_COUNT.unpack_from(view)
+        offset = BATCH_COUNT.size
+        items = []
+        for _ in range(count):
+            flags, length = BATCH_ITEM.unpack_from(view, offset)
+            offset += BATCH_ITEM.size
+            if offset + length > len(view):
+                raise ProtocolError("Batch item runs past the end of the payload")
+            items.append((flags, bytes(view[offset : offset + length])))
+            offset += length
+    except struct.error as e:
+        raise ProtocolError(f"Malformed batch: {str(e)}") from e
+    return items
+
+
+def read_request(sock):
+    """``(flags, payload)`` of the next request"""
+    version, flags, length = REQUEST_HEADER.unpack(recv_exact(sock, REQUEST_HEADER.size))
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if length > MAX_PAYLOAD_BYTES:
+        raise ProtocolError(f"Payload of {length} bytes is too large")
+    return flags, recv_exact(sock, length)
+
+
+def encode_response(result):
+    text = (result["model_version"] or "").encode("utf-8")[:MAX_TEXT_BYTES]
+    predicted_class = result["predicted_class"]
+    confidence = result["confidence"]
+    return (
+        RESPONSE_HEADER.pack(
+            STATUS_OK,
+            result["severity"],
+            -1 if predicted_class is None else predicted_class,
+            math.nan if confidence is None else confidence,
+            len(text),
+        )
+        + text
+    )
+
+
+def encode_error(message):
+    text = message.encode("utf-8")[:MAX_TEXT_BYTES]
+    return RESPONSE_HEADER.pack(STATUS_ERROR, 0, -1, math.nan, len(text)) + text
+
+
+def read_response(sock):
+    """The ``classify()`` result dict; raises ProtocolError on an error response"""
+    result = read_result(sock)
+    if isinstance(result, ProtocolError):
+        raise result
+    return result
+
+
+def read_batch_response(sock, count):
+    """One result per image; ProtocolError instances stand for rejected images"""
+    return [read_result(sock) for _ in range(count)]
+
+
+def read_result(sock):
+    status, severity, predicted_class, confidence, length = RESPONSE_HEADER.unpack(
+        recv_exact(sock, RESPONSE_HEADER.size)
+    )
+    text = recv_exact(sock, length).decode("utf-8")
+    if status != STATUS_OK:
+        return ProtocolError(text)
+    return {
+        "severity": severity,
+        "model_version": text or None,
+        "predicted_class": None if predicted_class < 0 else predicted_class,
+        "confidence": None if math.isnan(confidence) else confidence,
+    }
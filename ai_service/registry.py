@@ -0,0 +1,296 @@
+"""
+Versioned model registry with hot reload.
+
+Layout of AI_MODEL_REGISTRY_DIR::
+
+    models/
+        CURRENT              # name of the active version, e.g. "2025-06-01"
+        SHADOW               # optional: version to compare against on a sample
+        STAGE1               # optional: cheap first-stage model of the cascade,
+                             # or "heuristic" (built in, see ai_service.heuristic)
+        2025-06-01/
+            model.keras      # or model.h5
+            metadata.json    # optional: {"severity_mapping": {"0": 0, ...}}
+
+The pointer files are replaced atomically (see
+``manage.py model_registry activate``). Every process re-reads them at most
+once per AI_MODEL_POLL_SECONDS. When one changes, the new version is loaded
+and warmed on a background thread, then swapped in with a single attribute
+assignment. A prediction holds on to the LoadedModel it started with, so
+in-flight work finishes on the old version.
+
+Without a CURRENT pointer the registry serves the legacy artifact at
+AI_LEGACY_MODEL_PATH as version "legacy".
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from asphalt_aid.metrics import INFERENCE_LATENCY, MODEL_LOADED, MODEL_VERSION
+
+logger = logging.getLogger(__name__)
+
+LEGACY_VERSION = "legacy"
+# Built-in first stage (ai_service.heuristic); no artifact, STAGE1 only
+HEURISTIC_VERSION = "heuristic"
+ARTIFACT_NAMES = ("model.keras", "model.h5")
+# Pointer file -> role, which is also the ModelRegistry attribute serving it
+POINTERS = {"CURRENT": "active", "SHADOW": "shadow", "STAGE1": "stage1"}
+INPUT_SHAPE = (1, 224, 224, 3)
+
+# Model output class -> severity (0-3)
+DEFAULT_SEVERITY_MAPPING = {
+    0: 0,  # Normal road - No severity
+    1: 1,  # Minor pothole - Low severity
+    2: 3,  # Major pothole - High severity
+}
+
+
+class LoadedModel:
+    def __init__(self, version, model, severity_mapping, input_shape=INPUT_SHAPE):
+        self.version = version
+        self.model = model
+        self.severity_mapping = severity_mapping
+        self.input_shape = input_shape
+
+    @property
+    def input_size(self):
+        """(width, height) images are resized to before predict"""
+        return self.input_shape[2], self.input_shape[1]
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+    def severity(self, predicted_class):
+        return self.severity_mapping.get(int(predicted_class), 1)
+
+
+def configure_threads(tf):
+    """Apply per-process TensorFlow thread pool sizes from settings"""
+    try:
+        if settings.AI_INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(
+                settings.AI_INTRA_OP_THREADS
+            )
+        if settings.AI_INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(
+                settings.AI_INTER_OP_THREADS
+            )
+    except RuntimeError:
+        # TensorFlow refuses changes once its runtime has been initialized
+        logger.warning("TensorFlow already initialized; thread settings unchanged")
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+        self.active = None
+        self.shadow = None
+        self.stage1 = None
+        self.load_lock = threading.Lock()
+        self.check_lock = threading.Lock()
+        self.loading = set()
+        # Pointer name -> (version, when) of the last failed load
+        self.failed = {}
+        self.checked_at = None
+
+    # Artifacts and pointers
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def artifact_path(self, version):
+        if version == LEGACY_VERSION:
+            return settings.AI_LEGACY_MODEL_PATH
+        for name in ARTIFACT_NAMES:
+            path = os.path.join(self.version_dir(version), name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root) if self.artifact_path(name)
+        )
+
+    def read_pointer(self, name):
+        try:
+            with open(os.path.join(self.root, name), encoding="utf-8") as pointer:
+                return pointer.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def write_pointer(self, name, version):
+        """Point ``name`` at ``version`` (None removes it) in one atomic step"""
+        path = os.path.join(self.root, name)
+        if version is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        if version == HEURISTIC_VERSION:
+            if name != "STAGE1":
+                raise ValueError(f"{HEURISTIC_VERSION} can only be the cascade's first stage")
+        elif not self.artifact_path(version):
+            raise ValueError(f"No model artifact for version {version}")
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as pointer:
+            pointer.write(version + "\n")
+            pointer.flush()
+            os.fsync(pointer.fileno())
+        os.replace(tmp_path, path)
+
+    def wanted(self, name):
+        version = self.read_pointer(name)
+        if name == "CURRENT" and version is None:
+            return LEGACY_VERSION
+        return version
+
+    # Loading
+
+    def load(self, version):
+        """Load and warm ``version``; raises if it cannot be served"""
+        if version == HEURISTIC_VERSION:
+            from ai_service.heuristic import HeuristicStage1
+
+            return HeuristicStage1()
+
+        import numpy as np
+        import tensorflow as tf
+
+        configure_threads(tf)
+        path = self.artifact_path(version)
+        if path is None or not os.path.exists(path):
+            raise FileNotFoundError(f"Model file for version {version} not found")
+
+        logger.info(f"Loading model version {version} from {path}")
+        with INFERENCE_LATENCY.labels(stage="model_load").time():
+            model = tf.keras.models.load_model(path)
+            input_shape = (1,) + tuple(model.input_shape[1:])
+            if None in input_shape:
+                input_shape = INPUT_SHAPE
+            # First predict builds the graph; pay it here, not on a request
+            model.predict(np.zeros(input_shape, dtype="float32"), verbose=0)
+
+        return LoadedModel(
+            version, model, self.severity_mapping(version), input_shape
+        )
+
+    def severity_mapping(self, version):
+        path = os.path.join(self.version_dir(version), "metadata.json")
+        try:
+            with open(path, encoding="utf-8") as metadata_file:
+                mapping = json.load(metadata_file)["severity_mapping"]
+            return {int(key): int(value) for key, value in mapping.items()}
+        except (FileNotFoundError, KeyError):
+            return DEFAULT_SEVERITY_MAPPING
+
+    def install(self, name, loaded):
+        role = POINTERS[name]
+        previous = getattr(self, role)
+        setattr(self, role, loaded)
+        if name == "CURRENT":
+            MODEL_LOADED.set(1)
+        if previous is not None:
+            MODEL_VERSION.labels(version=previous.version, role=role).set(0)
+        if loaded is not None:
+            MODEL_VERSION.labels(version=loaded.version, role=role).set(1)
+            logger.info(f"✓ Model version {loaded.version} is now {role}")
+
+    def mark_failed(self, name, version):
+        self.failed[name] = (version, time.monotonic())
+
+    def recently_failed(self, name, version):
+        """Back off from a version that just failed, instead of retrying per request"""
+        failed_version, failed_at = self.failed.get(name, (None, 0))
+        return (
+            failed_version == version
+            and time.monotonic() - failed_at < settings.AI_MODEL_RETRY_SECONDS
+        )
+
+    def load_in_background(self, name, version):
+        def run():
+            try:
+                loaded = self.load(version)
+            except Exception as e:
+                self.mark_failed(name, version)
+                logger.error(f"✗ Could not load model version {version}: {str(e)}")
+            else:
+                self.install(name, loaded)
+            finally:
+                self.loading.discard((name, version))
+
+        self.loading.add((name, version))
+        threading.Thread(
+            target=run, name=f"model-load-{version}", daemon=True
+        ).start()
+
+    def check_pointers(self):
+        """Start loading any version the pointers name that is not yet served"""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < settings.AI_MODEL_POLL_SECONDS:
+            return
+        # Another thread is already checking
+        if not self.check_lock.acquire(blocking=False):
+            return
+        try:
+            self.checked_at = now
+            self.start_pending_loads()
+        finally:
+            self.check_lock.release()
+
+    def start_pending_loads(self):
+        for name in POINTERS:
+            version = self.wanted(name)
+            loaded = getattr(self, POINTERS[name])
+            if loaded is not None and loaded.version == version:
+                continue
+            if name != "CURRENT" and version is None:
+                self.install(name, None)
+                continue
+            if name == "CURRENT" and loaded is None:
+                # Nothing to keep serving; current() loads in the foreground
+                continue
+            if (name, version) in self.loading or self.recently_failed(name, version):
+                continue
+            self.load_in_background(name, version)
+
+    def after_fork(self):
+        """Reset load state in a forked child (gunicorn workers, Celery children)
+
+        Loads still running in the parent did not come along: without this,
+        their ``loading`` entries would make the child skip those versions
+        forever, and a lock held by one of their threads would stay held.
+        """
+        self.load_lock = threading.Lock()
+        self.check_lock = threading.Lock()
+        self.loading = set()
+        self.checked_at = None
+
+    def current(self):
+        """Model for the next prediction, or None if no model can be loaded"""
+        self.check_pointers()
+        if self.active is None:
+            with self.load_lock:
+                version = self.wanted("CURRENT")
+                if self.active is None and not self.recently_failed("CURRENT", version):
+                    try:
+                        self.install("CURRENT", self.load(version))
+                    except ImportError:
+                        self.mark_failed("CURRENT", version)
+                        logger.error("✗ TensorFlow not installed. Please install tensorflow.")
+                    except Exception as e:
+                        self.mark_failed("CURRENT", version)
+                        logger.error(f"✗ Error loading model: {str(e)}")
+        return self.active
+
+
+registry = ModelRegistry(settings.AI_MODEL_REGISTRY_DIR)
+os.register_at_fork(after_in_child=registry.after_fork)
@@ -0,0 +1,26 @@
+"""Fixed-latency stand-in for the pothole classifier.
+
+Used by the load-test harness (benchmarks/loadtest.py) to measure web
+capacity separately from model cost.
+"""
+
+import time
+
+
+STUB_VERSION = "stub"
+
+
+def make_classify(latency_ms, severity=1):
+    """Build a ``classify`` replacement that sleeps, then answers"""
+
+    def classify(image_path):
+        time.sleep(latency_ms / 1000)
+        return {
+            "severity": severity,
+            "model_version": STUB_VERSION,
+            "predicted_class": None,
+            "confidence": None,
+        }
+
+    return classify
+
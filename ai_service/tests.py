@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from PIL import Image, ImageDraw, ImageFilter
+
+from ai_service import pothole_classifier
+from ai_service.client import batch_requests
+from ai_service.heuristic import HeuristicStage1
+from ai_service.protocol import (
+    FLAG_IMAGE_BYTES,
+    MAX_PAYLOAD_BYTES,
+    REQUEST_HEADER,
+    ProtocolError,
+    decode_batch,
+    encode_batch_item,
+    encode_batch_request,
+)
+from ai_service.quality import SAMPLE_SIZE, assess, sample
+from ai_service.registry import HEURISTIC_VERSION, LoadedModel, ModelRegistry, registry
+
+
+def road_scene(blur=0):
+    """A 2048x1536 scene of hard-edged shapes over fine grain"""
+    rng = np.random.default_rng(1)
+    image = Image.new("L", (2048, 1536), 120)
+    draw = ImageDraw.Draw(image)
+    for _ in range(150):
+        x, y = rng.integers(0, 2048), rng.integers(0, 1536)
+        radius = int(rng.integers(20, 200))
+        draw.ellipse([x, y, x + radius, y + radius * 0.7], fill=int(rng.integers(30, 230)))
+    grain = np.asarray(image, dtype=float) + rng.normal(0, 6, (1536, 2048))
+    image = Image.fromarray(np.clip(grain, 0, 255).astype("uint8"))
+    return image.filter(ImageFilter.GaussianBlur(blur)) if blur else image
+
+
+def as_jpeg(image, long_side):
+    buffer = io.BytesIO()
+    size = (long_side, round(long_side * image.height / image.width))
+    image.resize(size, Image.LANCZOS).save(buffer, "JPEG", quality=95)
+    buffer.seek(0)
+    return buffer
+
+
+@override_settings(
+    AI_QUALITY_MIN_SIDE=160,
+    AI_QUALITY_MIN_BRIGHTNESS=30,
+    AI_QUALITY_MAX_BRIGHTNESS=230,
+    AI_QUALITY_MIN_SHARPNESS=50,
+)
+class QualityGateTests(SimpleTestCase):
+    SIZES = (2048, 1024, SAMPLE_SIZE, 400, 320, 256, 214)
+
+    def test_never_upscales(self):
+        width, height, pixels = sample(as_jpeg(road_scene(), 320))
+        self.assertEqual((width, height), (320, 240))
+        self.assertEqual(pixels.shape, (240, 320))
+
+    def test_sharp_image_passes_at_every_size(self):
+        scene = road_scene()
+        for long_side in self.SIZES:
+            with self.subTest(long_side=long_side):
+                self.assertIsNone(assess(*sample(as_jpeg(scene, long_side))))
+
+    def test_blurry_image_fails_at_every_size(self):
+        scene = road_scene(blur=8)
+        for long_side in self.SIZES:
+            with self.subTest(long_side=long_side):
+                self.assertEqual(assess(*sample(as_jpeg(scene, long_side))), "blurry")
+
+    def test_small_image_fails_on_size(self):
+        self.assertEqual(assess(*sample(as_jpeg(road_scene(), 200))), "too_small")
+
+
+class BatchProtocolTests(SimpleTestCase):
+    def test_batch_round_trip(self):
+        message = encode_batch_request(
+            [encode_batch_item(b"image", FLAG_IMAGE_BYTES), encode_batch_item(b"a/path.jpg")]
+        )
+        self.assertEqual(
+            decode_batch(message[REQUEST_HEADER.size :]),
+            [(FLAG_IMAGE_BYTES, b"image"), (0, b"a/path.jpg")],
+        )
+
+    def test_truncated_batch_is_rejected(self):
+        message = encode_batch_request([encode_batch_item(b"image")])
+        with self.assertRaises(ProtocolError):
+            decode_batch(message[REQUEST_HEADER.size : -1])
+
+    def test_requests_stay_within_the_payload_limit(self):
+        half = b"x" * (MAX_PAYLOAD_BYTES // 2)
+        requests = list(batch_requests([b"a", half, half, b"x" * MAX_PAYLOAD_BYTES]))
+
+        self.assertEqual([positions for positions, _ in requests], [[0, 1], [3], [2]])
+        # The oversized image is rejected without a request
+        self.assertEqual(requests[1][1], [])
+
+
+def asphalt(damage=None, seed=0):
+    """An 800x600 photo-like patch of intact grey asphalt, or with some damage"""
+    rng = np.random.default_rng(seed)
+    grain = rng.normal(115, 10, (600, 800))
+    image = Image.fromarray(np.clip(grain, 0, 255).astype("uint8"))
+    image = image.filter(ImageFilter.GaussianBlur(1)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    if damage == "pothole":
+        draw.ellipse([300, 220, 470, 340], fill=(45, 45, 45))
+    elif damage == "small pothole":
+        draw.ellipse([380, 280, 450, 330], fill=(45, 45, 45))
+    elif damage == "crack":
+        draw.line([(100, 100), (400, 350), (700, 300)], fill=(40, 40, 40), width=8)
+    elif damage == "grass":
+        draw.rectangle([0, 0, 800, 600], fill=(60, 140, 50))
+    return image
+
+
+class FullModel(LoadedModel):
+    """Stands in for a trained model: major pothole wherever there is a dark patch"""
+
+    def __init__(self):
+        super().__init__("full", None, {0: 0, 1: 1, 2: 3})
+
+    def predict(self, batch):
+        dark = batch.min(axis=(1, 2, 3)) < 0.25
+        return np.array([[0.05, 0.05, 0.9] if hole else [0.9, 0.05, 0.05] for hole in dark])
+
+
+@override_settings(AI_CASCADE_THRESHOLD=0.9, AI_SHADOW_SAMPLE_RATE=0)
+class HeuristicStage1Tests(SimpleTestCase):
+    def setUp(self):
+        self.stage1 = HeuristicStage1()
+
+    def predict(self, image):
+        return self.stage1.predict(pothole_classifier.to_batch(image, self.stage1.input_size))[0]
+
+    def test_intact_road_exits_as_normal(self):
+        predictions = self.predict(asphalt())
+
+        self.assertTrue(pothole_classifier.cascade_exit(predictions, 0.9))
+        self.assertEqual(self.stage1.severity(predictions.argmax()), 0)
+
+    def test_anything_else_escalates(self):
+        for damage in ("pothole", "small pothole", "crack", "grass"):
+            with self.subTest(damage=damage):
+                predictions = self.predict(asphalt(damage))
+                self.assertFalse(pothole_classifier.cascade_exit(predictions, 0.9))
+
+    def test_cascade_answers_intact_road_alone(self):
+        full = FullModel()
+        images = [asphalt(), asphalt("pothole")]
+        inputs = [pothole_classifier.batch_inputs(image, full, self.stage1) for image in images]
+
+        results = pothole_classifier.classify_batch(full, self.stage1, inputs, ["road", "hole"])
+
+        self.assertEqual(
+            [(result["model_version"], result["severity"]) for result in results],
+            [(HEURISTIC_VERSION, 0), ("full", 3)],
+        )
+
+    def test_registry_serves_it_as_a_first_stage_only(self):
+        with tempfile.TemporaryDirectory() as root:
+            models = ModelRegistry(root)
+            models.write_pointer("STAGE1", HEURISTIC_VERSION)
+            self.assertIsInstance(models.load(models.wanted("STAGE1")), HeuristicStage1)
+            with self.assertRaises(ValueError):
+                models.write_pointer("CURRENT", HEURISTIC_VERSION)
+
+
+class EvaluateCascadeTests(SimpleTestCase):
+    def test_reports_escalation_and_accuracy_per_threshold(self):
+        loaded = {HEURISTIC_VERSION: HeuristicStage1(), "full": FullModel()}
+        with tempfile.TemporaryDirectory() as directory:
+            for label, damage in (("0", None), ("3", "pothole")):
+                os.makedirs(os.path.join(directory, label))
+                for seed in range(2):
+                    asphalt(damage, seed).save(os.path.join(directory, label, f"{seed}.jpg"))
+            output = io.StringIO()
+            with mock.patch.object(registry, "load", side_effect=loaded.__getitem__):
+                call_command(
+                    "evaluate_cascade",
+                    directory,
+                    "--stage1", HEURISTIC_VERSION,
+                    "--full", "full",
+                    "--thresholds", "0.5,0.9",
+                    "--json",
+                    stdout=output,
+                )
+
+        results = json.loads(output.getvalue())
+        self.assertEqual((results["images"], results["full_accuracy"]), (4, 1.0))
+        # The intact roads exit at both thresholds, the potholes always escalate
+        self.assertEqual(
+            [(row["threshold"], row["escalation_rate"], row["accuracy"]) for row in results["cascade"]],
+            [(0.5, 0.5, 1.0), (0.9, 0.5, 1.0)],
+        )
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asphalt_aid.settings')
 
 application = get_asgi_application()
+
+# Build the duplicate index now rather than on the first report create
+from reports_app.duplicates import build_index_in_background  # noqa: E402
+
+build_index_in_background()
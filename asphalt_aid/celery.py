@@ -8,6 +8,9 @@ app = Celery("asphalt_aid")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+# Connects the task runtime signal handlers
+import asphalt_aid.metrics  # noqa: E402,F401
+
 
 @app.task(bind=True)
 def debug_task(self):
@@ -0,0 +1,56 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Per-request routing state, installed by ReplicaPinningMiddleware. Outside a
+# request (Celery tasks, management commands) it is None and reads use the
+# primary.
+request_db_state = ContextVar("request_db_state", default=None)
+
+# Read-only report and profile queries that may be served by a replica
+REPLICA_READ_MODELS = {
+    ("reports_app", "report"),
+    ("auth", "user"),
+}
+
+# Models stored in settings.ARCHIVE_DATABASE
+ARCHIVE_MODELS = {("reports_app", "archivedreport")}
+
+
+class ReadReplicaRouter:
+    """Send report/profile reads to replicas, everything else to the primary
+
+    A client that wrote recently is pinned to the primary so it always reads
+    its own writes (see ReplicaPinningMiddleware). Archived reports always use
+    the archive database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label, model._meta.model_name) in ARCHIVE_MODELS:
+            return settings.ARCHIVE_DATABASE
+        state = request_db_state.get()
+        if not settings.DATABASE_REPLICAS or state is None:
+            return None
+        if state["pinned"] or state["wrote"]:
+            return "default"
+        if (model._meta.app_label, model._meta.model_name) not in REPLICA_READ_MODELS:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if (model._meta.app_label, model._meta.model_name) in ARCHIVE_MODELS:
+            return settings.ARCHIVE_DATABASE
+        state = request_db_state.get()
+        if state is not None:
+            state["wrote"] = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias can relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if (app_label, model_name) in ARCHIVE_MODELS:
+            return db == settings.ARCHIVE_DATABASE
+        return db == "default"
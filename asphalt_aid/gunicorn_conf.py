@@ -0,0 +1,94 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c asphalt_aid/gunicorn_conf.py asphalt_aid.wsgi:application
+
+The master process imports Django, the URLconf and, unless inference runs
+in the daemon (AI_INFERENCE_DAEMON), the pothole classifier with its model
+once, then forks workers that share those pages copy-on-write. Workers are recycled after a request budget to bound memory
+growth. Every knob can be overridden through the environment.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Each worker still needs activation memory for inference, so default low
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count()))
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = "gthread" if threads > 1 else "sync"
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+preload_app = True
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Drop metric files left by earlier runs before any worker writes"""
+    from asphalt_aid.metrics import clear_multiproc_dir
+
+    clear_multiproc_dir()
+
+
+def when_ready(server):
+    """Import the whole app in the master before any worker is forked"""
+    from django.conf import settings
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+    if settings.AI_INFERENCE_DAEMON:
+        server.log.info("Preloaded application (inference in the daemon)")
+    else:
+        # Loads the model at import (AI_PRELOAD_MODEL)
+        import ai_service.pothole_classifier  # noqa: F401
+        from ai_service.registry import registry
+
+        version = registry.active.version if registry.active else None
+        server.log.info(f"Preloaded application (model version: {version})")
+
+    # Nothing above should need the database, but a pool opened here would
+    # be inherited by every worker, which would then share its sockets
+    close_database_connections()
+
+    # Move everything imported so far out of the collector's reach, so GC
+    # passes in the workers do not write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+
+
+def close_database_connections():
+    """Close every connection and connection pool the master opened"""
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        # close() only returns a pooled connection to its pool
+        if hasattr(connection, "close_pool"):
+            connection.close_pool()
+
+
+def post_fork(server, worker):
+    """Build the duplicate index on the worker's own database connections"""
+    from reports_app.duplicates import build_index
+
+    build_index()
+
+
+def child_exit(server, worker):
+    """Clean up the exited worker's live metrics"""
+    from asphalt_aid.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
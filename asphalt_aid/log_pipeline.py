@@ -0,0 +1,178 @@
+"""
+Non-blocking logging.
+
+``configure_logging`` is installed as ``settings.LOGGING_CONFIG``. It applies
+``settings.LOGGING`` as usual, then swaps every logger's handlers for a
+QueueHandler. Request threads only enqueue records, and a single listener
+thread per process does all console and file I/O.
+"""
+
+import atexit
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from asphalt_aid.metrics import LOG_RECORDS_DROPPED
+
+# Records discarded by the pipeline, keyed by reason (e.g. "queue_full",
+# "sampled:ai_service.pothole_classifier")
+dropped_records = Counter()
+_dropped_lock = threading.Lock()
+
+_queue_handlers = []
+_listener = None
+
+
+def count_dropped(reason):
+    with _dropped_lock:
+        dropped_records[reason] += 1
+    LOG_RECORDS_DROPPED.labels(reason=reason).inc()
+
+
+def get_dropped_counts():
+    """Snapshot of records dropped so far in this process"""
+    with _dropped_lock:
+        return dict(dropped_records)
+
+
+class PreparedRecord(logging.LogRecord):
+    """A record whose message was formatted on the thread that logged it"""
+
+    def getMessage(self):
+        return self.message
+
+
+class RoutedQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records along with the handlers their logger was configured with"""
+
+    def __init__(self, log_queue, targets):
+        super().__init__(log_queue)
+        self.targets = targets
+        self.setLevel(min(handler.level for handler in targets))
+
+    def prepare(self, record):
+        # %-format here, while the arguments still hold what was logged;
+        # formatters on the listener thread get this message. The copy keeps
+        # msg and args for filters and formatters that read them (uvicorn's
+        # access log), and needs no pickling prep as the listener is in-process
+        prepared = PreparedRecord.__new__(PreparedRecord)
+        prepared.__dict__.update(record.__dict__)
+        prepared.message = record.getMessage()
+        prepared.targets = self.targets
+        return prepared
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            count_dropped("queue_full")
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Deliver each record only to the handlers of the logger that enqueued it"""
+
+    def handle(self, record):
+        for handler in record.targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class HotPathSampler(logging.Filter):
+    """Rate-limit high-volume records per message template
+
+    Each ``(logger, msg)`` pair gets a token bucket holding ``burst`` records
+    and refilled at ``rate`` records per second. WARNING and above always pass.
+    Log with %-style arguments, not f-strings, so a template is one bucket.
+    """
+
+    max_templates = 1000
+
+    def __init__(self, rate=1.0, burst=10):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) > self.max_templates:
+                self._buckets.clear()
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+        if not allowed:
+            count_dropped(f"sampled:{record.name}")
+        return allowed
+
+
+def configure_logging(logging_settings):
+    """LOGGING_CONFIG entry point: dictConfig, then route handlers via a queue"""
+    logging.config.dictConfig(logging_settings)
+    if settings.LOG_QUEUE_ENABLED:
+        install_queue()
+
+
+def install_queue():
+    global _listener
+
+    _stop_listener()
+    _queue_handlers.clear()
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE)
+    targets = {}
+
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.root.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        if not logger.handlers:
+            continue
+        key = tuple(logger.handlers)
+        if key not in targets:
+            handler = RoutedQueueHandler(log_queue, list(key))
+            targets[key] = handler
+            _queue_handlers.append(handler)
+        logger.handlers = [targets[key]]
+
+    all_handlers = {handler for key in targets for handler in key}
+    _listener = RoutingQueueListener(log_queue, *all_handlers)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork():
+    """The listener thread does not survive fork; give the child its own"""
+    global _listener
+    if _listener is None:
+        return
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE)
+    for handler in _queue_handlers:
+        handler.queue = log_queue
+    _listener = RoutingQueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -0,0 +1,239 @@
+"""
+Prometheus metrics, exposed in text format at ``/metrics``.
+
+With several processes (gunicorn workers, Celery prefork children) set
+PROMETHEUS_MULTIPROC_DIR to a directory shared by all of them. Each process
+then writes its samples there, and ``/metrics`` aggregates the files. Files
+are named after host and pid, so containers sharing the directory do not
+collide.
+
+Files outlive their processes, so the gunicorn master and the Celery worker
+empty the directory when they start (``clear_multiproc_dir``). Otherwise
+samples from earlier runs would keep adding to counters and to the
+``livemax`` gauges. Where several containers share one directory, each
+one's start would wipe the others' files; set PROMETHEUS_MULTIPROC_CLEAR=false
+there and empty it once before any of them start (docker-compose's
+``metrics-init``).
+"""
+
+import os
+import socket
+import time
+
+from celery.signals import task_postrun, task_prerun, worker_init
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    values,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+MULTIPROC_CLEAR = os.environ.get("PROMETHEUS_MULTIPROC_CLEAR", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+HOSTNAME = socket.gethostname()
+
+
+def process_identifier(pid=None):
+    return f"{HOSTNAME}_{pid or os.getpid()}"
+
+
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    # Must be set before the first metric below is constructed
+    values.ValueClass = values.MultiProcessValue(process_identifier=process_identifier)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+INFERENCE_LATENCY = Histogram(
+    "asphalt_aid_inference_seconds",
+    "Time spent in each stage of the AI severity pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_LOADED = Gauge(
+    "asphalt_aid_model_loaded",
+    "Whether the pothole classification model is loaded in a live process",
+    multiprocess_mode="livemax",
+)
+MODEL_VERSION = Gauge(
+    "asphalt_aid_model_version_info",
+    "Model versions served by live processes, as active model or shadow",
+    ["version", "role"],
+    multiprocess_mode="livemax",
+)
+SHADOW_PREDICTIONS = Counter(
+    "asphalt_aid_shadow_predictions",
+    "Shadow model predictions compared with the active model's",
+    ["primary", "shadow", "agreement"],
+)
+CASCADE_DECISIONS = Counter(
+    "asphalt_aid_cascade_decisions",
+    "First-stage cascade predictions that answered alone or escalated to the full model",
+    ["stage1", "outcome"],
+)
+INFERENCE_FALLBACKS = Counter(
+    "asphalt_aid_inference_fallbacks",
+    "Inference daemon requests that failed: timeouts and outages are retried, "
+    "errors get the fallback severity",
+    ["reason"],
+)
+REQUEST_LATENCY = Histogram(
+    "asphalt_aid_request_seconds",
+    "HTTP request latency by view and action",
+    ["view", "action", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "asphalt_aid_request_db_queries",
+    "Database queries executed per HTTP request",
+    ["view", "action", "method"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CELERY_TASK_RUNTIME = Histogram(
+    "asphalt_aid_celery_task_seconds",
+    "Celery task runtime by task name and final state",
+    ["task", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+ANALYSIS_ENQUEUED = Counter(
+    "asphalt_aid_analysis_enqueued",
+    "AI analysis tasks queued, by scheduling lane",
+    ["lane"],
+)
+ANALYSIS_PIPELINE_STAGE = Histogram(
+    "asphalt_aid_analysis_pipeline_stage_seconds",
+    "Time per batch in each stage of the pipelined analysis; read and decode "
+    "are summed over their threads, wait is the model idling on preprocessing",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ANALYSIS_QUEUE_WAIT = Histogram(
+    "asphalt_aid_analysis_queue_wait_seconds",
+    "Time an AI analysis waited in its lane before a worker started it",
+    ["lane"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+LOG_RECORDS_DROPPED = Counter(
+    "asphalt_aid_log_records_dropped",
+    "Log records dropped by sampling or a full log queue",
+    ["reason"],
+)
+IMAGE_QUALITY_CHECKS = Counter(
+    "asphalt_aid_image_quality_checks",
+    "Images checked before inference, by result (passed or the rejection reason)",
+    ["result"],
+)
+NOTIFICATION_EMAILS = Counter(
+    "asphalt_aid_notification_emails",
+    "Notification digests emailed, queued again after failing, or dropped "
+    "after NOTIFICATION_MAX_ATTEMPTS failures",
+    ["result"],
+)
+RATE_LIMITED = Counter(
+    "asphalt_aid_rate_limited",
+    "Requests rejected with 429, by route, rule scope and the tier that rejected",
+    ["route", "scope", "tier"],
+)
+
+
+def clear_multiproc_dir():
+    """Delete sample files left by earlier runs
+
+    The caller's own files stay: by the time a server starts, importing this
+    module has already created them.
+    """
+    if not (MULTIPROC_DIR and MULTIPROC_CLEAR):
+        return
+    own_suffix = f"_{process_identifier()}.db"
+    for name in os.listdir(MULTIPROC_DIR):
+        if name.endswith(".db") and not name.endswith(own_suffix):
+            try:
+                os.remove(os.path.join(MULTIPROC_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+@worker_init.connect
+def _clear_before_worker(**kwargs):
+    clear_multiproc_dir()
+
+
+def mark_process_dead(pid):
+    """Drop live gauges of an exited worker (called from gunicorn's child_exit)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(process_identifier(pid))
+
+
+class CeleryQueueCollector:
+    """Broker queue depth, read from Redis at scrape time"""
+
+    client = None
+
+    def collect(self):
+        import redis
+
+        depth = GaugeMetricFamily(
+            "asphalt_aid_celery_queue_length",
+            "Messages waiting in each Celery broker queue",
+            labels=["queue"],
+        )
+        try:
+            if self.client is None:
+                self.client = redis.Redis.from_url(
+                    settings.CELERY_BROKER_URL,
+                    socket_timeout=1,
+                    socket_connect_timeout=1,
+                )
+            for queue in settings.METRICS_CELERY_QUEUES:
+                depth.add_metric([queue], self.client.llen(queue))
+        except redis.RedisError:
+            pass
+        yield depth
+
+
+queue_collector = CeleryQueueCollector()
+if not MULTIPROC_DIR:
+    REGISTRY.register(queue_collector)
+
+
+def metrics_view(request):
+    """Expose all metrics in the Prometheus text format"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(queue_collector)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+# Celery task runtimes, recorded in whichever process runs the task
+_task_started = {}
+
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        CELERY_TASK_RUNTIME.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
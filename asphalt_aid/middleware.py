@@ -0,0 +1,360 @@
+import cProfile
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from asphalt_aid.db_router import request_db_state
+from asphalt_aid.metrics import REQUEST_DB_QUERIES, REQUEST_LATENCY
+
+
+# Execute wrappers of the current request. Connections are per thread, and
+# async views query from sync_to_async threads, so middleware cannot wrap
+# the connections it sees. It adds its wrappers here instead, and every
+# connection runs those of the request it is serving.
+request_query_wrappers = ContextVar("request_query_wrappers", default=())
+
+
+def run_request_wrappers(execute, sql, params, many, context):
+    for wrapper in request_query_wrappers.get():
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_hook(connection, **kwargs):
+    # First, so execute_wrapper() blocks that are open still pop their own
+    if run_request_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, run_request_wrappers)
+
+
+connection_created.connect(install_query_hook)
+for _connection in connections.all(initialized_only=True):
+    install_query_hook(_connection)
+
+
+@contextmanager
+def wrapping_queries(wrapper):
+    """Run ``wrapper`` around every query of the current request"""
+    token = request_query_wrappers.set(request_query_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        request_query_wrappers.reset(token)
+
+
+def client_identity(request):
+    """Stable per-client key without touching the database
+
+    Uses the API token or session cookie as presented, hashed so raw
+    credentials never end up in cache keys.
+    """
+    credential = request.headers.get("Authorization") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credential:
+        return None
+    return hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+class ReplicaPinningMiddleware:
+    """Read-your-writes stickiness for ReadReplicaRouter
+
+    A request that writes pins its client to the primary for
+    DATABASE_REPLICA_STICKY_SECONDS so following reads cannot hit a lagging
+    replica. Runs in either mode; the request state is a context variable,
+    so it reaches ORM calls an async view makes through sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin_key = pin_key_for(request)
+        state = {"pinned": bool(pin_key and cache.get(pin_key)), "wrote": False}
+        token = request_db_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_db_state.reset(token)
+
+        if state["wrote"] and pin_key:
+            cache.set(pin_key, 1, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        pin_key = pin_key_for(request)
+        state = {"pinned": bool(pin_key and await cache.aget(pin_key)), "wrote": False}
+        token = request_db_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_db_state.reset(token)
+
+        if state["wrote"] and pin_key:
+            await cache.aset(pin_key, 1, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
+
+
+def pin_key_for(request):
+    identity = client_identity(request)
+    return f"db-pin:{identity}" if identity else None
+
+
+class MetricsMiddleware:
+    """Record request latency and DB queries per view/action for /metrics
+
+    Runs in either mode, so under ASGI the chain stays on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with recording(request) as recorded:
+            recorded["response"] = self.get_response(request)
+        return recorded["response"]
+
+    async def __acall__(self, request):
+        with recording(request) as recorded:
+            recorded["response"] = await self.get_response(request)
+        return recorded["response"]
+
+
+@contextmanager
+def recording(request):
+    """Count queries and time the block, which stores ``response``"""
+    recorded = {"response": None, "queries": 0}
+
+    def count_queries(execute, sql, params, many, context):
+        recorded["queries"] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    with wrapping_queries(count_queries):
+        yield recorded
+    elapsed = time.perf_counter() - started
+
+    view, action = view_labels(request)
+    REQUEST_LATENCY.labels(
+        view=view,
+        action=action,
+        method=request.method,
+        status=f"{recorded['response'].status_code // 100}xx",
+    ).observe(elapsed)
+    REQUEST_DB_QUERIES.labels(
+        view=view, action=action, method=request.method
+    ).observe(recorded["queries"])
+
+
+def view_labels(request):
+    """URL name plus viewset action (list/create/...) of the resolved view"""
+    match = request.resolver_match
+    if match is None:
+        return "unresolved", ""
+    actions = getattr(match.func, "actions", None) or {}
+    return match.view_name or match.url_name or "", actions.get(
+        request.method.lower(), ""
+    )
+
+
+# cProfile can only run one profile at a time per process (and per
+# interpreter on Python 3.12+), so concurrent candidates simply skip.
+_profile_lock = threading.Lock()
+
+REQUESTED = "requested"
+SAMPLED = "sampled"
+
+
+class ProfilingMiddleware:
+    """On-demand CPU profile and SQL log for a single request
+
+    Active for staff requests carrying ``X-Profile: 1`` or ``?profile=1``,
+    and for a random PROFILING_SAMPLE_RATE share of all requests. Profiles
+    go to PROFILING_DIR. Only the staff-requested ones also get an
+    ``X-Profile-Summary`` header; sampled requests may come from anyone.
+    When PROFILING_ENABLED is off the middleware removes itself.
+
+    Under ASGI the CPU profile covers the event loop thread while the
+    request runs, so other requests served meanwhile show up in it too; the
+    SQL log and timings are the request's own.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self.should_profile(request)
+        if not reason:
+            return self.get_response(request)
+        if not _profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            with profiling() as profiled:
+                profiled["response"] = self.get_response(request)
+            return finish_profile(request, profiled, summarize=reason == REQUESTED)
+        finally:
+            _profile_lock.release()
+
+    async def __acall__(self, request):
+        if self.requested(request):
+            # Authenticating the staff user needs the database
+            reason = REQUESTED if await sync_to_async(is_staff_request)(request) else None
+        else:
+            reason = self.sampled()
+        if not reason:
+            return await self.get_response(request)
+        if not _profile_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            with profiling() as profiled:
+                profiled["response"] = await self.get_response(request)
+            return await sync_to_async(finish_profile)(
+                request, profiled, summarize=reason == REQUESTED
+            )
+        finally:
+            _profile_lock.release()
+
+    def should_profile(self, request):
+        """REQUESTED, SAMPLED or None"""
+        if self.requested(request):
+            return REQUESTED if is_staff_request(request) else None
+        return self.sampled()
+
+    def requested(self, request):
+        return request.headers.get("X-Profile") == "1" or request.GET.get("profile") == "1"
+
+    def sampled(self):
+        rate = settings.PROFILING_SAMPLE_RATE
+        return SAMPLED if rate > 0 and random.random() < rate else None
+
+
+@contextmanager
+def profiling():
+    """Profile and log the SQL of the block, which stores ``response``"""
+    profiled = {"response": None, "queries": [], "profiler": cProfile.Profile()}
+
+    def log_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            profiled["queries"].append(
+                {
+                    "alias": context["connection"].alias,
+                    "sql": sql,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                }
+            )
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    with wrapping_queries(log_query):
+        profiled["profiler"].enable()
+        try:
+            yield profiled
+        finally:
+            profiled["profiler"].disable()
+    profiled["total_ms"] = (time.perf_counter() - started) * 1000
+    profiled["cpu_ms"] = (time.process_time() - cpu_started) * 1000
+
+
+def finish_profile(request, profiled, summarize):
+    """Save the profile; summarize it on the response if asked"""
+    response = profiled["response"]
+    queries = profiled["queries"]
+    name = save_profile(request, profiled["profiler"], queries, profiled["total_ms"])
+    if summarize:
+        sql_ms = sum(query["duration_ms"] for query in queries)
+        response["X-Profile-Summary"] = (
+            f"total_ms={profiled['total_ms']:.1f}; cpu_ms={profiled['cpu_ms']:.1f}; "
+            f"sql_queries={len(queries)}; sql_ms={sql_ms:.1f}; profile={name}"
+        )
+    return response
+
+
+def is_staff_request(request):
+    """Staff check for session users and, only when asked, DRF token users"""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def save_profile(request, profiler, queries, total_ms):
+    """Write ``<name>.prof`` (pstats) and ``<name>.sql.json``, keep the dir bounded"""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-")[:60] or "root"
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{request.method}-{slug}"
+
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    with open(os.path.join(directory, f"{name}.sql.json"), "w", encoding="utf-8") as sql_log:
+        json.dump(
+            {
+                "path": request.get_full_path(),
+                "method": request.method,
+                "total_ms": round(total_ms, 3),
+                "queries": queries,
+            },
+            sql_log,
+            indent=2,
+        )
+
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".prof")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[: max(0, len(profiles) - settings.PROFILING_MAX_FILES)]:
+        for path in (entry.path, entry.path[: -len(".prof")] + ".sql.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return name
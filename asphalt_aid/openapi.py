@@ -0,0 +1,168 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is built
+once per code version and looked up in order:
+
+1. this process's memory
+2. the file written by ``manage.py generate_openapi_schema`` (at build time)
+3. the Redis cache, shared by every process on the same code version
+4. drf_yasg, on first request; the result is stored in Redis and memory
+
+``/swagger.json/`` serves it with an ``ETag``, so unchanged schemas cost a
+304. drf_yasg's generator and renderers are only imported by the process
+that builds the schema or serves the docs pages, not by every worker that
+loads the URLconf.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_INFO = {
+    "title": "AsphaltAid API Documentations",
+    "default_version": "v1",
+    "description": "API documentation for AsphaltAid",
+    "terms_of_service": "https://asphaltaid.com/terms/",
+}
+CONTACT_EMAIL = "support@asphaltaid.com"
+LICENSE_NAME = "MIT License"
+
+# Packages whose code shapes the schema
+SCHEMA_SOURCES = ("asphalt_aid", "reports_app", "users_app")
+
+_schema = None
+_schema_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """OPENAPI_CODE_VERSION, or a digest of the source files and API libraries"""
+    if settings.OPENAPI_CODE_VERSION:
+        return settings.OPENAPI_CODE_VERSION
+
+    import drf_yasg
+    import rest_framework
+
+    digest = hashlib.sha256(
+        f"{drf_yasg.__version__}:{rest_framework.__version__}".encode()
+    )
+    for package in SCHEMA_SOURCES:
+        for root, dirs, files in os.walk(os.path.join(settings.BASE_DIR, package)):
+            dirs[:] = sorted(name for name in dirs if name != "__pycache__")
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                    with open(path, "rb") as source:
+                        digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def schema_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        contact=openapi.Contact(email=CONTACT_EMAIL),
+        license=openapi.License(name=LICENSE_NAME),
+        **SCHEMA_INFO,
+    )
+
+
+def generate_schema():
+    """Introspect the API and return the schema as JSON bytes"""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    generator = OpenAPISchemaGenerator(schema_info())
+    # public=True: the same document for everyone, whoever asks first
+    return OpenAPICodecJson(validators=[]).encode(
+        generator.get_schema(request=None, public=True)
+    )
+
+
+def schema_path(version):
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR, f"openapi-{version}.json")
+
+
+def write_schema_file(body, version):
+    """Write the schema for ``version`` atomically; returns its path"""
+    path = schema_path(version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as schema_file:
+        schema_file.write(body)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_schema(version):
+    try:
+        with open(schema_path(version), "rb") as schema_file:
+            logger.info(f"✓ OpenAPI schema {version} loaded from file")
+            return schema_file.read()
+    except FileNotFoundError:
+        pass
+
+    cache_key = f"openapi-schema:{version}"
+    body = cache.get(cache_key)
+    if body is not None:
+        return body
+
+    body = generate_schema()
+    cache.set(cache_key, body, settings.OPENAPI_SCHEMA_CACHE_SECONDS)
+    logger.info(f"✓ OpenAPI schema {version} generated ({len(body)} bytes)")
+    return body
+
+
+def get_schema():
+    """``(body, etag)`` of the schema for the running code"""
+    global _schema
+    version = code_version()
+    if _schema is None or _schema[0] != version:
+        with _schema_lock:
+            if _schema is None or _schema[0] != version:
+                body = load_schema(version)
+                etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+                _schema = (version, body, etag)
+    return _schema[1], _schema[2]
+
+
+def schema_etag(request):
+    return get_schema()[1]
+
+
+@require_safe
+@condition(etag_func=schema_etag)
+def schema_json_view(request):
+    body, _ = get_schema()
+    response = HttpResponse(body, content_type="application/json")
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
+
+
+def docs_view(renderer_name):
+    """Swagger UI or ReDoc page; the page fetches the schema from /swagger.json/"""
+
+    @require_safe
+    def view(request):
+        from drf_yasg import openapi
+        from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+
+        renderer = {"swagger": SwaggerUIRenderer, "redoc": ReDocRenderer}[renderer_name]()
+        # The pages only read the title and version from the document
+        shell = openapi.Swagger(info=schema_info(), _prefix="/", paths=openapi.Paths({}))
+        html = renderer.render(shell, renderer_context={"request": request})
+        return HttpResponse(html, content_type="text/html; charset=utf-8")
+
+    return view
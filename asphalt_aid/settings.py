@@ -17,6 +17,14 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_bool(name, default=False):
+    """Read a boolean flag such as ``1``/``true``/``yes`` from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -46,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "asphalt_aid.middleware.MetricsMiddleware",
+    "asphalt_aid.throttling.RateLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,6 +63,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "asphalt_aid.middleware.ReplicaPinningMiddleware",
+    "asphalt_aid.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "asphalt_aid.urls"
@@ -79,10 +91,111 @@ WSGI_APPLICATION = "asphalt_aid.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_ENGINE selects "postgres" (docker-compose) or "sqlite" (single node).
+
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite").lower()
+# Persistent connections; ignored for Postgres when the pool is enabled
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 60))
+DATABASE_POOL = env_bool("DATABASE_POOL", True)
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2))
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10))
+DATABASE_POOL_TIMEOUT = int(os.environ.get("DATABASE_POOL_TIMEOUT", 10))
+
+
+def postgres_database(host):
+    options = {}
+    if DATABASE_POOL:
+        options["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+        }
+    return {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("POSTGRES_DB", "postgres"),
+        "USER": os.environ.get("POSTGRES_USER", "postgres"),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "postgres"),
+        "HOST": host,
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Django's pool and persistent connections are mutually exclusive
+        "CONN_MAX_AGE": 0 if DATABASE_POOL else DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": options,
+    }
+
+
+if DATABASE_ENGINE == "postgres":
+    DATABASES = {"default": postgres_database(os.environ.get("POSTGRES_HOST", "db"))}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "OPTIONS": {
+                # WAL lets readers proceed during a write; IMMEDIATE takes the
+                # write lock up front instead of failing mid-transaction.
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA busy_timeout=5000;"
+                    "PRAGMA temp_store=MEMORY;"
+                    "PRAGMA cache_size=-20000;"
+                    "PRAGMA mmap_size=134217728;"
+                ),
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+        }
+    }
+
+# Read replicas (Postgres only), e.g. POSTGRES_REPLICA_HOSTS=db-replica-1,db-replica-2
+DATABASE_REPLICAS = []
+if DATABASE_ENGINE == "postgres":
+    for index, host in enumerate(
+        filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))
+    ):
+        alias = f"replica_{index + 1}"
+        DATABASES[alias] = postgres_database(host.strip())
+        DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+        DATABASE_REPLICAS.append(alias)
+
+# Archived reports (reports_app/archive.py) may live in a database of their
+# own, e.g. on cheaper storage; otherwise they share the default database.
+# Create its table with `manage.py migrate --database archive`.
+if DATABASE_ENGINE == "postgres" and os.environ.get("ARCHIVE_POSTGRES_HOST"):
+    DATABASES["archive"] = postgres_database(os.environ["ARCHIVE_POSTGRES_HOST"])
+    DATABASES["archive"]["NAME"] = os.environ.get("ARCHIVE_POSTGRES_DB", "archive")
+elif DATABASE_ENGINE != "postgres" and os.environ.get("ARCHIVE_SQLITE_PATH"):
+    DATABASES["archive"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["ARCHIVE_SQLITE_PATH"],
+    }
+ARCHIVE_DATABASE = "archive" if "archive" in DATABASES else "default"
+
+DATABASE_ROUTERS = ["asphalt_aid.db_router.ReadReplicaRouter"]
+# After a client writes, its reads stay on the primary for this many seconds
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", 10)
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379")
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": f"{REDIS_URL}/1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "SOCKET_CONNECT_TIMEOUT": 2,
+            "SOCKET_TIMEOUT": 2,
+            # A cache outage degrades to cache misses instead of 500s
+            "IGNORE_EXCEPTIONS": True,
+        },
     }
 }
 
@@ -125,7 +238,120 @@ STATIC_URL = "static/"
 
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", os.path.join(BASE_DIR, "media"))
+
+# Cold media tier for the images of archived reports
+ARCHIVE_MEDIA_URL = "/media-archive/"
+ARCHIVE_MEDIA_ROOT = os.environ.get(
+    "ARCHIVE_MEDIA_ROOT", os.path.join(BASE_DIR, "media-archive")
+)
+
+# MEDIA STORAGE (asphalt_aid/storage.py)
+# "local" keeps images under MEDIA_ROOT; "s3" keeps them in an S3-compatible
+# bucket (MinIO in docker-compose) and lets clients upload there directly.
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "local").lower()
+AWS_S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+# Endpoint clients reach the bucket at, if not the one Django uses
+S3_PUBLIC_ENDPOINT_URL = os.environ.get("S3_PUBLIC_ENDPOINT_URL") or AWS_S3_ENDPOINT_URL
+AWS_S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID")
+AWS_S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY")
+AWS_S3_REGION_NAME = os.environ.get("S3_REGION", "us-east-1")
+AWS_S3_ADDRESSING_STYLE = "path" if AWS_S3_ENDPOINT_URL else "auto"
+AWS_S3_SIGNATURE_VERSION = "s3v4"
+AWS_S3_FILE_OVERWRITE = False
+AWS_DEFAULT_ACL = None
+# Image links in API responses are presigned for this long
+AWS_QUERYSTRING_EXPIRE = 3600
+MEDIA_BUCKET = os.environ.get("MEDIA_BUCKET", "asphalt-aid-media")
+ARCHIVE_MEDIA_BUCKET = os.environ.get("ARCHIVE_MEDIA_BUCKET", "asphalt-aid-archive")
+# e.g. STANDARD_IA or GLACIER_IR on AWS; empty keeps the bucket default
+ARCHIVE_S3_STORAGE_CLASS = os.environ.get("ARCHIVE_S3_STORAGE_CLASS", "")
+# Direct uploads: how long a presigned upload stays valid, and its size limit
+DIRECT_UPLOAD_EXPIRE_SECONDS = 900
+DIRECT_UPLOAD_MAX_BYTES = int(os.environ.get("DIRECT_UPLOAD_MAX_BYTES", 15 * 1024 * 1024))
+
+if MEDIA_STORAGE == "s3":
+    MEDIA_STORAGE_BACKENDS = {
+        "default": {
+            "BACKEND": "asphalt_aid.storage.MediaStorage",
+            "OPTIONS": {"bucket_name": MEDIA_BUCKET},
+        },
+        "archive": {
+            "BACKEND": "asphalt_aid.storage.MediaStorage",
+            "OPTIONS": {
+                "bucket_name": ARCHIVE_MEDIA_BUCKET,
+                "object_parameters": (
+                    {"StorageClass": ARCHIVE_S3_STORAGE_CLASS}
+                    if ARCHIVE_S3_STORAGE_CLASS
+                    else {}
+                ),
+            },
+        },
+    }
+else:
+    MEDIA_STORAGE_BACKENDS = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "archive": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": ARCHIVE_MEDIA_ROOT, "base_url": ARCHIVE_MEDIA_URL},
+        },
+    }
+
+STORAGES = {
+    **MEDIA_STORAGE_BACKENDS,
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+# AI SERVICE CONFIG
+# Load the model when ai_service.pothole_classifier is imported, so a
+# preloading server (see asphalt_aid/gunicorn_conf.py) shares it with workers.
+AI_PRELOAD_MODEL = env_bool("AI_PRELOAD_MODEL", True)
+# TensorFlow thread pools per process (0 keeps TensorFlow's defaults)
+AI_INTRA_OP_THREADS = int(os.environ.get("AI_INTRA_OP_THREADS", 0))
+AI_INTER_OP_THREADS = int(os.environ.get("AI_INTER_OP_THREADS", 0))
+# Versioned models and the CURRENT/SHADOW pointers (see ai_service/registry.py)
+AI_MODEL_REGISTRY_DIR = os.environ.get(
+    "AI_MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "models")
+)
+# Served as version "legacy" until a CURRENT pointer exists
+AI_LEGACY_MODEL_PATH = os.path.join(
+    BASE_DIR, "Pothole Classification", "pothole_model.h5"
+)
+# How often each process checks the pointers for a new version
+AI_MODEL_POLL_SECONDS = int(os.environ.get("AI_MODEL_POLL_SECONDS", 10))
+AI_MODEL_RETRY_SECONDS = 60
+# Share of predictions also run on the SHADOW version for comparison
+AI_SHADOW_SAMPLE_RATE = float(os.environ.get("AI_SHADOW_SAMPLE_RATE", 0.1))
+# With a STAGE1 version set, its answers at or above this confidence skip the
+# full model (tune with `manage.py evaluate_cascade`)
+AI_CASCADE_THRESHOLD = float(os.environ.get("AI_CASCADE_THRESHOLD", 0.9))
+# Quality gate (ai_service/quality.py): images failing it are flagged
+# needs_retake instead of being classified
+AI_QUALITY_GATE = env_bool("AI_QUALITY_GATE", True)
+AI_QUALITY_MIN_SIDE = int(os.environ.get("AI_QUALITY_MIN_SIDE", 160))
+# Mean brightness bounds, 0-255
+AI_QUALITY_MIN_BRIGHTNESS = float(os.environ.get("AI_QUALITY_MIN_BRIGHTNESS", 30))
+AI_QUALITY_MAX_BRIGHTNESS = float(os.environ.get("AI_QUALITY_MAX_BRIGHTNESS", 230))
+# Laplacian variance, measured at 512px on the long side
+AI_QUALITY_MIN_SHARPNESS = float(os.environ.get("AI_QUALITY_MIN_SHARPNESS", 50))
+# Send images to the inference daemon (python -m ai_service.daemon) instead of
+# loading TensorFlow in web workers and Celery tasks; see ai_service/client.py
+AI_INFERENCE_DAEMON = env_bool("AI_INFERENCE_DAEMON", False)
+AI_DAEMON_SOCKET = os.environ.get(
+    "AI_DAEMON_SOCKET", os.path.join(BASE_DIR, "run", "inference.sock")
+)
+AI_DAEMON_CONNECT_TIMEOUT = float(os.environ.get("AI_DAEMON_CONNECT_TIMEOUT", 1))
+# Past this, the fallback severity is used
+AI_DAEMON_TIMEOUT = float(os.environ.get("AI_DAEMON_TIMEOUT", 30))
+# Predictions the daemon runs at once
+AI_DAEMON_CONCURRENCY = int(os.environ.get("AI_DAEMON_CONCURRENCY", 2))
+
+# ASYNC (ASGI) REPORT VIEWS
+# Threads available for blocking work; waiting requests do not hold a thread.
+ASYNC_INFERENCE_WORKERS = int(os.environ.get("ASYNC_INFERENCE_WORKERS", 2))
+ASYNC_IO_WORKERS = int(os.environ.get("ASYNC_IO_WORKERS", 8))
 
 # REST FRAMEWORK CONFIG
 REST_FRAMEWORK = {
@@ -137,6 +363,24 @@ REST_FRAMEWORK = {
     ],
 }
 
+# REPORT SEARCH (reports_app/search.py)
+# Most results a ?q= search returns, best first
+REPORT_SEARCH_MAX_RESULTS = int(os.environ.get("REPORT_SEARCH_MAX_RESULTS", 100))
+
+# API DOCS (OPENAPI) CONFIG (asphalt_aid/openapi.py)
+# Identifies the code the schema was built from; empty hashes the sources.
+# Set it (e.g. to the git commit) in images built with a pregenerated schema.
+OPENAPI_CODE_VERSION = os.environ.get("OPENAPI_CODE_VERSION", "")
+# Written by `manage.py generate_openapi_schema`
+OPENAPI_SCHEMA_DIR = os.environ.get(
+    "OPENAPI_SCHEMA_DIR", os.path.join(BASE_DIR, "openapi")
+)
+OPENAPI_SCHEMA_CACHE_SECONDS = 7 * 24 * 3600
+OPENAPI_SCHEMA_MAX_AGE = int(os.environ.get("OPENAPI_SCHEMA_MAX_AGE", 300))
+# The docs pages load the precomputed schema instead of generating their own
+SWAGGER_SETTINGS = {"SPEC_URL": "schema-json"}
+REDOC_SETTINGS = {"SPEC_URL": "schema-json"}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -144,16 +388,229 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 # CELERY CONFIG
-CELERY_BROKER_URL = "redis://redis:6379/0"
-CELERY_RESULT_BACKEND = "redis://redis:6379/0"
+CELERY_BROKER_URL = f"{REDIS_URL}/0"
+CELERY_RESULT_BACKEND = f"{REDIS_URL}/0"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+# Take one task at a time and consume queues in the order given to -Q, so the
+# analysis lanes below are served by strict priority.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+CELERY_BROKER_TRANSPORT_OPTIONS = {"queue_order_strategy": "priority"}
+# Periodic tasks, run by `celery -A asphalt_aid beat`
+CELERY_BEAT_SCHEDULE = {
+    "release-deferred-analyses": {
+        "task": "reports_app.tasks.release_deferred_analyses",
+        "schedule": float(os.environ.get("ANALYSIS_DEFER_POLL_SECONDS", 5)),
+    },
+    "archive-reports": {
+        "task": "reports_app.tasks.archive_reports",
+        "schedule": float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", 3600)),
+    },
+    "send-notification-digests": {
+        "task": "reports_app.tasks.send_notification_digests",
+        "schedule": float(os.environ.get("NOTIFICATION_INTERVAL_SECONDS", 60)),
+    },
+}
+
+# AI ANALYSIS SCHEDULING (reports_app/scheduling.py)
+# Run analysis in Celery instead of inside the create request
+REPORT_ANALYSIS_ASYNC = env_bool("REPORT_ANALYSIS_ASYNC", False)
+ANALYSIS_PRIORITY_GROUPS = ["municipal"]
+ANALYSIS_HAZARD_KEYWORDS = [
+    "accident",
+    "collapse",
+    "collapsed",
+    "danger",
+    "dangerous",
+    "deep",
+    "emergency",
+    "flood",
+    "flooded",
+    "hazard",
+    "injury",
+    "sinkhole",
+    "urgent",
+]
+# Reports a single user may have in flight before extra ones go to the bulk lane
+ANALYSIS_FAIR_SHARE = int(os.environ.get("ANALYSIS_FAIR_SHARE", 5))
+# Above this many queued analyses, over-share work is also deferred
+ANALYSIS_BACKLOG_THRESHOLD = int(os.environ.get("ANALYSIS_BACKLOG_THRESHOLD", 200))
+ANALYSIS_BACKLOG_DEFER_SECONDS = 10
+ANALYSIS_MAX_DEFER_SECONDS = 600
+ANALYSIS_MAX_RETRIES = 3
+ANALYSIS_RETRY_BACKOFF_SECONDS = 30
+# Deferred analyses wait in Redis; beat moves up to this many per query into
+# their lanes once due (every ANALYSIS_DEFER_POLL_SECONDS, see CELERY_BEAT_SCHEDULE)
+ANALYSIS_DEFER_RELEASE_BATCH = 500
+# Pipelined batch analysis (reports_app/pipeline.py): workers take up to
+# ANALYSIS_BATCH_SIZE queued analyses at once, or what arrived within
+# ANALYSIS_BATCH_FLUSH_SECONDS, and predict ANALYSIS_PREDICT_BATCH_SIZE
+# images per model call while the next ones are read and decoded.
+ANALYSIS_PIPELINE = env_bool("ANALYSIS_PIPELINE", False)
+ANALYSIS_BATCH_SIZE = int(os.environ.get("ANALYSIS_BATCH_SIZE", 32))
+ANALYSIS_BATCH_FLUSH_SECONDS = float(os.environ.get("ANALYSIS_BATCH_FLUSH_SECONDS", 1))
+ANALYSIS_PREDICT_BATCH_SIZE = int(os.environ.get("ANALYSIS_PREDICT_BATCH_SIZE", 8))
+ANALYSIS_IO_THREADS = int(os.environ.get("ANALYSIS_IO_THREADS", 4))
+ANALYSIS_CPU_THREADS = int(os.environ.get("ANALYSIS_CPU_THREADS", 2))
+if ANALYSIS_PIPELINE:
+    # The batch task buffers messages itself, so workers must reserve a
+    # whole batch; lane priority then holds per batch rather than per task
+    CELERY_WORKER_PREFETCH_MULTIPLIER = ANALYSIS_BATCH_SIZE
+
+# DUPLICATE DETECTION
+# Reports whose image hash is within DUPLICATE_HASH_RADIUS bits (of 64) of an
+# open report are linked to it and reuse its severity instead of inference
+DUPLICATE_DETECTION_ENABLED = env_bool("DUPLICATE_DETECTION_ENABLED", True)
+DUPLICATE_HASH_RADIUS = int(os.environ.get("DUPLICATE_HASH_RADIUS", 10))
+DUPLICATE_MATCH_STATUSES = ["pending", "in_progress"]
+DUPLICATE_MAX_CANDIDATES = 20
+DUPLICATE_INDEX_OVERLAP_SECONDS = 60
+
+# TRIAGE PRIORITY (reports_app/priority.py)
+# Points per severity, per report type and per duplicate (up to the cap), plus
+# one point per PRIORITY_AGE_HOURS_PER_POINT of age. After changing any of
+# these run `manage.py recompute_priorities`.
+PRIORITY_SEVERITY_POINTS = {0: 0, 1: 10, 2: 20, 3: 30}
+PRIORITY_TYPE_POINTS = {"road_sink": 8, "pothole": 5, "crack": 2, "other": 0}
+PRIORITY_DUPLICATE_POINTS = 3
+PRIORITY_DUPLICATE_CAP = 10
+PRIORITY_AGE_HOURS_PER_POINT = 24
+TRIAGE_PAGE_SIZE = 50
+TRIAGE_MAX_PAGE_SIZE = 200
+
+# STATUS TRANSITIONS (reports_app/transitions.py)
+# Statuses staff may move a report to, by its current status
+REPORT_STATUS_TRANSITIONS = {
+    "pending": ["in_progress", "rejected"],
+    "in_progress": ["resolved", "pending"],
+    "resolved": ["in_progress"],
+    "rejected": ["pending"],
+}
+# Report ids one bulk status request may name
+REPORT_BULK_STATUS_MAX_IDS = 500
+
+# REPORT ARCHIVE (reports_app/archive.py)
+# Resolved and rejected reports unchanged for this long move to the archive
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 180))
+ARCHIVE_STATUSES = ["resolved", "rejected"]
+# Reports moved per batch; each batch commits on its own
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 500))
+# Batches per run, so one run never holds a worker for long
+ARCHIVE_MAX_BATCHES = int(os.environ.get("ARCHIVE_MAX_BATCHES", 20))
+
+# IDEMPOTENCY
+# Report creation with an Idempotency-Key header runs at most once per key
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+# Longer than the slowest create, so a crashed request frees its key eventually
+IDEMPOTENCY_LOCK_SECONDS = 120
+# How long a concurrent duplicate waits for the original before a 409
+IDEMPOTENCY_WAIT_SECONDS = 30
+
+# REPORT EVENTS
+# Severity and status changes pushed over /api/reports/events/ (SSE or long poll)
+REPORT_EVENTS_HEARTBEAT_SECONDS = 15
+# Streams end after this long; clients reconnect and resume from Last-Event-ID
+REPORT_EVENTS_MAX_SECONDS = int(os.environ.get("REPORT_EVENTS_MAX_SECONDS", 300))
+REPORT_EVENTS_POLL_SECONDS = int(os.environ.get("REPORT_EVENTS_POLL_SECONDS", 25))
+REPORT_EVENTS_RETRY_MS = 3000
+# Lifetime of the signed ?ticket= that lets a browser EventSource (which
+# cannot send headers) open a stream; POST /api/reports/events/ticket/
+REPORT_EVENTS_TICKET_SECONDS = 60
+# Changes replayed on resume, and events buffered per slow connection
+REPORT_EVENTS_BACKLOG = 100
+
+# EMAIL NOTIFICATIONS (reports_app/notifications.py)
+# Owners are emailed a digest of analysis results and of these status changes
+NOTIFICATIONS_ENABLED = env_bool("NOTIFICATIONS_ENABLED", False)
+NOTIFICATION_STATUSES = ["in_progress", "resolved", "rejected"]
+# Changes are collected for this long after a user's first one, then sent together
+NOTIFICATION_DIGEST_WINDOW_SECONDS = int(
+    os.environ.get("NOTIFICATION_DIGEST_WINDOW_SECONDS", 300)
+)
+# Digests sent per run, over one SMTP connection
+NOTIFICATION_BATCH_SIZE = 500
+# A digest that fails is retried after this long, doubling each time; after
+# NOTIFICATION_MAX_ATTEMPTS failures it goes to the dead-letter list
+NOTIFICATION_RETRY_BACKOFF_SECONDS = 60
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_DEAD_LETTER_SIZE = 1000
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = env_bool("EMAIL_USE_TLS", False)
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "Asphalt Aid <noreply@asphalt-aid.local>")
+
+# METRICS
+# Broker queues whose depth is reported on /metrics
+METRICS_CELERY_QUEUES = [
+    "celery",
+    "analysis.high",
+    "analysis.normal",
+    "analysis.bulk",
+    "analysis.retry",
+]
+
+# REQUEST PROFILING
+# Staff requests with "X-Profile: 1" or "?profile=1" are profiled, plus a
+# random PROFILING_SAMPLE_RATE share of all requests. Inspect the output with
+# `python -m pstats logs/profiles/<name>.prof`.
+PROFILING_ENABLED = env_bool("PROFILING_ENABLED", False)
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = os.path.join(BASE_DIR, "logs", "profiles")
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", 50))
+
+# RATE LIMITING
+# Token buckets per "<url name>:<method>". "user" rules key on the API token
+# sent with the request and fall back to the client IP when there is none.
+# "rate" refills the bucket; "burst" (default: the rate's count) is its size.
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+# Only enable behind a proxy that sets X-Forwarded-For itself
+RATE_LIMIT_TRUST_FORWARDED_FOR = env_bool("RATE_LIMIT_TRUST_FORWARDED_FOR", False)
+REPORT_CREATE_RATE_LIMITS = [
+    {"scope": "user", "rate": "10/min", "burst": 5},
+    {"scope": "ip", "rate": "30/min"},
+]
+RATE_LIMITS = {
+    "signin:POST": [{"scope": "ip", "rate": "10/min"}],
+    "signup:POST": [{"scope": "ip", "rate": "5/min"}],
+    "change-password:POST": [
+        {"scope": "user", "rate": "5/min"},
+        {"scope": "ip", "rate": "10/min"},
+    ],
+    "report-list:POST": REPORT_CREATE_RATE_LIMITS,
+    "async-report-list:POST": REPORT_CREATE_RATE_LIMITS,
+    "report-upload:POST": REPORT_CREATE_RATE_LIMITS,
+    "report-upload-confirm:POST": REPORT_CREATE_RATE_LIMITS,
+}
+
+# ANALYTICS SNAPSHOTS
+REPORT_SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots", "reports")
+REPORT_SNAPSHOT_CHUNK_SIZE = 5000
 
 # LOGGING CONFIGURATION
+# Handlers below run on one background listener thread per process; request
+# threads only enqueue records (see asphalt_aid/log_pipeline.py).
+LOGGING_CONFIG = "asphalt_aid.log_pipeline.configure_logging"
+LOG_QUEUE_ENABLED = env_bool("LOG_QUEUE_ENABLED", True)
+LOG_QUEUE_MAX_SIZE = int(os.environ.get("LOG_QUEUE_MAX_SIZE", 10000))
+# Per-template budget for per-prediction INFO logs: burst, then rate per second
+AI_LOG_SAMPLE_RATE = float(os.environ.get("AI_LOG_SAMPLE_RATE", 1))
+AI_LOG_SAMPLE_BURST = int(os.environ.get("AI_LOG_SAMPLE_BURST", 20))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "hot_path_sampler": {
+            "()": "asphalt_aid.log_pipeline.HotPathSampler",
+            "rate": AI_LOG_SAMPLE_RATE,
+            "burst": AI_LOG_SAMPLE_BURST,
+        },
+    },
     "formatters": {
         "verbose": {
             "format": "{levelname} {asctime} {module} {process:d} {thread:d} {message}",
@@ -225,6 +682,7 @@ LOGGING = {
         "ai_service.pothole_classifier": {
             "handlers": ["console", "ai_file"],
             "level": "INFO",
+            "filters": ["hot_path_sampler"],
             "propagate": False,
         },
         # Reports App Logger
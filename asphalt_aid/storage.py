@@ -0,0 +1,70 @@
+"""
+S3-compatible media storage (MEDIA_STORAGE=s3).
+
+Django reaches the bucket at S3_ENDPOINT_URL, which inside docker-compose
+is a service name clients cannot resolve. URLs handed to clients (image
+links and presigned uploads) are therefore signed for
+S3_PUBLIC_ENDPOINT_URL instead. Signing happens locally, so this costs no
+request to the bucket.
+"""
+
+from functools import lru_cache
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+
+@lru_cache(maxsize=None)
+def public_client():
+    """S3 client used only to presign URLs for clients"""
+    return boto3.client(
+        "s3",
+        endpoint_url=settings.S3_PUBLIC_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        config=Config(
+            signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+            s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+        ),
+    )
+
+
+class MediaStorage(S3Storage):
+    """S3 storage whose URLs point at the endpoint clients can reach"""
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        params = parameters.copy() if parameters else {}
+        params["Bucket"] = self.bucket_name
+        params["Key"] = self._normalize_name(clean_name(name))
+        return public_client().generate_presigned_url(
+            "get_object",
+            Params=params,
+            ExpiresIn=self.querystring_expire if expire is None else expire,
+            HttpMethod=http_method,
+        )
+
+    def presigned_upload(self, name, max_bytes, expire):
+        """Fields and URL for a browser-style POST of one image to ``name``"""
+        key = self._normalize_name(clean_name(name))
+        return public_client().generate_presigned_post(
+            self.bucket_name,
+            key,
+            Conditions=[
+                ["content-length-range", 1, max_bytes],
+                ["starts-with", "$Content-Type", "image/"],
+            ],
+            ExpiresIn=expire,
+        )
+
+    def read_head(self, name, length):
+        """The first ``length`` bytes of an object, with one ranged GET"""
+        response = self.connection.meta.client.get_object(
+            Bucket=self.bucket_name,
+            Key=self._normalize_name(clean_name(name)),
+            Range=f"bytes=0-{length - 1}",
+        )
+        return response["Body"].read()
@@ -0,0 +1,300 @@
+"""
+Rate limiting for CPU-expensive endpoints (password hashing, inference).
+
+Limits are token buckets declared per route in ``settings.RATE_LIMITS``.
+They are shared by all web workers through Redis, and each process also
+keeps its own copy of every bucket. A process only spends a local token
+when Redis admits the request, so an empty local bucket means the shared
+one is empty too. Rejections from that first tier, or while a recent Redis
+"retry after" is pending, never leave the process. A route's buckets are
+checked and debited in one Redis script, all or nothing, so a request one
+rule rejects does not use up the others. Both run in
+RateLimitMiddleware.process_view, before any database lookup or password
+hasher. Under ASGI the middleware runs on the event loop and calls Redis
+through an asyncio client, so throttling costs no thread hop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+import weakref
+from functools import lru_cache
+
+import redis.asyncio as aioredis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from asphalt_aid.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    "s": 1,
+    "sec": 1,
+    "second": 1,
+    "m": 60,
+    "min": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+}
+
+# KEYS = the route's bucket keys; ARGV = capacity and refill rate (tokens per
+# second) for each key in turn. Takes a token from every bucket only if each
+# has one, so a request rejected by one rule costs nothing from the others.
+# Returns {allowed, retry_after_seconds, index of the bucket that rejected}.
+# Uses the Redis clock so web nodes with skewed clocks still agree.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local levels = {}
+local retry_after = 0
+local rejected_by = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 and (1 - tokens) / rate > retry_after then
+        retry_after = (1 - tokens) / rate
+        rejected_by = i
+    end
+end
+if rejected_by > 0 then
+    return {0, tostring(retry_after), rejected_by}
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return {1, '0', 0}
+"""
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``"10/min"`` -> ``(10, 60)``"""
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period.strip().lower()]
+
+
+class Rule:
+    def __init__(self, route, scope, rate, burst=None):
+        count, period = parse_rate(rate)
+        self.route = route
+        self.scope = scope
+        self.capacity = float(burst or count)
+        self.refill = count / period
+
+    def key(self, identity):
+        return f"ratelimit:{self.route}:{self.scope}:{identity}"
+
+
+class LocalBuckets:
+    """First-tier, in-process token buckets plus remembered Redis rejections"""
+
+    max_keys = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.blocked_until = {}
+
+    def check(self, rule, key, now):
+        """Return seconds to wait if this process already knows it must reject"""
+        with self.lock:
+            blocked_until = self.blocked_until.get(key, 0)
+            if blocked_until > now:
+                return blocked_until - now
+            tokens = self._tokens(rule, key, now)
+            if tokens < 1:
+                return (1 - tokens) / rule.refill
+            return 0
+
+    def consume(self, rule, key, now):
+        with self.lock:
+            self.buckets[key] = (self._tokens(rule, key, now) - 1, now)
+
+    def block(self, key, until):
+        with self.lock:
+            self.blocked_until[key] = until
+
+    def _tokens(self, rule, key, now):
+        if len(self.buckets) > self.max_keys:
+            self.buckets.clear()
+            self.blocked_until.clear()
+        tokens, last = self.buckets.get(key, (rule.capacity, now))
+        return min(rule.capacity, tokens + (now - last) * rule.refill)
+
+
+local_buckets = LocalBuckets()
+
+
+def bucket_args(checks):
+    args = []
+    for rule, _ in checks:
+        args += [rule.capacity, rule.refill]
+    return args
+
+
+def bucket_result(checks, reply):
+    allowed, retry_after, rejected_by = reply
+    rejecting = checks[int(rejected_by) - 1] if rejected_by else None
+    return bool(allowed), float(retry_after), rejecting
+
+
+def redis_token_buckets(checks):
+    """Shared check of all of a route's ``(rule, key)`` pairs at once
+
+    Returns ``(allowed, retry_after, rejecting (rule, key) or None)``, or None
+    if Redis is down.
+    """
+    try:
+        connection = get_redis_connection("default")
+        script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+        reply = script(keys=[key for _, key in checks], args=bucket_args(checks))
+    except RedisError as e:
+        logger.warning(f"Rate limit store unavailable, using local limits: {str(e)}")
+        return None
+    return bucket_result(checks, reply)
+
+
+_async_scripts = weakref.WeakKeyDictionary()
+
+
+def async_token_bucket_script():
+    """The token bucket script on an asyncio client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    script = _async_scripts.get(loop)
+    if script is None:
+        cache = settings.CACHES["default"]
+        options = cache.get("OPTIONS", {})
+        client = aioredis.Redis.from_url(
+            cache["LOCATION"],
+            socket_connect_timeout=options.get("SOCKET_CONNECT_TIMEOUT"),
+            socket_timeout=options.get("SOCKET_TIMEOUT"),
+        )
+        script = _async_scripts[loop] = client.register_script(TOKEN_BUCKET_SCRIPT)
+    return script
+
+
+async def aredis_token_buckets(checks):
+    """redis_token_buckets for the event loop"""
+    try:
+        reply = await async_token_bucket_script()(
+            keys=[key for _, key in checks], args=bucket_args(checks)
+        )
+    except (RedisError, OSError) as e:
+        logger.warning(f"Rate limit store unavailable, using local limits: {str(e)}")
+        return None
+    return bucket_result(checks, reply)
+
+
+def client_ip(request):
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def client_token(request):
+    """Hashed API token as presented; never validated against the database"""
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword.lower() != "token" or not key.strip():
+        return None
+    return hashlib.sha256(key.strip().encode()).hexdigest()[:32]
+
+
+def throttled_response(retry_after):
+    wait = max(1, math.ceil(retry_after))
+    response = JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {wait} seconds."},
+        status=429,
+    )
+    response["Retry-After"] = str(wait)
+    return response
+
+
+class RateLimitMiddleware:
+    """Apply settings.RATE_LIMITS by URL name and method, in either mode"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMIT_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.rules = {
+            route: [Rule(route, **rule) for rule in rules]
+            for route, rules in settings.RATE_LIMITS.items()
+        }
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Django adapts process_view to the handler's mode, so a sync
+            # one would run on a thread under ASGI
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        now = time.monotonic()
+        route, checks, response = self.check_local(request, now)
+        if response is not None or not checks:
+            return response
+        return self.settle(route, checks, now, redis_token_buckets(checks))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        now = time.monotonic()
+        route, checks, response = self.check_local(request, now)
+        if response is not None or not checks:
+            return response
+        return self.settle(route, checks, now, await aredis_token_buckets(checks))
+
+    def check_local(self, request, now):
+        """``(route, (rule, key) pairs for Redis, 429 response or None)``"""
+        route = f"{request.resolver_match.url_name}:{request.method}"
+        checks = []
+        for rule in self.rules.get(route, ()):
+            identity = client_token(request) if rule.scope == "user" else None
+            key = rule.key(identity or f"ip-{client_ip(request)}")
+
+            retry_after = local_buckets.check(rule, key, now)
+            if retry_after:
+                RATE_LIMITED.labels(route=route, scope=rule.scope, tier="local").inc()
+                return route, checks, throttled_response(retry_after)
+            checks.append((rule, key))
+        return route, checks, None
+
+    def settle(self, route, checks, now, result):
+        """Apply the shared buckets' answer to the local ones"""
+        if result is not None and not result[0]:
+            _, retry_after, (rule, key) = result
+            local_buckets.block(key, now + retry_after)
+            RATE_LIMITED.labels(route=route, scope=rule.scope, tier="redis").inc()
+            return throttled_response(retry_after)
+
+        for rule, key in checks:
+            local_buckets.consume(rule, key, now)
+        return None
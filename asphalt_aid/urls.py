@@ -20,36 +20,21 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="AsphaltAid API Documentations",
-        default_version="v1",
-        description="API documentation for AsphaltAid",
-        terms_of_service="https://asphaltaid.com/terms/",
-        contact=openapi.Contact(email="support@asphaltaid.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from asphalt_aid.metrics import metrics_view
+from asphalt_aid.openapi import docs_view, schema_json_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/reports/", include("reports_app.api.urls")),
     path("api/users/", include("users_app.api.urls")),
-    re_path(
-        r"^swagger/$",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
-    re_path(
-        r"^redoc/$", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"
-    ),
-    path("swagger.json/", schema_view.without_ui(cache_timeout=0), name="schema-json"),
+    re_path(r"^swagger/$", docs_view("swagger"), name="schema-swagger-ui"),
+    re_path(r"^redoc/$", docs_view("redoc"), name="schema-redoc"),
+    path("swagger.json/", schema_json_view, name="schema-json"),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += static(
+    settings.ARCHIVE_MEDIA_URL, document_root=settings.ARCHIVE_MEDIA_ROOT
+)
@@ -0,0 +1,88 @@
+"""Compare the WSGI ReportViewSet with the async (ASGI) report views
+
+Both deployments must be running against the same database, e.g. with
+``docker compose up django-web django-asgi``::
+
+    python -m benchmarks.async_vs_wsgi --token <token> --image media/reports/test_image.jpg
+"""
+
+import argparse
+import json
+
+from benchmarks.client import run_concurrent, send, summarize
+
+TARGETS = {
+    "wsgi": "/api/reports/reports/",
+    "asgi": "/api/reports/async/reports/",
+}
+
+
+def make_job(base_url, path, endpoint, token, image):
+    if endpoint == "list":
+        return lambda: (endpoint, *send("GET", base_url + path, token=token)[:2])
+
+    if endpoint == "create":
+        fields = {
+            "name": "Benchmark report",
+            "description": "Created by benchmarks.async_vs_wsgi",
+            "address": "Benchmark street",
+        }
+        return lambda: (
+            endpoint,
+            *send(
+                "POST",
+                base_url + path,
+                token=token,
+                fields=fields,
+                files={"image": image},
+            )[:2],
+        )
+
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wsgi-url", default="http://localhost:8000")
+    parser.add_argument("--asgi-url", default="http://localhost:8001")
+    parser.add_argument("--token", required=True, help="API token of a test user")
+    parser.add_argument("--image", help="Image uploaded by the create benchmark")
+    parser.add_argument("--endpoint", choices=["list", "create"], default="create")
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.endpoint == "create" and not args.image:
+        parser.error("--image is required for the create benchmark")
+
+    results = []
+    base_urls = {"wsgi": args.wsgi_url, "asgi": args.asgi_url}
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        for deployment, path in TARGETS.items():
+            job = make_job(
+                base_urls[deployment], path, args.endpoint, args.token, args.image
+            )
+            samples, wall_time = run_concurrent(job, concurrency, args.requests)
+            stats = summarize(samples, wall_time)[args.endpoint]
+            results.append(
+                {"deployment": deployment, "concurrency": concurrency, **stats}
+            )
+
+    header = f"{'deployment':<10} {'conc':>5} {'rps':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['deployment']:<10} {row['concurrency']:>5} "
+            f"{row['throughput_rps']:>9.2f} {row['p50_ms']:>9.2f} "
+            f"{row['p90_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['errors']:>7}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
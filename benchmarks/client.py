@@ -0,0 +1,105 @@
+"""Small stdlib HTTP client helpers shared by the benchmark scripts"""
+
+import json
+import mimetypes
+import os
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def encode_multipart(fields, files):
+    """Encode form fields and ``{name: path}`` files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += f"--{boundary}\r\n".encode()
+        body += f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+        body += f"{value}\r\n".encode()
+    for name, path in files.items():
+        filename = os.path.basename(path)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        body += f"--{boundary}\r\n".encode()
+        body += (
+            f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        with open(path, "rb") as upload:
+            body += upload.read()
+        body += b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+def send(method, url, token=None, json_body=None, fields=None, files=None, timeout=60):
+    """Send one request and return ``(status, elapsed_seconds, parsed_body)``"""
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Token {token}"
+
+    data = None
+    if files:
+        data, headers["Content-Type"] = encode_multipart(fields or {}, files)
+    elif json_body is not None:
+        data = json.dumps(json_body).encode()
+        headers["Content-Type"] = "application/json"
+
+    request = urllib.request.Request(url, data=data, headers=headers, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        status, payload = 0, b""
+    elapsed = time.perf_counter() - started
+
+    try:
+        body = json.loads(payload) if payload else None
+    except ValueError:
+        body = None
+    return status, elapsed, body
+
+
+def run_concurrent(job, concurrency, total):
+    """Run ``job()`` ``total`` times on ``concurrency`` threads
+
+    Returns the list of ``(label, status, elapsed)`` results and the wall time.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: job(), range(total)))
+    return results, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def summarize(results, wall_time):
+    """Throughput and latency percentiles (ms) grouped by result label"""
+    groups = {}
+    for label, status, elapsed in results:
+        groups.setdefault(label, []).append((status, elapsed))
+
+    summary = {}
+    for label, samples in sorted(groups.items()):
+        latencies = sorted(elapsed * 1000 for _, elapsed in samples)
+        errors = sum(1 for status, _ in samples if not 200 <= status < 400)
+        summary[label] = {
+            "requests": len(samples),
+            "errors": errors,
+            "throughput_rps": round(len(samples) / wall_time, 2) if wall_time else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p90_ms": round(percentile(latencies, 90), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return summary
@@ -0,0 +1,325 @@
+"""Load-test the API against a throwaway local database
+
+Seeds users and reports into a temporary SQLite database, serves the app
+from a separate process and drives a weighted mix of endpoints at a fixed
+concurrency. Writes a throughput and latency-percentile report that can be
+diffed between commits::
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 30 \\
+        --mix create=1,list=5,retrieve=10,signin=1 --stub-latency-ms 80 \\
+        --output loadtest-new.json --compare loadtest-main.json
+
+``--stub-latency-ms`` swaps ``ai_service.client.classify`` for a
+fixed-latency stub so web capacity is measured apart from model cost;
+``--real-model`` keeps the TensorFlow model.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.client import send, summarize
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMAGE = os.path.join(BASE_DIR, "media", "reports", "test_image.jpg")
+SEED_PASSWORD = "LoadTest-Passw0rd!"
+SCENARIOS = ("signup", "signin", "create", "list", "retrieve")
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def prepare_environment(args, workdir):
+    """Point settings at a throwaway database and media root before setup"""
+    os.environ["DJANGO_SETTINGS_MODULE"] = "asphalt_aid.settings"
+    os.environ["DATABASE_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "loadtest.sqlite3")
+    os.environ["MEDIA_ROOT"] = os.path.join(workdir, "media")
+    os.environ["DATABASE_REPLICA_STICKY_SECONDS"] = "0"
+    # Many clients share 127.0.0.1; throttling would measure the limiter
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    # Every create uploads the same image, which would skip inference
+    os.environ["DUPLICATE_DETECTION_ENABLED"] = "false"
+    os.environ.pop("POSTGRES_REPLICA_HOSTS", None)
+    # --real-model measures the model inside the server process
+    os.environ["AI_INFERENCE_DAEMON"] = "false"
+    if not args.real_model:
+        os.environ["AI_PRELOAD_MODEL"] = "false"
+
+
+def seed(users, reports_per_user, image):
+    """Create users with tokens and reports; returns ``[(username, token, [ids])]``"""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.files.storage import default_storage
+    from rest_framework.authtoken.models import Token
+
+    from reports_app.models import Report
+
+    with open(image, "rb") as source:
+        image_name = default_storage.save(
+            f"reports/loadtest{os.path.splitext(image)[1]}", source
+        )
+
+    password = make_password(SEED_PASSWORD)
+    User.objects.bulk_create(
+        User(
+            username=f"loadtest{index}",
+            email=f"loadtest{index}@example.com",
+            first_name="Load",
+            last_name="Test",
+            password=password,
+        )
+        for index in range(users)
+    )
+    created = list(User.objects.filter(username__startswith="loadtest").order_by("id"))
+    tokens = Token.objects.bulk_create(
+        Token(key=Token.generate_key(), user=user) for user in created
+    )
+    Report.objects.bulk_create(
+        Report(
+            user=user,
+            image=image_name,
+            name=f"Seeded report {index}",
+            description="Seeded by benchmarks.loadtest",
+            address="Load test street",
+        )
+        for user in created
+        for index in range(reports_per_user)
+    )
+
+    report_ids = {}
+    for user_id, report_id in Report.objects.values_list("user_id", "id"):
+        report_ids.setdefault(user_id, []).append(report_id)
+    return [
+        (user.username, token.key, report_ids.get(user.id, []))
+        for user, token in zip(created, tokens)
+    ]
+
+
+def serve(server, stub_latency_ms):
+    """Server process: install the inference stub, then serve forever"""
+    if stub_latency_ms is not None:
+        # Views bind classify on import, which happens on the first request,
+        # so patching the module attributes here is enough.
+        from ai_service import client
+        from ai_service.stub import make_classify
+
+        client.classify = make_classify(stub_latency_ms)
+
+    from django.core.wsgi import get_wsgi_application
+
+    server.set_app(get_wsgi_application())
+    server.serve_forever()
+
+
+def start_server(stub_latency_ms):
+    """Bind in this process, then fork the process that serves requests"""
+    import multiprocessing
+
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.db import connections
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    connections.close_all()
+    process = multiprocessing.get_context("fork").Process(
+        target=serve, args=(server, stub_latency_ms), daemon=True
+    )
+    process.start()
+    host, port = server.server_address
+    server.server_close()
+    return process, f"http://{host}:{port}"
+
+
+def run_load(base_url, accounts, mix, concurrency, duration, image):
+    """Closed-loop clients: each thread runs scenarios back to back until the deadline"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    signup_counter = itertools.count()
+    results = []
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def scenario_request(name, account):
+        username, token, report_ids = account
+        if name == "signup":
+            number = next(signup_counter)
+            return send(
+                "POST",
+                f"{base_url}/api/users/auth/signup/",
+                json_body={
+                    "username": f"signup{number}",
+                    "email": f"signup{number}@example.com",
+                    "password": SEED_PASSWORD,
+                    "confirm_password": SEED_PASSWORD,
+                    "first_name": "Load",
+                    "last_name": "Test",
+                },
+            )
+        if name == "signin":
+            return send(
+                "POST",
+                f"{base_url}/api/users/auth/signin/",
+                json_body={"username": username, "password": SEED_PASSWORD},
+            )
+        if name == "create":
+            return send(
+                "POST",
+                f"{base_url}/api/reports/reports/",
+                token=token,
+                fields={
+                    "name": "Load test report",
+                    "description": "Created by benchmarks.loadtest",
+                    "address": "Load test street",
+                },
+                files={"image": image},
+            )
+        if name == "list" or not report_ids:
+            return send("GET", f"{base_url}/api/reports/reports/", token=token)
+        report_id = random.choice(report_ids)
+        return send("GET", f"{base_url}/api/reports/reports/{report_id}/", token=token)
+
+    def client(account):
+        rng = random.Random()
+        samples = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            status, elapsed, _ = scenario_request(name, account)
+            samples.append((name, status, elapsed))
+        with results_lock:
+            results.extend(samples)
+
+    threads = [
+        threading.Thread(target=client, args=(accounts[index % len(accounts)],))
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report, baseline=None):
+    columns = ("requests", "errors", "throughput_rps", "p50_ms", "p90_ms", "p99_ms")
+    header = f"{'scenario':<10}" + "".join(f"{column:>16}" for column in columns)
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["results"].items():
+        print(f"{name:<10}" + "".join(f"{stats[column]:>16}" for column in columns))
+        if baseline and name in baseline["results"]:
+            before = baseline["results"][name]
+            deltas = []
+            for column in columns:
+                if before[column]:
+                    change = (stats[column] - before[column]) / before[column] * 100
+                    deltas.append(f"{change:>+15.1f}%")
+                else:
+                    deltas.append(f"{'n/a':>16}")
+            print(f"{'  vs base':<10}" + "".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("signin=1,create=1,list=5,retrieve=10"),
+        help="Scenario weights, e.g. signup=0.2,signin=1,create=1,list=5,retrieve=10",
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--reports-per-user", type=int, default=20)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    inference = parser.add_mutually_exclusive_group()
+    inference.add_argument("--stub-latency-ms", type=float, default=50)
+    inference.add_argument("--real-model", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="asphalt-loadtest-")
+    prepare_environment(args, workdir)
+    sys.path.insert(0, BASE_DIR)
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    server = None
+    try:
+        call_command("migrate", verbosity=0)
+        accounts = seed(args.users, args.reports_per_user, args.image)
+        stub_latency = None if args.real_model else args.stub_latency_ms
+        server, base_url = start_server(stub_latency)
+
+        samples, wall_time = run_load(
+            base_url, accounts, args.mix, args.concurrency, args.duration, args.image
+        )
+        results = summarize(samples, wall_time)
+        results["all"] = summarize(
+            [("all", status, elapsed) for _, status, elapsed in samples], wall_time
+        )["all"]
+
+        report = {
+            "revision": git_revision(),
+            "concurrency": args.concurrency,
+            "duration_s": round(wall_time, 2),
+            "mix": args.mix,
+            "inference": "model" if args.real_model else f"stub {stub_latency}ms",
+            "results": results,
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print(
+        f"revision {report['revision']}, concurrency {report['concurrency']}, "
+        f"{report['duration_s']}s, inference: {report['inference']}"
+    )
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
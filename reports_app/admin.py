@@ -1,5 +1,9 @@
 from django.contrib import admin
-from reports_app.models import Report
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import F, Q
+from reports_app.models import ArchivedReport, Report
+from reports_app.events import publish_report_event
+from reports_app.search import search_condition
 
 
 @admin.register(Report)
@@ -11,14 +15,65 @@ class ReportAdmin(admin.ModelAdmin):
         "report_type",
         "get_severity_display",
         "status",
+        "duplicate_count",
         "created_at",
     )
-    list_filter = ("status", "report_type", "severity", "created_at")
-    search_fields = ("user__username", "description", "address", "name")
+    list_filter = ("status", "report_type", "severity", "needs_retake", "created_at")
+    # Name, description and address go through the full-text index, and
+    # usernames match anywhere (see get_search_results)
+    search_fields = ("user__username",)
     ordering = ("-created_at",)
-    readonly_fields = ("severity", "created_at", "updated_at", "report_type")
+    readonly_fields = (
+        "severity",
+        "created_at",
+        "updated_at",
+        "report_type",
+        "model_version",
+        "needs_retake",
+        "retake_reason",
+        "image_phash",
+        "duplicate_of",
+        "duplicate_count",
+        "priority_score",
+    )
 
     def get_severity_display(self, obj):
         return f"{obj.severity}/3 - {obj.get_severity_display()}"
 
     get_severity_display.short_description = "AI Severity"
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        matches, rank = search_condition(queryset, term)
+        results = queryset.filter(matches | Q(user__username__icontains=term)).annotate(
+            search_rank=rank
+        )
+        # Best text matches first, then username-only ones, unless a column
+        # header was clicked
+        if ORDER_VAR not in request.GET:
+            results = results.order_by(F("search_rank").desc(nulls_last=True), "-created_at")
+        return results, False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "status" in form.changed_data:
+            publish_report_event(obj, "status")
+
+
+@admin.register(ArchivedReport)
+class ArchivedReportAdmin(admin.ModelAdmin):
+    """Read-only; the archive may be another database, so no joins to users"""
+
+    list_display = ("id", "user_id", "name", "report_type", "status", "created_at", "archived_at")
+    list_filter = ("status", "report_type", "archived_at")
+    list_select_related = ()
+    search_fields = ("=id",)
+    ordering = ("-archived_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,115 @@
+import io
+import logging
+
+from django.conf import settings
+
+from ai_service.phash import perceptual_hash, to_signed
+from ai_service.client import classify
+from ai_service.quality import check_quality
+from reports_app.duplicates import duplicate_index
+from reports_app.events import publish_report_event
+from reports_app.priority import adjust_duplicate_count
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_FIELDS = [
+    "severity",
+    "model_version",
+    "needs_retake",
+    "retake_reason",
+    "image_phash",
+    "duplicate_of",
+    "updated_at",
+]
+
+
+def image_source(report):
+    """What the classifier reads: the local path if there is one, else the bytes
+
+    Object storage has no local path; the image is streamed from the bucket
+    into memory instead of being written to disk first.
+    """
+    try:
+        return report.image.path
+    except NotImplementedError:
+        with report.image.open("rb") as image:
+            return image.read()
+
+
+def as_file(source):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def flag_retake(report, reason):
+    """Record the quality check's verdict; True if the image must be retaken"""
+    report.needs_retake = reason is not None
+    report.retake_reason = reason or ""
+    if reason is not None:
+        report.model_version = ""
+        logger.info(f"✗ Report {report.id} image rejected as {reason}, skipping analysis")
+    return report.needs_retake
+
+
+def check_image(report, source):
+    """Run the quality gate on the report's image; True if it is usable"""
+    return not flag_retake(report, check_quality(as_file(source)))
+
+
+def link_duplicate(report, image_phash=None, source=None):
+    """Hash the image and link the report to an open near-duplicate, if any
+
+    A linked report takes the original's severity, so the model can be skipped.
+    Pass ``image_phash`` if the hash was already computed, or the image's
+    ``source`` (see ``image_source``) if it was already read.
+    Call ``count_duplicate`` once the report is saved.
+    """
+    if not settings.DUPLICATE_DETECTION_ENABLED:
+        return None
+    try:
+        if image_phash is None:
+            source = image_source(report) if source is None else source
+            image_phash = to_signed(perceptual_hash(as_file(source)))
+        report.image_phash = image_phash
+        original = duplicate_index.find(report.image_phash, exclude=report.id)
+    except Exception as e:
+        logger.error(f"✗ Duplicate check failed for report {report.id}: {str(e)}")
+        return None
+
+    if original is not None:
+        report.duplicate_of = original
+        report.severity = original.severity
+        report.model_version = original.model_version
+        logger.info(
+            f"✓ Report {report.id} is a near-duplicate of report {original.id}, "
+            f"reusing severity {original.severity}"
+        )
+    return original
+
+
+def count_duplicate(report, original, previous_original_id):
+    """Raise the original's duplicate count, unless this report was already linked"""
+    if original is not None and original.id != previous_original_id:
+        adjust_duplicate_count(original.id, 1)
+
+
+def apply_classification(report, result):
+    report.severity = result["severity"]
+    report.model_version = result["model_version"] or ""
+
+
+def analyze_report(report):
+    """Run AI severity analysis on a report's image and store the result"""
+    previous_original_id = report.duplicate_of_id
+    source = image_source(report)
+    original = None
+    if check_image(report, source):
+        original = link_duplicate(report, source=source)
+        if original is None:
+            apply_classification(report, classify(source))
+            logger.info(
+                f"✓ Report {report.id} severity updated to {report.severity} by AI analysis"
+            )
+    report.save(update_fields=ANALYSIS_FIELDS)
+    count_duplicate(report, original, previous_original_id)
+    publish_report_event(report, "severity")
+    return report.severity
@@ -1,5 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
-from reports_app.models import Report
+from reports_app.models import ArchivedReport, Report
+from reports_app.priority import current_priority
+from reports_app.transitions import source_statuses
 
 
 class ReportSerializer(serializers.ModelSerializer):
@@ -12,4 +15,56 @@ class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = "__all__"
-        read_only_fields = ["user", "created_at", "updated_at", "status", "severity"]
+        read_only_fields = [
+            "user",
+            "created_at",
+            "updated_at",
+            "status",
+            "severity",
+            "model_version",
+            "needs_retake",
+            "retake_reason",
+            "image_phash",
+            "duplicate_of",
+            "duplicate_count",
+            "priority_score",
+        ]
+
+
+class ArchivedReportSerializer(serializers.ModelSerializer):
+    """Output only: archived reports are shaped like ReportSerializer's"""
+
+    class Meta:
+        model = ArchivedReport
+        fields = "__all__"
+
+
+class TriageReportSerializer(ReportSerializer):
+    priority = serializers.SerializerMethodField(
+        help_text="Current priority points, including time waiting",
+    )
+
+    def get_priority(self, obj):
+        return round(current_priority(obj.priority_score), 2)
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.REPORT_BULK_STATUS_MAX_IDS,
+    )
+    to_status = serializers.ChoiceField(choices=Report.STATUS_CHOICES)
+    from_status = serializers.ChoiceField(
+        choices=Report.STATUS_CHOICES,
+        required=False,
+        help_text="Only change reports currently in this status",
+    )
+
+    def validate(self, attrs):
+        if not source_statuses(attrs["to_status"], attrs.get("from_status")):
+            origin = attrs.get("from_status", "any status")
+            raise serializers.ValidationError(
+                {"to_status": f"Reports cannot move from {origin} to {attrs['to_status']}"}
+            )
+        return attrs
@@ -1,10 +1,41 @@
 from django.urls import path, include
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 from reports_app.api.views.reports_views import ReportViewSet
+from reports_app.api.views.analysis_views import AnalysisQueueView
+from reports_app.api.views.async_reports_views import (
+    AsyncReportListView,
+    AsyncReportDetailView,
+)
+from reports_app.api.views.events_views import EventTicketView, ReportEventsView
+from reports_app.api.views.triage_views import TriageQueueView
+from reports_app.api.views.status_views import BulkStatusView
+from reports_app.api.views.upload_views import ConfirmUploadView, DirectUploadView
 
 router = DefaultRouter()
 router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('analysis-queue/', AnalysisQueueView.as_view(), name='analysis-queue'),
+    path(
+        'async/reports/',
+        csrf_exempt(AsyncReportListView.as_view()),
+        name='async-report-list',
+    ),
+    path(
+        'async/reports/<int:pk>/',
+        csrf_exempt(AsyncReportDetailView.as_view()),
+        name='async-report-detail',
+    ),
+    path('events/', ReportEventsView.as_view(), name='report-events'),
+    path('events/ticket/', EventTicketView.as_view(), name='report-events-ticket'),
+    path('triage/', TriageQueueView.as_view(), name='report-triage'),
+    path('bulk-status/', BulkStatusView.as_view(), name='report-bulk-status'),
+    path('uploads/', DirectUploadView.as_view(), name='report-upload'),
+    path(
+        'uploads/confirm/',
+        ConfirmUploadView.as_view(),
+        name='report-upload-confirm',
+    ),
 ]
\ No newline at end of file
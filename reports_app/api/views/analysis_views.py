@@ -0,0 +1,25 @@
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reports_app.scheduling import deferred_count, lane_stats
+
+
+class AnalysisQueueView(APIView):
+    """Depth and wait time of each AI analysis lane (staff only)"""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        lanes = lane_stats()
+        return Response(
+            {
+                "detail": "Analysis queue retrieved successfully",
+                "backlog": sum(lane["depth"] or 0 for lane in lanes.values()),
+                "lanes": lanes,
+                "deferred": deferred_count(),
+            },
+            status=status.HTTP_200_OK,
+        )
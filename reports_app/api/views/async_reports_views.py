@@ -0,0 +1,275 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.authtoken.models import Token
+
+from reports_app.models import Report
+from reports_app.api.serializers.reports import (
+    ArchivedReportSerializer,
+    ReportSerializer,
+)
+from reports_app.api.views.reports_views import (
+    analysis_detail,
+    newest_first,
+    queue_analysis,
+    wants_archived,
+)
+from reports_app.archive import archived_reports, get_archived_report
+from reports_app.scheduling import enqueue_analysis, enqueue_retry
+from reports_app.search import search_reports
+from reports_app.analysis import (
+    ANALYSIS_FIELDS,
+    apply_classification,
+    check_image,
+    count_duplicate,
+    image_source,
+    link_duplicate,
+)
+from reports_app.idempotency import (
+    IdempotencyError,
+    arun_idempotent,
+    request_fingerprint,
+    validate_key,
+)
+from ai_service.client import InferenceUnavailable, classify
+
+logger = logging.getLogger(__name__)
+
+# Bounded pools: requests waiting on inference are coroutines, not threads.
+# Each inference thread keeps its own connection to the inference daemon.
+inference_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_INFERENCE_WORKERS, thread_name_prefix="inference"
+)
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_IO_WORKERS, thread_name_prefix="report-io"
+)
+
+
+async def run_in_executor(executor, func, *args):
+    """Run a blocking call on one of the bounded pools"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def authenticate(request):
+    """Resolve a DRF token header (``Authorization: Token <key>``) to a user"""
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword.lower() != "token" or not key.strip():
+        return None
+    try:
+        token = await Token.objects.select_related("user").aget(key=key.strip())
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+def unauthorized():
+    return JsonResponse(
+        {"detail": "Authentication credentials were not provided."}, status=401
+    )
+
+
+class AsyncReportListView(View):
+    """Async counterpart of ReportViewSet list/create for ASGI deployments"""
+
+    async def get(self, request, *args, **kwargs):
+        """List all reports for the authenticated user, or search them with ?q="""
+        user = await authenticate(request)
+        if user is None:
+            return unauthorized()
+
+        try:
+            queryset = Report.objects.filter(user=user).order_by("-created_at")
+            query = request.GET.get("q", "").strip()
+            if query:
+                queryset = search_reports(queryset, query)[
+                    : settings.REPORT_SEARCH_MAX_RESULTS
+                ]
+            reports = [report async for report in queryset]
+            data = ReportSerializer(
+                reports, many=True, context={"request": request}
+            ).data
+            if not query and wants_archived(request.GET):
+                archived = [report async for report in archived_reports(user)]
+                data = newest_first(
+                    data,
+                    ArchivedReportSerializer(
+                        archived, many=True, context={"request": request}
+                    ).data,
+                )
+            return JsonResponse(
+                {
+                    "detail": f"Retrieved {len(data)} reports successfully",
+                    "count": len(data),
+                    "reports": data,
+                },
+                status=200,
+            )
+        except Exception as e:
+            return JsonResponse(
+                {"detail": f"An error occurred while retrieving reports: {str(e)}"},
+                status=500,
+            )
+
+    async def post(self, request, *args, **kwargs):
+        """Create a new report with AI severity analysis"""
+        user = await authenticate(request)
+        if user is None:
+            return unauthorized()
+
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return await self.create_report(request, user)
+
+        async def handler():
+            response = await self.create_report(request, user)
+            return response.status_code, json.loads(response.content)
+
+        try:
+            key = validate_key(key)
+            # Reading request.POST parses the multipart body
+            fingerprint = await run_in_executor(
+                io_executor, fingerprint_report_data, request
+            )
+            status, data, replayed = await arun_idempotent(
+                user.id, key, fingerprint, handler
+            )
+        except IdempotencyError as e:
+            response = JsonResponse({"detail": e.detail}, status=e.status)
+            if e.retry_after:
+                response["Retry-After"] = str(e.retry_after)
+            return response
+
+        response = JsonResponse(data, status=status)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
+
+    async def create_report(self, request, user):
+        """Validate, save and analyse one report"""
+        try:
+            # Multipart parsing and image validation touch temp files and decode
+            # the upload, so keep them off the event loop.
+            serializer = await run_in_executor(
+                io_executor, validate_report_data, request
+            )
+            if not serializer.is_valid():
+                return JsonResponse(
+                    {"detail": "Validation errors", "errors": serializer.errors},
+                    status=400,
+                )
+
+            fields = dict(serializer.validated_data)
+            image = fields.pop("image", None)
+            if image:
+                fields["image"] = await run_in_executor(
+                    io_executor, store_image, image
+                )
+
+            report = await Report.objects.acreate(user=user, **fields)
+
+            if report.image and settings.REPORT_ANALYSIS_ASYNC:
+                await sync_to_async(queue_analysis)(report, enqueue_analysis, report)
+            elif report.image:
+                try:
+                    source = await run_in_executor(io_executor, image_source, report)
+                    original = None
+                    if await run_in_executor(io_executor, check_image, report, source):
+                        # Duplicate lookup hashes the image and queries the ORM
+                        original = await sync_to_async(link_duplicate)(
+                            report, source=source
+                        )
+                        if original is None:
+                            result = await run_in_executor(
+                                inference_executor, classify, source
+                            )
+                            apply_classification(report, result)
+                            logger.info(
+                                f"✓ Report {report.id} severity updated to {report.severity} by AI analysis"
+                            )
+                    await report.asave(update_fields=ANALYSIS_FIELDS)
+                    await sync_to_async(count_duplicate)(report, original, None)
+                except InferenceUnavailable:
+                    # Left unanalysed for the retry lane rather than given a guess
+                    await sync_to_async(queue_analysis)(
+                        report, enqueue_retry, report.id, report.user_id, 1
+                    )
+                except Exception as ai_error:
+                    logger.error(
+                        f"✗ AI prediction failed for report {report.id}: {str(ai_error)}"
+                    )
+
+            data = ReportSerializer(report, context={"request": request}).data
+            return JsonResponse(
+                {
+                    "detail": "Report created successfully"
+                    + analysis_detail(report),
+                    "report": data,
+                },
+                status=201,
+            )
+        except Exception as e:
+            return JsonResponse(
+                {"detail": f"An error occurred while creating report: {str(e)}"},
+                status=500,
+            )
+
+
+class AsyncReportDetailView(View):
+    """Async counterpart of ReportViewSet retrieve for ASGI deployments"""
+
+    async def get(self, request, pk, *args, **kwargs):
+        """Retrieve a specific report"""
+        user = await authenticate(request)
+        if user is None:
+            return unauthorized()
+
+        try:
+            report = await Report.objects.aget(pk=pk, user=user)
+            data = ReportSerializer(report, context={"request": request}).data
+            return JsonResponse(
+                {"detail": "Report retrieved successfully", "report": data},
+                status=200,
+            )
+        except Report.DoesNotExist:
+            archived = await sync_to_async(get_archived_report)(user, pk)
+            if archived is None:
+                return JsonResponse({"detail": "Report not found"}, status=404)
+            data = ArchivedReportSerializer(archived, context={"request": request}).data
+            return JsonResponse(
+                {"detail": "Archived report retrieved successfully", "report": data},
+                status=200,
+            )
+        except Exception as e:
+            return JsonResponse(
+                {"detail": f"An error occurred while retrieving report: {str(e)}"},
+                status=500,
+            )
+
+
+def validate_report_data(request):
+    """Parse the multipart body and run serializer validation"""
+    data = request.POST.copy()
+    data.update(request.FILES)
+    serializer = ReportSerializer(data=data, context={"request": request})
+    serializer.is_valid()
+    return serializer
+
+
+def fingerprint_report_data(request):
+    """Parse the multipart body and hash it for Idempotency-Key checks"""
+    return request_fingerprint(request.POST, request.FILES)
+
+
+def store_image(image):
+    """Write the upload to media storage and return its stored name"""
+    upload_to = Report._meta.get_field("image").upload_to
+    return default_storage.save(os.path.join(upload_to, image.name), image)
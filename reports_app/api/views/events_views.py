@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from redis.exceptions import RedisError
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reports_app.models import Report
+from reports_app.events import (
+    get_hub,
+    issue_ticket,
+    parse_event_id,
+    report_event,
+    ticket_user_id,
+)
+from reports_app.api.views.async_reports_views import authenticate, unauthorized
+
+logger = logging.getLogger(__name__)
+
+
+class ReportEventsView(View):
+    """Push the user's report severity and status changes
+
+    Server-sent events by default. With ``?poll=1`` it answers as a long
+    poll instead: a JSON list of events, returned when the first one arrives
+    or after REPORT_EVENTS_POLL_SECONDS. Resume either mode with the last
+    event id seen (``Last-Event-ID`` header or ``?last_event_id=``).
+
+    Authenticate with the token header, or with ``?ticket=`` from
+    EventTicketView where headers cannot be set (EventSource).
+
+    Both responses are async iterators, so under ASGI the wait happens on the
+    event loop and holds no worker thread. Under WSGI Django would consume the
+    whole iterator before sending anything, holding a sync worker throughout,
+    so there the endpoint answers 400 instead.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {
+                    "detail": "Report events are only served by the ASGI "
+                    "server (the django-asgi service)"
+                },
+                status=400,
+            )
+
+        user = await authenticate(request)
+        if user is None and "ticket" in request.GET:
+            user = await ticket_user(request.GET["ticket"])
+        if user is None:
+            return unauthorized()
+
+        since = parse_event_id(
+            request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        )
+        if request.GET.get("poll"):
+            response = StreamingHttpResponse(
+                long_poll(user, since), content_type="application/json"
+            )
+        else:
+            response = StreamingHttpResponse(
+                event_stream(user, since), content_type="text/event-stream"
+            )
+            response["X-Accel-Buffering"] = "no"
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class EventTicketView(APIView):
+    """Issue a short-lived ticket for opening the event stream
+
+    The ticket goes in the stream URL (``?ticket=``) in place of the API
+    token, which would otherwise end up in access logs and browser history.
+    It expires after REPORT_EVENTS_TICKET_SECONDS, so get a new one for each
+    (re)connection.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return Response(
+            {
+                "detail": "Event stream ticket issued",
+                "ticket": issue_ticket(request.user),
+                "expires_in": settings.REPORT_EVENTS_TICKET_SECONDS,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+async def ticket_user(ticket):
+    user_id = ticket_user_id(ticket)
+    if user_id is None:
+        return None
+    return await get_user_model().objects.filter(id=user_id, is_active=True).afirst()
+
+
+async def missed_events(user, since):
+    """Reports changed after ``since``, for clients resuming a stream"""
+    if since is None:
+        return []
+    reports = Report.objects.filter(user=user, updated_at__gt=since).order_by(
+        "updated_at"
+    )[: settings.REPORT_EVENTS_BACKLOG]
+    return [report_event(report, "report") async for report in reports]
+
+
+def format_event(event):
+    # Batch events carry a list of reports
+    data = event["reports"] if "reports" in event else event["report"]
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['event']}\n"
+        f"data: {json.dumps(data)}\n\n"
+    )
+
+
+async def event_stream(user, since):
+    """SSE body: replay missed changes, then relay live ones with heartbeats"""
+    hub = get_hub()
+    try:
+        # Subscribe before the catch-up query so nothing falls in between
+        queue = await hub.subscribe(user.id)
+    except (RedisError, OSError) as e:
+        logger.error(f"✗ Report events unavailable for user {user.id}: {str(e)}")
+        return
+
+    try:
+        yield f"retry: {settings.REPORT_EVENTS_RETRY_MS}\n\n"
+        for event in await missed_events(user, since):
+            yield format_event(event)
+
+        loop = asyncio.get_running_loop()
+        # Bounded so proxies and clients periodically reconnect and resume
+        deadline = loop.time() + settings.REPORT_EVENTS_MAX_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            timeout = min(settings.REPORT_EVENTS_HEARTBEAT_SECONDS, remaining)
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(json.loads(message))
+    finally:
+        await hub.unsubscribe(user.id, queue)
+
+
+async def long_poll(user, since):
+    """Long-poll body: one JSON document, sent once there is something to say"""
+    hub = get_hub()
+    queue = None
+    events = []
+    try:
+        queue = await hub.subscribe(user.id)
+        events = await missed_events(user, since)
+        if not events:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), settings.REPORT_EVENTS_POLL_SECONDS
+                )
+                events.append(json.loads(message))
+            except asyncio.TimeoutError:
+                pass
+        while not queue.empty():
+            events.append(json.loads(queue.get_nowait()))
+    except (RedisError, OSError) as e:
+        logger.error(f"✗ Report events unavailable for user {user.id}: {str(e)}")
+    finally:
+        if queue is not None:
+            await hub.unsubscribe(user.id, queue)
+
+    yield json.dumps(
+        {
+            "detail": f"Retrieved {len(events)} report events",
+            "events": events,
+            "last_event_id": events[-1]["id"] if events else None,
+        }
+    )
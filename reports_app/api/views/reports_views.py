@@ -1,9 +1,24 @@
+from django.conf import settings
+from django.http import Http404
 from rest_framework import viewsets, permissions, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
 from reports_app.models import Report
-from reports_app.api.serializers.reports import ReportSerializer
-from ai_service.pothole_classifier import predict_severity
+from reports_app.api.serializers.reports import (
+    ArchivedReportSerializer,
+    ReportSerializer,
+)
+from reports_app.archive import archived_reports, get_archived_report
+from reports_app.analysis import analyze_report
+from reports_app.scheduling import BROKER_ERRORS, enqueue_analysis, enqueue_retry
+from ai_service.client import InferenceUnavailable
+from reports_app.search import search_reports
+from reports_app.idempotency import (
+    IdempotencyError,
+    request_fingerprint,
+    run_idempotent,
+    validate_key,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,18 +31,35 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return only the reports created by the logged-in user"""
+        if getattr(self, "swagger_fake_view", False):
+            return Report.objects.none()
         return Report.objects.filter(user=self.request.user).order_by("-created_at")
 
     def list(self, request, *args, **kwargs):
-        """List all reports for the authenticated user"""
+        """List all reports for the authenticated user, or search them with ?q=
+
+        ``?include_archived=1`` adds archived reports (not searched).
+        """
         try:
             queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
+            query = request.query_params.get("q", "").strip()
+            if query:
+                queryset = search_reports(queryset, query)[
+                    : settings.REPORT_SEARCH_MAX_RESULTS
+                ]
+            data = self.get_serializer(queryset, many=True).data
+            if not query and wants_archived(request.query_params):
+                archived = ArchivedReportSerializer(
+                    archived_reports(request.user),
+                    many=True,
+                    context=self.get_serializer_context(),
+                ).data
+                data = newest_first(data, archived)
             return Response(
                 {
-                    "detail": f"Retrieved {len(serializer.data)} reports successfully",
-                    "count": len(serializer.data),
-                    "reports": serializer.data,
+                    "detail": f"Retrieved {len(data)} reports successfully",
+                    "count": len(data),
+                    "reports": data,
                 },
                 status=status.HTTP_200_OK,
             )
@@ -39,37 +71,45 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         """Create a new report with AI severity analysis"""
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return self.create_report(request)
+
+        def handler():
+            response = self.create_report(request)
+            return response.status_code, response.data
+
+        try:
+            key = validate_key(key)
+            fingerprint = request_fingerprint(request.data, request.FILES)
+            status_code, data, replayed = run_idempotent(
+                request.user.id, key, fingerprint, handler
+            )
+        except IdempotencyError as e:
+            response = Response({"detail": e.detail}, status=e.status)
+            if e.retry_after:
+                response["Retry-After"] = str(e.retry_after)
+            return response
+
+        response = Response(data, status=status_code)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
+
+    def create_report(self, request):
+        """Validate, save and analyse one report"""
         try:
             serializer = self.get_serializer(data=request.data)
 
             if serializer.is_valid():
                 report = serializer.save(user=request.user)
-
-                if report.image:
-                    logger.info(
-                        f"Image detected for report {report.id}: {report.image.path}"
-                    )
-                    logger.info("Calling AI prediction...")
-                    try:
-                        severity = predict_severity(report.image.path)
-                        logger.info(f"AI predicted severity: {severity}")
-
-                        report.severity = severity
-                        report.save(update_fields=["severity"])
-                        logger.info(
-                            f"✓ Report {report.id} severity updated to {severity} by AI analysis"
-                        )
-
-                    except Exception as ai_error:
-                        logger.error(
-                            f"✗ AI prediction failed for report {report.id}: {str(ai_error)}"
-                        )
+                start_analysis(report)
 
                 response_serializer = self.get_serializer(report)
                 return Response(
                     {
                         "detail": "Report created successfully"
-                        + (" with AI severity analysis" if report.image else ""),
+                        + analysis_detail(report),
                         "report": response_serializer.data,
                     },
                     status=status.HTTP_201_CREATED,
@@ -86,7 +126,7 @@ class ReportViewSet(viewsets.ModelViewSet):
             )
 
     def retrieve(self, request, *args, **kwargs):
-        """Retrieve a specific report"""
+        """Retrieve a specific report, from the archive if it was archived"""
         try:
             instance = self.get_object()
             serializer = self.get_serializer(instance)
@@ -94,9 +134,18 @@ class ReportViewSet(viewsets.ModelViewSet):
                 {"detail": "Report retrieved successfully", "report": serializer.data},
                 status=status.HTTP_200_OK,
             )
-        except Report.DoesNotExist:
+        except (Report.DoesNotExist, Http404):
+            archived = get_archived_report(request.user, kwargs.get("pk"))
+            if archived is None:
+                return Response(
+                    {"detail": "Report not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            serializer = ArchivedReportSerializer(
+                archived, context=self.get_serializer_context()
+            )
             return Response(
-                {"detail": "Report not found"}, status=status.HTTP_404_NOT_FOUND
+                {"detail": "Archived report retrieved successfully", "report": serializer.data},
+                status=status.HTTP_200_OK,
             )
         except Exception as e:
             return Response(
@@ -240,3 +289,51 @@ class ReportViewSet(viewsets.ModelViewSet):
                 {"detail": f"An error occurred while deleting report: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+def start_analysis(report):
+    """Queue or run AI analysis of a new report's image"""
+    if report.image and settings.REPORT_ANALYSIS_ASYNC:
+        queue_analysis(report, enqueue_analysis, report)
+    elif report.image:
+        try:
+            analyze_report(report)
+        except InferenceUnavailable:
+            # Left unanalysed for the retry lane rather than given a guess
+            queue_analysis(report, enqueue_retry, report.id, report.user_id, 1)
+        except Exception as ai_error:
+            logger.error(
+                f"✗ AI prediction failed for report {report.id}: {str(ai_error)}"
+            )
+
+
+def queue_analysis(report, enqueue, *args):
+    """Queue analysis of a saved report; if the broker is down, it stays pending"""
+    try:
+        enqueue(*args)
+        report.analysis_queued = True
+    except BROKER_ERRORS as e:
+        logger.error(f"✗ Could not queue analysis of report {report.id}: {str(e)}")
+        report.analysis_pending = True
+
+
+def analysis_detail(report):
+    """Suffix for the create response describing what happened to the image"""
+    if not report.image:
+        return ""
+    if getattr(report, "analysis_pending", False):
+        return ", AI severity analysis pending"
+    if settings.REPORT_ANALYSIS_ASYNC or getattr(report, "analysis_queued", False):
+        return ", AI severity analysis queued"
+    if report.needs_retake:
+        return ", but the image is unusable; please retake the photo"
+    return " with AI severity analysis"
+
+
+def wants_archived(params):
+    return params.get("include_archived", "").lower() in ("1", "true", "yes")
+
+
+def newest_first(reports, archived):
+    """Serialized hot and archived reports as one list, newest first"""
+    return sorted([*reports, *archived], key=lambda report: report["created_at"], reverse=True)
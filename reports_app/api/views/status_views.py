@@ -0,0 +1,47 @@
+import logging
+
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reports_app.api.serializers.reports import BulkStatusSerializer
+from reports_app.transitions import transition_reports
+
+logger = logging.getLogger(__name__)
+
+
+class BulkStatusView(APIView):
+    """Move many reports to a new status in one request (staff only)"""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"detail": "Validation errors", "errors": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = serializer.validated_data
+        try:
+            changed, skipped = transition_reports(
+                data["ids"], data["to_status"], data.get("from_status")
+            )
+        except Exception as e:
+            logger.error(f"✗ Bulk status change to {data['to_status']} failed: {str(e)}")
+            return Response(
+                {"detail": f"An error occurred while updating report statuses: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(
+            {
+                "detail": f"Moved {len(changed)} reports to {data['to_status']}",
+                "changed": changed,
+                "skipped": skipped,
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,90 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reports_app.api.serializers.reports import TriageReportSerializer
+from reports_app.models import Report
+from reports_app.priority import OPEN_STATUS_SQL, OPEN_STATUSES
+
+
+def encode_cursor(report):
+    raw = json.dumps([report.priority_score, report.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """(priority_score, id) of the last report on the previous page"""
+    try:
+        score, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(report_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+class TriageQueueView(APIView):
+    """Open reports, most urgent first (staff only)
+
+    Pages by keyset on (priority_score, id), which the partial triage index
+    serves directly, so deep pages cost the same as the first one.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        queryset = Report.objects.extra(where=[OPEN_STATUS_SQL])
+
+        report_status = request.query_params.get("status")
+        if report_status:
+            if report_status not in OPEN_STATUSES:
+                return Response(
+                    {"detail": f"status must be one of: {', '.join(OPEN_STATUSES)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(status=report_status)
+        report_type = request.query_params.get("report_type")
+        if report_type:
+            queryset = queryset.filter(report_type=report_type)
+
+        try:
+            limit = int(request.query_params.get("limit", settings.TRIAGE_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {"detail": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.TRIAGE_MAX_PAGE_SIZE))
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                score, report_id = decode_cursor(cursor)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            # A row comparison lets the index seek straight to the cursor
+            queryset = queryset.extra(
+                where=[
+                    "(reports_app_report.priority_score, reports_app_report.id) < (%s, %s)"
+                ],
+                params=[score, report_id],
+            )
+
+        # One extra row tells whether there is a next page
+        reports = list(queryset.order_by("-priority_score", "-id")[: limit + 1])
+        next_cursor = encode_cursor(reports[limit - 1]) if len(reports) > limit else None
+        reports = reports[:limit]
+
+        return Response(
+            {
+                "detail": "Triage queue retrieved successfully",
+                "reports": TriageReportSerializer(reports, many=True).data,
+                "next_cursor": next_cursor,
+            },
+            status=status.HTTP_200_OK,
+        )
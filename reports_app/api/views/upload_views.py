@@ -0,0 +1,198 @@
+import io
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from reports_app.api.serializers.reports import ReportSerializer
+from reports_app.api.views.reports_views import analysis_detail, start_analysis
+from reports_app.idempotency import (
+    IdempotencyError,
+    request_fingerprint,
+    run_idempotent,
+    validate_key,
+)
+from reports_app.models import Report
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+UPLOAD_FORMATS = {"JPEG", "PNG", "WEBP"}
+# Enough of the file for Pillow to identify the format and size
+HEADER_BYTES = 64 * 1024
+
+
+def upload_prefix(user):
+    return f"{Report._meta.get_field('image').upload_to}uploads/{user.id}/"
+
+
+def direct_uploads_unavailable():
+    return Response(
+        {
+            "detail": "Direct uploads need MEDIA_STORAGE=s3; "
+            "send the image with the report instead"
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def already_attached():
+    return Response(
+        {"detail": "This upload is already attached to a report"},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+class DirectUploadView(APIView):
+    """Presigned POST for sending a report image straight to the bucket
+
+    The client POSTs the file to ``upload.url`` with ``upload.fields``, then
+    creates the report with ``POST uploads/confirm/`` and the ``image_key``.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not hasattr(default_storage, "presigned_upload"):
+            return direct_uploads_unavailable()
+
+        content_type = request.data.get("content_type", "image/jpeg")
+        if content_type not in UPLOAD_EXTENSIONS:
+            return Response(
+                {"detail": f"content_type must be one of: {', '.join(UPLOAD_EXTENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        key = f"{upload_prefix(request.user)}{uuid.uuid4().hex}{UPLOAD_EXTENSIONS[content_type]}"
+        try:
+            upload = default_storage.presigned_upload(
+                key, settings.DIRECT_UPLOAD_MAX_BYTES, settings.DIRECT_UPLOAD_EXPIRE_SECONDS
+            )
+        except Exception as e:
+            return Response(
+                {"detail": f"An error occurred while preparing the upload: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        upload["fields"]["Content-Type"] = content_type
+        return Response(
+            {
+                "detail": "Upload URL created successfully",
+                "image_key": key,
+                "upload": upload,
+                "expires_in": settings.DIRECT_UPLOAD_EXPIRE_SECONDS,
+                "max_bytes": settings.DIRECT_UPLOAD_MAX_BYTES,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class ConfirmUploadView(APIView):
+    """Create a report for an image already uploaded to the bucket
+
+    Only the report's fields pass through Django; the image is checked with a
+    ranged read of its first bytes. Confirming is idempotent per upload: a
+    repeated confirm gets the first one's response back, and one that arrives
+    while the first is still running waits for it (see reports_app/idempotency.py).
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not hasattr(default_storage, "presigned_upload"):
+            return direct_uploads_unavailable()
+
+        key = str(request.data.get("image_key", ""))
+        if not key.startswith(upload_prefix(request.user)) or ".." in key:
+            return Response(
+                {"detail": "image_key does not belong to one of your uploads"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = {name: value for name, value in request.data.items() if name != "image_key"}
+        serializer = ReportSerializer(data=data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(
+                {"detail": "Validation errors", "errors": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # Checked before taking the key, so that a confirm sent too early is
+        # not replayed
+        try:
+            error = check_uploaded_image(key)
+        except Exception as e:
+            return Response(
+                {"detail": f"An error occurred while checking the upload: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        def handler():
+            response = self.create_report(request, serializer, key)
+            return response.status_code, response.data
+
+        try:
+            status_code, data, replayed = run_idempotent(
+                request.user.id,
+                validate_key(f"upload:{key}"),
+                request_fingerprint(request.data, request.FILES),
+                handler,
+            )
+        except IdempotencyError as e:
+            if e.status == status.HTTP_422_UNPROCESSABLE_ENTITY:
+                # Confirmed before, with other report details
+                return already_attached()
+            response = Response({"detail": e.detail}, status=e.status)
+            if e.retry_after:
+                response["Retry-After"] = str(e.retry_after)
+            return response
+
+        response = Response(data, status=status_code)
+        if replayed:
+            response["Idempotent-Replayed"] = "true"
+        return response
+
+    def create_report(self, request, serializer, key):
+        """Save and analyse the report, unless the upload already has one"""
+        # Still needed when Redis is down and confirms run unguarded
+        if Report.objects.filter(image=key).exists():
+            return already_attached()
+        try:
+            report = serializer.save(user=request.user, image=key)
+            start_analysis(report)
+            return Response(
+                {
+                    "detail": "Report created successfully" + analysis_detail(report),
+                    "report": ReportSerializer(report, context={"request": request}).data,
+                },
+                status=status.HTTP_201_CREATED,
+            )
+        except Exception as e:
+            return Response(
+                {"detail": f"An error occurred while creating report: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+def check_uploaded_image(key):
+    """Why the uploaded object cannot be a report image, or None if it can"""
+    if not default_storage.exists(key):
+        return "The image has not been uploaded yet"
+    try:
+        with Image.open(io.BytesIO(default_storage.read_head(key, HEADER_BYTES))) as image:
+            image_format = image.format
+    except (UnidentifiedImageError, OSError):
+        image_format = None
+    if image_format not in UPLOAD_FORMATS:
+        default_storage.delete(key)
+        logger.warning(f"✗ Deleted upload {key}: not a JPEG, PNG or WebP image")
+        return "The uploaded file is not a JPEG, PNG or WebP image"
+    return None
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ReportsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports_app'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_migrate
+
+        from reports_app.priority import duplicate_deleted
+        from reports_app.search import repair_sqlite_index
+
+        post_migrate.connect(repair_sqlite_index, sender=self)
+        post_delete.connect(duplicate_deleted, sender=self.get_model("Report"))
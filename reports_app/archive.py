@@ -0,0 +1,160 @@
+"""
+Hot/cold archival of closed reports.
+
+Reports that have been resolved or rejected for ARCHIVE_AFTER_DAYS move from
+``Report`` to ``ArchivedReport`` (in settings.ARCHIVE_DATABASE), and their
+images from the default storage to the "archive" storage. The hot table,
+its indexes and the caches built from it then only carry live work.
+
+Each batch:
+
+1. copies the images to the archive storage,
+2. inserts the archive rows, overwriting any left by an earlier run (one
+   transaction on the archive database),
+3. locks and deletes the hot rows that still qualify (one transaction on
+   the default database),
+4. drops the archive rows of any report changed in the meantime, and the
+   hot copies of the images that moved.
+
+A crash between steps leaves a report in both places, never in neither;
+the next run finishes it, and readers look in the hot table first.
+Originals with duplicates still in the hot table stay until those go.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import transaction
+from django.utils import timezone
+
+from reports_app.models import ArchivedReport, Report
+
+logger = logging.getLogger(__name__)
+
+COPIED_FIELDS = (
+    "id",
+    "user_id",
+    "description",
+    "name",
+    "address",
+    "status",
+    "severity",
+    "report_type",
+    "model_version",
+    "image_phash",
+    "duplicate_count",
+    "created_at",
+    "updated_at",
+)
+
+
+def archive_candidates(cutoff):
+    return Report.objects.filter(
+        status__in=settings.ARCHIVE_STATUSES,
+        updated_at__lt=cutoff,
+        duplicates__isnull=True,
+    )
+
+
+def copy_image(report):
+    """Copy the report's image to the archive storage; returns its name there"""
+    if not report.image:
+        return ""
+    name = report.image.name
+    archive = storages["archive"]
+    # Copied by an earlier run that stopped before deleting the report
+    if archive.exists(name):
+        return name
+    try:
+        with report.image.storage.open(name, "rb") as image:
+            return archive.save(name, image)
+    except FileNotFoundError:
+        logger.warning(f"✗ Image {name} of report {report.id} is missing, archiving without it")
+        return name
+
+
+def delete_images(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as e:
+            logger.warning(f"✗ Could not delete archived image {name}: {str(e)}")
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` reports to the archive; returns how many moved"""
+    reports = list(archive_candidates(cutoff).order_by("id")[:batch_size])
+    if not reports:
+        return 0
+
+    archived = []
+    for report in reports:
+        fields = {field: getattr(report, field) for field in COPIED_FIELDS}
+        archived.append(
+            ArchivedReport(
+                **fields,
+                duplicate_of=report.duplicate_of_id,
+                image=copy_image(report),
+            )
+        )
+    with transaction.atomic(using=settings.ARCHIVE_DATABASE):
+        # A row left by an earlier run may predate later edits; overwrite it
+        ArchivedReport.objects.bulk_create(
+            archived,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[*COPIED_FIELDS[1:], "duplicate_of", "image"],
+        )
+
+    report_ids = [report.id for report in reports]
+    with transaction.atomic():
+        moved = set(
+            archive_candidates(cutoff)
+            .select_for_update(of=("self",))
+            .filter(id__in=report_ids)
+            .values_list("id", flat=True)
+        )
+        Report.objects.filter(id__in=moved).delete()
+
+    # Reopened or edited while being copied: they stay hot
+    stale = [entry for entry in archived if entry.id not in moved]
+    if stale:
+        ArchivedReport.objects.filter(id__in=[entry.id for entry in stale]).delete()
+        delete_images(storages["archive"], [entry.image.name for entry in stale if entry.image])
+    delete_images(
+        storages["default"],
+        [report.image.name for report in reports if report.id in moved and report.image],
+    )
+    return len(moved)
+
+
+def archive_reports(older_than_days=None, batch_size=None, max_batches=None):
+    """Archive closed reports in batches; returns how many were moved"""
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.ARCHIVE_MAX_BATCHES
+    cutoff = timezone.now() - timedelta(days=days)
+
+    total = 0
+    for _ in range(max_batches):
+        moved = archive_batch(cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+    if total:
+        logger.info(f"✓ Archived {total} reports closed before {cutoff:%Y-%m-%d}")
+    return total
+
+
+def get_archived_report(user, pk):
+    """The user's archived report with this id, or None"""
+    try:
+        return ArchivedReport.objects.get(pk=int(pk), user=user)
+    except (ArchivedReport.DoesNotExist, ValueError, TypeError):
+        return None
+
+
+def archived_reports(user):
+    return ArchivedReport.objects.filter(user=user).order_by("-created_at")
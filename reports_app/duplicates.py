@@ -0,0 +1,174 @@
+"""
+Near-duplicate detection for report images.
+
+Each analysed report stores a 64-bit perceptual hash of its image
+(``Report.image_phash``). Every process keeps the hashes of original reports
+(those not themselves linked as duplicates) in a multi-index hash table. A
+lookup within DUPLICATE_HASH_RADIUS bits then probes a fixed number of
+buckets instead of comparing against every report.
+
+The index is built from the database when a process starts, so no request
+pays for the full scan: Celery workers in worker_process_init, gunicorn
+workers in post_fork (the master stays off the database, so no connection
+is shared across the fork), and the ASGI server on a background thread. It
+is brought up to date before each lookup with the reports analysed since.
+Those are found by ``updated_at``, which analysis always sets. The window
+overlaps by DUPLICATE_INDEX_OVERLAP_SECONDS so rows committed late by
+another process are not missed.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from itertools import combinations
+
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from ai_service.phash import hamming_distance, to_unsigned
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def flip_masks(bits, max_flips):
+    """Every ``bits``-wide mask with at most ``max_flips`` bits set"""
+    return [
+        sum(1 << position for position in positions)
+        for count in range(max_flips + 1)
+        for positions in combinations(range(bits), count)
+    ]
+
+
+class MultiIndexHash:
+    """Hamming-radius search over 64-bit hashes (multi-index hashing)
+
+    Each hash is split into ``chunks`` disjoint bit ranges, and every range
+    has its own exact-match table. Two hashes within ``radius`` bits must be
+    within ``radius // chunks`` bits on at least one range (pigeonhole), so
+    a search only probes each table's keys near the query's range. Its cost
+    depends on the radius, not on how many hashes are stored.
+    """
+
+    def __init__(self, chunks=4):
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables = [defaultdict(list) for _ in range(chunks)]
+        self.size = 0
+
+    def split(self, value):
+        return [
+            (value >> (index * self.chunk_bits)) & self.mask
+            for index in range(self.chunks)
+        ]
+
+    def add(self, value, item):
+        self.size += 1
+        for table, part in zip(self.tables, self.split(value)):
+            table[part].append((value, item))
+
+    def search(self, value, radius):
+        """``(distance, item)`` pairs within ``radius`` of ``value``, nearest first"""
+        masks = flip_masks(self.chunk_bits, radius // self.chunks)
+        found = {}
+        for table, part in zip(self.tables, self.split(value)):
+            for mask in masks:
+                for candidate, item in table.get(part ^ mask, ()):
+                    if item not in found:
+                        distance = hamming_distance(value, candidate)
+                        if distance <= radius:
+                            found[item] = distance
+        return sorted((distance, item) for item, distance in found.items())
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hashes = None
+        self.indexed = set()
+        self.cursor = None
+
+    def refresh(self):
+        """Add original reports hashed since the last refresh"""
+        from reports_app.models import Report
+
+        with self.lock:
+            reports = Report.objects.filter(
+                image_phash__isnull=False, duplicate_of__isnull=True
+            )
+            if self.hashes is None:
+                self.hashes = MultiIndexHash()
+            if self.cursor is not None:
+                overlap = timedelta(seconds=settings.DUPLICATE_INDEX_OVERLAP_SECONDS)
+                reports = reports.filter(updated_at__gte=self.cursor - overlap)
+
+            for report_id, phash, updated_at in reports.values_list(
+                "id", "image_phash", "updated_at"
+            ).iterator(chunk_size=5000):
+                if self.cursor is None or updated_at > self.cursor:
+                    self.cursor = updated_at
+                if report_id not in self.indexed:
+                    self.indexed.add(report_id)
+                    self.hashes.add(to_unsigned(phash), report_id)
+
+    def find(self, phash, exclude=None):
+        """Closest open original report within the configured radius, if any"""
+        from reports_app.models import Report
+
+        self.refresh()
+        with self.lock:
+            matches = self.hashes.search(
+                to_unsigned(phash), settings.DUPLICATE_HASH_RADIUS
+            )
+        candidate_ids = [report_id for _, report_id in matches if report_id != exclude]
+        if not candidate_ids:
+            return None
+
+        # The index keeps closed and deleted reports; the database decides
+        candidates = Report.objects.in_bulk(
+            candidate_ids[: settings.DUPLICATE_MAX_CANDIDATES]
+        )
+        for report_id in candidate_ids:
+            report = candidates.get(report_id)
+            if report and report.status in settings.DUPLICATE_MATCH_STATUSES:
+                return report
+        return None
+
+
+duplicate_index = DuplicateIndex()
+
+
+def build_index():
+    """Build (or catch up) the index at process start, off the request path"""
+    if not settings.DUPLICATE_DETECTION_ENABLED:
+        return
+    try:
+        duplicate_index.refresh()
+        logger.info(f"✓ Duplicate index built with {duplicate_index.hashes.size} reports")
+    except DatabaseError as e:
+        logger.error(f"✗ Could not build duplicate index: {str(e)}")
+
+
+def build_index_in_background():
+    """Build the index on a thread, for servers without a pre-fork hook
+
+    Lookups made before it finishes wait for it on the index lock.
+    """
+
+    def build():
+        try:
+            build_index()
+        finally:
+            connection.close()
+
+    threading.Thread(target=build, name="duplicate-index", daemon=True).start()
+
+
+@worker_process_init.connect
+def _build_index(**kwargs):
+    """Build the index in each Celery worker before it takes tasks"""
+    build_index()
@@ -0,0 +1,214 @@
+"""
+Push notifications for report changes.
+
+Writers call ``publish_report_event`` when a report's severity or status
+changes, or ``publish_report_batch`` when many reports change at once (one
+``<kind>_batch`` event per owner, listing their reports). The event goes out on the owner's Redis pub/sub channel once the
+transaction commits, and the change is queued for the owner's email digest
+(reports_app/notifications.py). The event endpoint (``api/views/events_views.py``)
+listens through an EventHub: one Redis subscription per event loop, fanned
+out to a queue per open connection. Idle clients therefore cost a queue and a
+suspended coroutine, not a thread or a Redis connection each.
+
+Event ids are the report's ``updated_at`` in microseconds. A client that
+reconnects with ``Last-Event-ID`` is first sent every report changed since
+then, so events published while it was away are not lost.
+
+Browsers' EventSource cannot send an Authorization header. Instead of the
+API token in the URL, such clients open the stream with a ticket: the user
+id signed with a timestamp, valid for REPORT_EVENTS_TICKET_SECONDS.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+from contextlib import suppress
+from datetime import datetime, timezone
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from reports_app.notifications import queue_changes
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "report-events:{user_id}"
+TICKET_SALT = "reports_app.events.ticket"
+
+
+def channel(user_id):
+    return CHANNEL.format(user_id=user_id)
+
+
+def issue_ticket(user):
+    """Short-lived ticket that opens an event stream as ``user``"""
+    return signing.TimestampSigner(salt=TICKET_SALT).sign(str(user.id))
+
+
+def ticket_user_id(ticket):
+    """User id a ticket was issued to; None if it is forged or expired"""
+    try:
+        value = signing.TimestampSigner(salt=TICKET_SALT).unsign(
+            ticket, max_age=settings.REPORT_EVENTS_TICKET_SECONDS
+        )
+        return int(value)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def event_id(updated_at):
+    return str(int(updated_at.timestamp() * 1_000_000))
+
+
+def parse_event_id(value):
+    """Inverse of event_id; None for a missing or malformed id"""
+    try:
+        return datetime.fromtimestamp(int(value) / 1_000_000, tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def report_event(report, kind):
+    return {
+        "event": kind,
+        "id": event_id(report.updated_at),
+        "report": {
+            "id": report.id,
+            "severity": report.severity,
+            "severity_display": report.get_severity_display(),
+            "status": report.status,
+            "needs_retake": report.needs_retake,
+            "updated_at": report.updated_at.isoformat(),
+        },
+    }
+
+
+def publish_report_event(report, kind):
+    """Notify the report's owner after the current transaction commits"""
+    message = json.dumps(report_event(report, kind))
+
+    def publish():
+        try:
+            get_redis_connection("default").publish(channel(report.user_id), message)
+        except RedisError as e:
+            logger.warning(f"✗ Could not publish {kind} event for report {report.id}: {str(e)}")
+
+    transaction.on_commit(publish)
+    queue_changes([report], kind)
+
+
+def publish_report_batch(reports, kind):
+    """Notify each owner once about all of their reports, after commit"""
+    by_user = defaultdict(list)
+    for report in reports:
+        by_user[report.user_id].append(report_event(report, kind))
+    messages = {
+        user_id: json.dumps(
+            {
+                "event": f"{kind}_batch",
+                "id": max(events, key=lambda event: int(event["id"]))["id"],
+                "reports": [event["report"] for event in events],
+            }
+        )
+        for user_id, events in by_user.items()
+    }
+
+    def publish():
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for user_id, message in messages.items():
+                pipe.publish(channel(user_id), message)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(
+                f"✗ Could not publish {kind} events for {len(messages)} users: {str(e)}"
+            )
+
+    if messages:
+        transaction.on_commit(publish)
+        queue_changes(reports, kind)
+
+
+class EventHub:
+    """A single pub/sub connection shared by every listener on one event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.client = aioredis.Redis.from_url(settings.CACHES["default"]["LOCATION"])
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.queues = defaultdict(set)
+        self.reader = None
+
+    async def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=settings.REPORT_EVENTS_BACKLOG)
+        first = not self.queues[user_id]
+        self.queues[user_id].add(queue)
+        if first:
+            try:
+                await self.pubsub.subscribe(channel(user_id))
+            except BaseException:
+                await self.unsubscribe(user_id, queue)
+                raise
+        if self.reader is None:
+            self.reader = asyncio.create_task(self.read())
+        return queue
+
+    async def unsubscribe(self, user_id, queue):
+        queues = self.queues.get(user_id, set())
+        queues.discard(queue)
+        if queues:
+            return
+        self.queues.pop(user_id, None)
+        if self.queues:
+            with suppress(RedisError, OSError):
+                await self.pubsub.unsubscribe(channel(user_id))
+        else:
+            await self.close()
+
+    async def read(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=None
+                )
+            except (RedisError, OSError) as e:
+                # The next get_message reconnects and resubscribes
+                logger.warning(f"✗ Report event subscription interrupted: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            user_id = int(message["channel"].decode().rpartition(":")[2])
+            for queue in self.queues.get(user_id, ()):
+                with suppress(asyncio.QueueFull):
+                    queue.put_nowait(message["data"])
+
+    async def close(self):
+        """Drop the hub once its last listener leaves"""
+        if _hubs.get(self.loop) is self:
+            del _hubs[self.loop]
+        if self.reader is not None:
+            self.reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.reader
+        with suppress(RedisError, OSError):
+            await self.pubsub.aclose()
+            await self.client.aclose()
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The EventHub of the running event loop"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = EventHub(loop)
+    return hub
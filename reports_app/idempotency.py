@@ -0,0 +1,163 @@
+"""
+``Idempotency-Key`` support for report creation.
+
+The first request with a key takes a Redis lock and runs. Its response is
+stored for IDEMPOTENCY_TTL_SECONDS, and a retry with the same key gets that
+response back (with ``Idempotent-Replayed: true``) without creating another
+report or running inference again. A duplicate that arrives while the first
+is still running polls for the stored response for up to
+IDEMPOTENCY_WAIT_SECONDS, then gives up with 409.
+
+Keys are scoped per user. Reusing a key with a different body is a client
+error (422). Server errors are not stored, so the client can retry with the
+same key. If Redis is unavailable, requests run without the guarantee.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "idempotency:lock:{user_id}:{key}"
+RESULT_KEY = "idempotency:result:{user_id}:{key}"
+POLL_INTERVAL = 0.1
+
+OWNER = "owner"
+REPLAY = "replay"
+WAIT = "wait"
+UNAVAILABLE = "unavailable"
+
+
+class IdempotencyError(Exception):
+    def __init__(self, detail, status, retry_after=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.retry_after = retry_after
+
+
+def request_fingerprint(data, files):
+    """Hash of the submitted fields and file contents"""
+    digest = hashlib.sha256()
+    for name in sorted(data.keys()):
+        values = data.getlist(name) if hasattr(data, "getlist") else [data[name]]
+        for value in values:
+            if not hasattr(value, "chunks"):
+                digest.update(f"{name}={value}\0".encode())
+    for name in sorted(files.keys()):
+        for upload in files.getlist(name):
+            digest.update(f"{name}:{upload.name}:{upload.size}\0".encode())
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            upload.seek(0)
+    return digest.hexdigest()
+
+
+def validate_key(key):
+    if not key or len(key) > 255:
+        raise IdempotencyError("Idempotency-Key must be 1-255 characters", 400)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def claim(user_id, key, fingerprint):
+    """Return ``(state, stored)`` for this attempt at ``key``"""
+    try:
+        connection = get_redis_connection("default")
+        stored = connection.get(RESULT_KEY.format(user_id=user_id, key=key))
+        if stored is None and connection.set(
+            LOCK_KEY.format(user_id=user_id, key=key),
+            fingerprint,
+            nx=True,
+            ex=settings.IDEMPOTENCY_LOCK_SECONDS,
+        ):
+            return OWNER, None
+    except RedisError as e:
+        logger.warning(f"✗ Idempotency store unavailable, running request anyway: {str(e)}")
+        return UNAVAILABLE, None
+
+    if stored is None:
+        return WAIT, None
+    stored = json.loads(stored)
+    if stored["fingerprint"] != fingerprint:
+        raise IdempotencyError(
+            "Idempotency-Key was already used with a different request", 422
+        )
+    return REPLAY, stored
+
+
+def finish(user_id, key, fingerprint, status, data):
+    """Store a completed response and release the lock"""
+    try:
+        connection = get_redis_connection("default")
+        if status < 500:
+            connection.set(
+                RESULT_KEY.format(user_id=user_id, key=key),
+                json.dumps({"fingerprint": fingerprint, "status": status, "data": data}),
+                ex=settings.IDEMPOTENCY_TTL_SECONDS,
+            )
+        connection.delete(LOCK_KEY.format(user_id=user_id, key=key))
+    except RedisError as e:
+        logger.warning(f"✗ Could not store idempotent response: {str(e)}")
+
+
+def in_progress():
+    return IdempotencyError(
+        "A request with this Idempotency-Key is still being processed",
+        409,
+        retry_after=settings.IDEMPOTENCY_WAIT_SECONDS,
+    )
+
+
+def run_idempotent(user_id, key, fingerprint, handler):
+    """Run ``handler() -> (status, data)`` at most once per key
+
+    Returns ``(status, data, replayed)``.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        state, stored = claim(user_id, key, fingerprint)
+        if state == REPLAY:
+            return stored["status"], stored["data"], True
+        if state != WAIT:
+            break
+        if time.monotonic() >= deadline:
+            raise in_progress()
+        time.sleep(POLL_INTERVAL)
+
+    status, data = 500, None
+    try:
+        status, data = handler()
+        return status, data, False
+    finally:
+        if state == OWNER:
+            finish(user_id, key, fingerprint, status, data)
+
+
+async def arun_idempotent(user_id, key, fingerprint, handler):
+    """Async run_idempotent; ``handler`` is a coroutine function"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        state, stored = await sync_to_async(claim)(user_id, key, fingerprint)
+        if state == REPLAY:
+            return stored["status"], stored["data"], True
+        if state != WAIT:
+            break
+        if time.monotonic() >= deadline:
+            raise in_progress()
+        await asyncio.sleep(POLL_INTERVAL)
+
+    status, data = 500, None
+    try:
+        status, data = await handler()
+        return status, data, False
+    finally:
+        if state == OWNER:
+            await sync_to_async(finish)(user_id, key, fingerprint, status, data)
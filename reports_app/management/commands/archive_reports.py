@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reports_app.archive import archive_reports
+
+
+class Command(BaseCommand):
+    help = (
+        "Move reports resolved or rejected more than ARCHIVE_AFTER_DAYS ago to "
+        "the archive, and their images to the archive storage. Celery beat "
+        "runs the same job periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive reports unchanged for this many days",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ARCHIVE_BATCH_SIZE,
+            help="Reports moved per transaction",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=10**9,
+            help="Stop after this many batches (default: until none are left)",
+        )
+
+    def handle(self, *args, **options):
+        moved = archive_reports(
+            options["older_than_days"], options["batch_size"], options["max_batches"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ Archived {moved} reports"))
@@ -0,0 +1,152 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_service.pothole_classifier import cascade_exit, load_image, to_batch
+from ai_service.registry import registry
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure a two-stage cascade on labeled images: how often the first "
+        "stage escalates to the full model, and the accuracy lost against the "
+        "full model alone, for each confidence threshold. Images go in "
+        "subdirectories named by expected severity, e.g. labeled/0/, labeled/3/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Labeled image directory")
+        parser.add_argument(
+            "--stage1",
+            help="First-stage version (default: the STAGE1 pointer)",
+        )
+        parser.add_argument(
+            "--full",
+            help="Full model version (default: the CURRENT pointer)",
+        )
+        parser.add_argument(
+            "--thresholds",
+            default=f"0.7,0.8,0.9,0.95,{settings.AI_CASCADE_THRESHOLD}",
+            help="Comma-separated confidence thresholds to compare",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the results as JSON"
+        )
+
+    def handle(self, *args, **options):
+        samples = self.labeled_images(options["directory"])
+        if not samples:
+            raise CommandError(f"No labeled images under {options['directory']}")
+        try:
+            thresholds = sorted(
+                {float(value) for value in options["thresholds"].split(",")}
+            )
+        except ValueError:
+            raise CommandError(f"Invalid thresholds: {options['thresholds']}")
+
+        stage1_version = options["stage1"] or registry.wanted("STAGE1")
+        if stage1_version is None:
+            raise CommandError("No STAGE1 version set; pass --stage1")
+        full_version = options["full"] or registry.wanted("CURRENT")
+        stage1 = registry.load(stage1_version)
+        full = registry.load(full_version)
+
+        # Both stages run on every image once; each threshold is then a replay
+        rows = []
+        for path, label in samples:
+            image = load_image(path)
+            if image is None:
+                continue
+            rows.append(
+                (label, *self.predict(stage1, image), *self.predict(full, image))
+            )
+        if not rows:
+            raise CommandError("None of the images could be read")
+
+        results = self.summarize(rows, thresholds)
+        results.update(
+            stage1=stage1.version, full=full.version, images=len(rows)
+        )
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.print_results(results)
+
+    def labeled_images(self, directory):
+        samples = []
+        for label in sorted(os.listdir(directory)):
+            label_dir = os.path.join(directory, label)
+            if not (label.isdigit() and os.path.isdir(label_dir)):
+                continue
+            for name in sorted(os.listdir(label_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    samples.append((os.path.join(label_dir, name), int(label)))
+        return samples
+
+    def predict(self, loaded, image):
+        """(predictions, severity, seconds) for one image, resize included"""
+        started = time.perf_counter()
+        predictions = loaded.predict(to_batch(image, loaded.input_size))
+        elapsed = time.perf_counter() - started
+        return predictions, loaded.severity(predictions.argmax()), elapsed
+
+    def summarize(self, rows, thresholds):
+        count = len(rows)
+        stage1_seconds = sum(row[3] for row in rows) / count
+        full_seconds = sum(row[6] for row in rows) / count
+        full_accuracy = sum(row[0] == row[5] for row in rows) / count
+
+        cascades = []
+        for threshold in thresholds:
+            escalated = correct = agreed = 0
+            for label, stage1_predictions, stage1_severity, _, _, full_severity, _ in rows:
+                if cascade_exit(stage1_predictions, threshold):
+                    severity = stage1_severity
+                else:
+                    escalated += 1
+                    severity = full_severity
+                correct += severity == label
+                agreed += severity == full_severity
+            escalation_rate = escalated / count
+            accuracy = correct / count
+            cascades.append(
+                {
+                    "threshold": threshold,
+                    "escalation_rate": round(escalation_rate, 4),
+                    "accuracy": round(accuracy, 4),
+                    "accuracy_delta": round(accuracy - full_accuracy, 4),
+                    "agreement_with_full": round(agreed / count, 4),
+                    "mean_ms": round(
+                        (stage1_seconds + escalation_rate * full_seconds) * 1000, 2
+                    ),
+                }
+            )
+
+        return {
+            "full_accuracy": round(full_accuracy, 4),
+            "full_mean_ms": round(full_seconds * 1000, 2),
+            "stage1_mean_ms": round(stage1_seconds * 1000, 2),
+            "cascade": cascades,
+        }
+
+    def print_results(self, results):
+        self.stdout.write(
+            f"{results['images']} images; stage 1 {results['stage1']} "
+            f"({results['stage1_mean_ms']} ms), full {results['full']} "
+            f"({results['full_mean_ms']} ms, accuracy {results['full_accuracy']:.2%})"
+        )
+        self.stdout.write(
+            f"{'threshold':>9}  {'escalated':>9}  {'accuracy':>8}  {'delta':>7}  "
+            f"{'agrees':>7}  {'mean ms':>8}"
+        )
+        for row in results["cascade"]:
+            self.stdout.write(
+                f"{row['threshold']:>9.2f}  {row['escalation_rate']:>9.1%}  "
+                f"{row['accuracy']:>8.1%}  {row['accuracy_delta']:>+7.1%}  "
+                f"{row['agreement_with_full']:>7.1%}  {row['mean_ms']:>8.2f}"
+            )
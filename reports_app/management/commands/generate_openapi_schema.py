@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from asphalt_aid.openapi import code_version, generate_schema, write_schema_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema for the current code version and write it "
+        "to OPENAPI_SCHEMA_DIR, so no process has to build it at request time. "
+        "Run it at image build time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--code-version",
+            dest="code_version",
+            help="Code version to file the schema under (default: OPENAPI_CODE_VERSION, "
+            "or a digest of the sources)",
+        )
+
+    def handle(self, *args, **options):
+        version = options["code_version"] or code_version()
+        body = generate_schema()
+        path = write_schema_file(body, version)
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ Wrote OpenAPI schema {version} ({len(body)} bytes) to {path}")
+        )
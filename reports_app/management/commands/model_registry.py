@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_service.registry import (
+    ARTIFACT_NAMES,
+    HEURISTIC_VERSION,
+    LEGACY_VERSION,
+    POINTERS,
+    registry,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage versioned pothole models: register artifacts, switch the active "
+        "version and choose shadow and cascade first-stage versions. Running processes pick up pointer "
+        "changes within AI_MODEL_POLL_SECONDS, without a restart."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+
+        subcommands.add_parser("list", help="Show registered versions")
+
+        register = subcommands.add_parser(
+            "register", help="Copy a model file into the registry as a new version"
+        )
+        register.add_argument("path", help="Model file (.keras or .h5)")
+        register.add_argument("version", help="Version name, e.g. 2025-06-01")
+        register.add_argument(
+            "--severity-mapping",
+            help='JSON mapping of model class to severity, e.g. \'{"0": 0, "1": 1, "2": 3}\'',
+        )
+        register.add_argument(
+            "--activate", action="store_true", help="Make it the active version"
+        )
+
+        activate = subcommands.add_parser("activate", help="Switch the active version")
+        activate.add_argument("version")
+
+        shadow = subcommands.add_parser(
+            "shadow", help="Compare a version against the active one on a sample"
+        )
+        shadow.add_argument("version", nargs="?")
+        shadow.add_argument("--off", action="store_true", help="Stop shadowing")
+
+        stage1 = subcommands.add_parser(
+            "stage1",
+            help="Run a cheap version (or the built-in 'heuristic') first; it "
+            "answers alone when confident (AI_CASCADE_THRESHOLD)",
+        )
+        stage1.add_argument("version", nargs="?")
+        stage1.add_argument("--off", action="store_true", help="Stop the cascade")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "list":
+            self.list_versions()
+        elif action == "register":
+            self.register(options)
+        elif action == "activate":
+            self.point("CURRENT", options["version"])
+        elif action in ("shadow", "stage1"):
+            pointer = action.upper()
+            if options["off"]:
+                registry.write_pointer(pointer, None)
+                self.stdout.write(self.style.SUCCESS(f"✓ No {action} version"))
+            elif options["version"]:
+                self.point(pointer, options["version"])
+            else:
+                raise CommandError("Give a version, or --off")
+
+    def list_versions(self):
+        pointed = {name: registry.wanted(name) for name in POINTERS}
+        versions = registry.versions()
+        for builtin in (LEGACY_VERSION, HEURISTIC_VERSION):
+            if builtin in pointed.values():
+                versions.insert(0, builtin)
+        for version in versions:
+            markers = [
+                POINTERS[name] for name in POINTERS if pointed[name] == version
+            ]
+            suffix = f" ({', '.join(markers)})" if markers else ""
+            path = registry.artifact_path(version) or "(built in)"
+            self.stdout.write(f"{version}{suffix}  {path}")
+
+    def register(self, options):
+        version, path = options["version"], options["path"]
+        if version in (LEGACY_VERSION, HEURISTIC_VERSION) or os.sep in version or version.startswith("."):
+            raise CommandError(f"Invalid version name: {version}")
+        extension = os.path.splitext(path)[1]
+        artifact_name = f"model{extension}"
+        if artifact_name not in ARTIFACT_NAMES:
+            raise CommandError(f"Expected a .keras or .h5 file, got {path}")
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        target = registry.version_dir(version)
+        if os.path.exists(target):
+            raise CommandError(f"Version {version} already exists; versions are immutable")
+
+        # Build in a temporary directory so a half-copied version is never visible
+        staging = f"{target}.tmp-{os.getpid()}"
+        os.makedirs(staging)
+        try:
+            shutil.copyfile(path, os.path.join(staging, artifact_name))
+            if options["severity_mapping"]:
+                mapping = json.loads(options["severity_mapping"])
+                with open(
+                    os.path.join(staging, "metadata.json"), "w", encoding="utf-8"
+                ) as metadata_file:
+                    json.dump({"severity_mapping": mapping}, metadata_file, indent=2)
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Registered version {version}"))
+        if options["activate"]:
+            self.point("CURRENT", version)
+
+    def point(self, pointer, version):
+        try:
+            registry.write_pointer(pointer, version)
+        except ValueError as e:
+            raise CommandError(str(e))
+        role = POINTERS[pointer]
+        self.stdout.write(self.style.SUCCESS(f"✓ Version {version} is now the {role} version"))
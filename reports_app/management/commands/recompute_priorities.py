@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from reports_app.models import Report
+from reports_app.priority import recompute_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount duplicates and recompute the stored triage priority of every "
+        "report. Run it after changing the PRIORITY_* settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows written per UPDATE"
+        )
+
+    def handle(self, *args, **options):
+        updated = recompute_all(Report, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✓ Recomputed priority of {updated} reports"))
@@ -0,0 +1,192 @@
+import json
+import os
+import shutil
+import uuid
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reports_app.models import Report
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+# Updated reports are appended again rather than rewritten in place, so one
+# id can have several rows; readers keep the newest. Stored in the manifest.
+READ_RULE = {
+    "deduplicate_on": "id",
+    "keep": "max updated_at",
+    "description": (
+        "A report updated after it was snapshotted is appended again in a later "
+        "file. Keep only the row with the greatest updated_at for each id."
+    ),
+}
+
+SNAPSHOT_FIELDS = [
+    "id",
+    "user_id",
+    "name",
+    "description",
+    "address",
+    "status",
+    "severity",
+    "report_type",
+    "image",
+    "created_at",
+    "updated_at",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the Report table to day-partitioned Parquet files. Later runs only "
+        "append rows whose updated_at is past the stored watermark, so readers "
+        "must keep the row with the greatest updated_at for each id."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.REPORT_SNAPSHOT_DIR,
+            help="Snapshot root directory (default: settings.REPORT_SNAPSHOT_DIR)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.REPORT_SNAPSHOT_CHUNK_SIZE,
+            help="Rows fetched and written per chunk",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Drop the existing snapshot and rebuild it from scratch",
+        )
+
+    def handle(self, *args, **options):
+        import pandas as pd
+
+        output = options["output"]
+        chunk_size = options["chunk_size"]
+
+        if options["full"] and os.path.isdir(output):
+            shutil.rmtree(output)
+        os.makedirs(output, exist_ok=True)
+
+        manifest = load_manifest(output)
+        run_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        watermark = manifest["watermark"]
+
+        base_queryset = Report.objects.order_by("updated_at", "id").values(
+            *SNAPSHOT_FIELDS
+        )
+
+        total_rows = 0
+        chunk_number = 0
+        while True:
+            queryset = base_queryset
+            if watermark:
+                watermark_at = parse_datetime(watermark["updated_at"])
+                queryset = queryset.filter(
+                    Q(updated_at__gt=watermark_at)
+                    | Q(updated_at=watermark_at, id__gt=watermark["id"])
+                )
+
+            rows = list(queryset[:chunk_size])
+            if not rows:
+                break
+
+            frame = pd.DataFrame.from_records(rows, columns=SNAPSHOT_FIELDS)
+            frame["created_at"] = pd.to_datetime(frame["created_at"], utc=True)
+            frame["updated_at"] = pd.to_datetime(frame["updated_at"], utc=True)
+            frame["created_date"] = frame["created_at"].dt.strftime("%Y-%m-%d")
+
+            for created_date, partition in frame.groupby("created_date", sort=True):
+                write_partition_file(
+                    output,
+                    manifest,
+                    created_date,
+                    partition.drop(columns=["created_date"]),
+                    f"part-{run_id}-{chunk_number:05d}.parquet",
+                )
+
+            last_row = rows[-1]
+            watermark = {
+                "updated_at": last_row["updated_at"].isoformat(),
+                "id": last_row["id"],
+            }
+            manifest["watermark"] = watermark
+            save_manifest(output, manifest)
+
+            total_rows += len(rows)
+            chunk_number += 1
+            logger.info(f"Snapshot chunk {chunk_number} written ({len(rows)} rows)")
+
+        manifest["runs"].append(
+            {
+                "run_id": run_id,
+                "finished_at": timezone.now().isoformat(),
+                "rows": total_rows,
+                "watermark": watermark,
+            }
+        )
+        save_manifest(output, manifest)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot {run_id} appended {total_rows} rows "
+                f"in {chunk_number} chunks to {output}"
+            )
+        )
+
+
+def load_manifest(output):
+    """Load the snapshot manifest, or start an empty one"""
+    path = os.path.join(output, MANIFEST_NAME)
+    if not os.path.exists(path):
+        manifest = {"version": 1, "watermark": None, "partitions": {}, "runs": []}
+    else:
+        with open(path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    manifest["read_rule"] = READ_RULE
+    return manifest
+
+
+def save_manifest(output, manifest):
+    """Atomically replace the manifest so readers never see a partial file"""
+    path = os.path.join(output, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write_partition_file(output, manifest, created_date, frame, file_name):
+    """Write one Parquet file into a Hive-style created_date=YYYY-MM-DD partition"""
+    partition_name = f"created_date={created_date}"
+    partition_dir = os.path.join(output, partition_name)
+    os.makedirs(partition_dir, exist_ok=True)
+
+    path = os.path.join(partition_dir, file_name)
+    tmp_path = f"{path}.tmp"
+    frame.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, path)
+
+    partition = manifest["partitions"].setdefault(
+        partition_name, {"date": created_date, "rows": 0, "files": []}
+    )
+    partition["rows"] += len(frame)
+    partition["files"].append(
+        {
+            "path": os.path.join(partition_name, file_name),
+            "rows": len(frame),
+            "min_id": int(frame["id"].min()),
+            "max_id": int(frame["id"].max()),
+            "min_updated_at": frame["updated_at"].min().isoformat(),
+            "max_updated_at": frame["updated_at"].max().isoformat(),
+            "written_at": timezone.now().isoformat(),
+        }
+    )
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0004_report_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier report of the same damage whose severity was reused', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='reports_app.report'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='image_phash',
+            field=models.BigIntegerField(blank=True, help_text='64-bit perceptual hash of the image, used to find near-duplicates', null=True),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
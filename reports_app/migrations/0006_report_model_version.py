@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0005_report_image_phash_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='model_version',
+            field=models.CharField(blank=True, default='', help_text='Model version that produced the severity (empty if none did)', max_length=64),
+        ),
+    ]
@@ -0,0 +1,102 @@
+from django.db import migrations
+
+# Copied, not imported, from reports_app.search so that later changes there
+# cannot alter what this migration does
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE reports_app_report_fts USING fts5(
+        name, description, address,
+        content='reports_app_report', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_insert
+    AFTER INSERT ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts (rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_delete
+    AFTER DELETE ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts
+            (reports_app_report_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_update
+    AFTER UPDATE OF name, description, address ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts
+            (reports_app_report_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+        INSERT INTO reports_app_report_fts (rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END
+    """,
+    # Index the reports that already exist
+    "INSERT INTO reports_app_report_fts (reports_app_report_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS reports_app_report_fts_update",
+    "DROP TRIGGER IF EXISTS reports_app_report_fts_delete",
+    "DROP TRIGGER IF EXISTS reports_app_report_fts_insert",
+    "DROP TABLE IF EXISTS reports_app_report_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE reports_app_report ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(address, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX reports_app_report_search_vector_idx
+    ON reports_app_report USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS reports_app_report_search_vector_idx",
+    "ALTER TABLE reports_app_report DROP COLUMN IF EXISTS search_vector",
+]
+
+STATEMENTS = {
+    "sqlite": (SQLITE_FORWARD, SQLITE_REVERSE),
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_REVERSE),
+}
+
+
+def run_statements(schema_editor, direction):
+    """Run the index DDL for this database; other backends search without one"""
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements:
+        for sql in statements[direction]:
+            schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0006_report_model_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
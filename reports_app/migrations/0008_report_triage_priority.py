@@ -0,0 +1,86 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:06
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# The priority formula and weights as they were when this migration was
+# written (see reports_app/priority.py); later changes to either must not
+# change what this migration does. Installations with other weights run
+# ``manage.py recompute_priorities`` afterwards.
+PRIORITY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+SEVERITY_POINTS = {0: 0, 1: 10, 2: 20, 3: 30}
+TYPE_POINTS = {'road_sink': 8, 'pothole': 5, 'crack': 2, 'other': 0}
+DUPLICATE_POINTS = 3
+DUPLICATE_CAP = 10
+AGE_HOURS_PER_POINT = 24
+BATCH_SIZE = 1000
+
+
+def priority_score(severity, report_type, duplicate_count, created_at):
+    hours = (created_at - PRIORITY_EPOCH).total_seconds() / 3600
+    return (
+        SEVERITY_POINTS.get(severity, 0)
+        + TYPE_POINTS.get(report_type, 0)
+        + min(duplicate_count, DUPLICATE_CAP) * DUPLICATE_POINTS
+        - hours / AGE_HOURS_PER_POINT
+    )
+
+
+def backfill_priority(apps, schema_editor):
+    Report = apps.get_model('reports_app', 'Report')
+    duplicate_counts = dict(
+        Report.objects.filter(duplicate_of__isnull=False)
+        .values('duplicate_of')
+        .annotate(count=Count('id'))
+        .values_list('duplicate_of', 'count')
+    )
+    batch = []
+    rows = Report.objects.order_by('pk').values_list(
+        'pk', 'severity', 'report_type', 'created_at'
+    )
+    for pk, severity, report_type, created_at in rows.iterator(chunk_size=BATCH_SIZE):
+        duplicate_count = duplicate_counts.get(pk, 0)
+        batch.append(
+            Report(
+                pk=pk,
+                duplicate_count=duplicate_count,
+                priority_score=priority_score(
+                    severity, report_type, duplicate_count, created_at
+                ),
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            Report.objects.bulk_update(batch, ['duplicate_count', 'priority_score'])
+            batch = []
+    if batch:
+        Report.objects.bulk_update(batch, ['duplicate_count', 'priority_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0007_report_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='duplicate_count',
+            field=models.PositiveIntegerField(default=0, help_text='Later reports linked to this one as duplicates'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='priority_score',
+            field=models.FloatField(default=0, help_text='Triage urgency, kept up to date on save (see reports_app/priority.py)'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'in_progress'])), fields=['-priority_score', '-id'], name='report_triage_idx'),
+        ),
+        migrations.RunPython(backfill_priority, migrations.RunPython.noop),
+    ]
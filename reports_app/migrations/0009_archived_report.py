@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:12
+
+import django.db.models.deletion
+import reports_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0008_report_triage_priority'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReport',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('image', models.ImageField(storage=reports_app.models.archive_storage, upload_to='reports/')),
+                ('description', models.TextField()),
+                ('name', models.TextField()),
+                ('address', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('rejected', 'Rejected')], max_length=20)),
+                ('severity', models.IntegerField(choices=[(0, 'No severity - Normal road'), (1, 'Low - Minor issue'), (2, 'Medium - Moderate damage'), (3, 'High - Major damage')])),
+                ('report_type', models.CharField(choices=[('pothole', 'Pothole'), ('crack', 'Crack'), ('road_sink', 'Road Sink'), ('other', 'Other')], max_length=50)),
+                ('model_version', models.CharField(blank=True, default='', max_length=64)),
+                ('image_phash', models.BigIntegerField(blank=True, null=True)),
+                ('duplicate_of', models.BigIntegerField(blank=True, help_text='Id of the original report, if a duplicate', null=True)),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_reports', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0009_archived_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='needs_retake',
+            field=models.BooleanField(default=False, help_text='The image failed the quality check and was not analysed'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='retake_reason',
+            field=models.CharField(blank=True, choices=[('too_small', 'Image too small'), ('too_dark', 'Too dark'), ('too_bright', 'Overexposed'), ('blurry', 'Blurry')], default='', max_length=20),
+        ),
+    ]
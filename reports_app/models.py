@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.core.files.storage import storages
 
 
 class Report(models.Model):
@@ -40,8 +42,111 @@ class Report(models.Model):
     report_type = models.CharField(
         max_length=50, choices=REPORT_TYPES, default="pothole"
     )
+    model_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        help_text="Model version that produced the severity (empty if none did)",
+    )
+    RETAKE_REASONS = [
+        ("too_small", "Image too small"),
+        ("too_dark", "Too dark"),
+        ("too_bright", "Overexposed"),
+        ("blurry", "Blurry"),
+    ]
+
+    needs_retake = models.BooleanField(
+        default=False,
+        help_text="The image failed the quality check and was not analysed",
+    )
+    retake_reason = models.CharField(
+        max_length=20, choices=RETAKE_REASONS, blank=True, default=""
+    )
+    image_phash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="64-bit perceptual hash of the image, used to find near-duplicates",
+    )
+    duplicate_of = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+        help_text="Earlier report of the same damage whose severity was reused",
+    )
+    duplicate_count = models.PositiveIntegerField(
+        default=0, help_text="Later reports linked to this one as duplicates"
+    )
+    priority_score = models.FloatField(
+        default=0,
+        help_text="Triage urgency, kept up to date on save (see reports_app/priority.py)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the triage queue
+            models.Index(
+                fields=["-priority_score", "-id"],
+                name="report_triage_idx",
+                condition=Q(status__in=["pending", "in_progress"]),
+            ),
+        ]
 
     def __str__(self):
         return f"Report ({self.report_type}) by {self.user.username} - {self.status}"
+
+    def save(self, *args, **kwargs):
+        from reports_app.priority import PRIORITY_INPUTS, priority_score
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & (
+            PRIORITY_INPUTS | {"priority_score"}
+        ):
+            self.priority_score = priority_score(
+                self.severity, self.report_type, self.duplicate_count, self.created_at
+            )
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "priority_score"}
+        super().save(*args, **kwargs)
+
+
+def archive_storage():
+    return storages["archive"]
+
+
+class ArchivedReport(models.Model):
+    """A closed report moved out of ``Report`` by reports_app/archive.py
+
+    It keeps the report's id, so lookups by id fall back to it. The archive
+    may be a separate database, so its relations carry no constraints.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="archived_reports",
+    )
+    image = models.ImageField(upload_to="reports/", storage=archive_storage)
+    description = models.TextField()
+    name = models.TextField()
+    address = models.TextField()
+    status = models.CharField(max_length=20, choices=Report.STATUS_CHOICES)
+    severity = models.IntegerField(choices=Report.SEVERITY_CHOICES)
+    report_type = models.CharField(max_length=50, choices=Report.REPORT_TYPES)
+    model_version = models.CharField(max_length=64, blank=True, default="")
+    image_phash = models.BigIntegerField(null=True, blank=True)
+    duplicate_of = models.BigIntegerField(
+        null=True, blank=True, help_text="Id of the original report, if a duplicate"
+    )
+    duplicate_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived report ({self.report_type}) {self.id} - {self.status}"
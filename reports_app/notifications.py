@@ -0,0 +1,251 @@
+"""
+Email digests of report changes.
+
+Whenever a report event is published (reports_app/events.py), the change is
+also queued for its owner in Redis: ``report id:kind`` on a list per user,
+and the user on a sorted set scored by the time of their oldest queued
+change. Nothing is sent right away.
+
+``send_digests`` (a Celery beat task) picks up the users whose oldest
+change is NOTIFICATION_DIGEST_WINDOW_SECONDS old and takes their queues in
+one transaction. Each user then gets one email covering all of their
+reports, showing each report's current state, so a report analysed and
+resolved in the same window appears once. All digests in a run go out over
+one SMTP connection. A bulk status change touching thousands of reports
+therefore costs one email per owner, not one email and one SMTP handshake
+per report.
+
+Digests that fail to send are queued again, due after a backoff that
+doubles with each failure. Failures are counted per user in ATTEMPTS_KEY;
+after NOTIFICATION_MAX_ATTEMPTS in a row the digest is moved to the
+DEAD_LETTER_KEY list instead, so an address that always fails does not
+cost an SMTP attempt on every run forever. A worker that dies mid-run loses
+the digests it had taken.
+"""
+
+import json
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from asphalt_aid.metrics import NOTIFICATION_EMAILS
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "notifications:pending:{user_id}"
+DUE_KEY = "notifications:due"
+# user id -> digests failed in a row
+ATTEMPTS_KEY = "notifications:attempts"
+# Newest first, capped at NOTIFICATION_DEAD_LETTER_SIZE
+DEAD_LETTER_KEY = "notifications:dead"
+
+
+def pending_key(user_id):
+    return PENDING_KEY.format(user_id=user_id)
+
+
+def notifies(report, kind):
+    if kind == "status":
+        return report.status in settings.NOTIFICATION_STATUSES
+    return kind == "severity"
+
+
+def queue_changes(reports, kind):
+    """Queue the owners' digests for these changes, after commit"""
+    if not settings.NOTIFICATIONS_ENABLED:
+        return
+    entries = [
+        (report.user_id, f"{report.id}:{kind}")
+        for report in reports
+        if notifies(report, kind)
+    ]
+    if not entries:
+        return
+
+    def push():
+        now = time.time()
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for user_id, entry in entries:
+                pipe.rpush(pending_key(user_id), entry)
+            pipe.zadd(DUE_KEY, {user_id: now for user_id, _ in entries}, nx=True)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"✗ Could not queue {len(entries)} {kind} notifications: {str(e)}")
+
+    transaction.on_commit(push)
+
+
+def take_due(redis, now, limit):
+    """Remove and return {user id: [entries]} for users whose window is over"""
+    user_ids = [
+        int(user_id)
+        for user_id in redis.zrangebyscore(
+            DUE_KEY, "-inf", now - settings.NOTIFICATION_DIGEST_WINDOW_SECONDS, 0, limit
+        )
+    ]
+    if not user_ids:
+        return {}
+    # Changes queued meanwhile are taken too; later ones start a new window
+    pipe = redis.pipeline(transaction=True)
+    for user_id in user_ids:
+        pipe.lrange(pending_key(user_id), 0, -1)
+        pipe.delete(pending_key(user_id))
+    pipe.zrem(DUE_KEY, *user_ids)
+    results = pipe.execute()
+    return {
+        user_id: [entry.decode() for entry in results[position * 2]]
+        for position, user_id in enumerate(user_ids)
+        if results[position * 2]
+    }
+
+
+def requeue(redis, pending, now):
+    """Put back digests that were not sent, with backoff; returns the dropped ones
+
+    A digest that has failed NOTIFICATION_MAX_ATTEMPTS times is dead-lettered
+    instead of queued again.
+    """
+    pipe = redis.pipeline(transaction=False)
+    for user_id in pending:
+        pipe.hincrby(ATTEMPTS_KEY, user_id, 1)
+    attempts = dict(zip(pending, pipe.execute()))
+
+    dropped = {}
+    pipe = redis.pipeline(transaction=False)
+    for user_id, entries in pending.items():
+        if attempts[user_id] >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            dropped[user_id] = entries
+            pipe.lpush(
+                DEAD_LETTER_KEY,
+                json.dumps(
+                    {
+                        "user_id": user_id,
+                        "entries": entries,
+                        "attempts": attempts[user_id],
+                        "failed_at": now,
+                    }
+                ),
+            )
+            pipe.hdel(ATTEMPTS_KEY, user_id)
+            continue
+        pipe.rpush(pending_key(user_id), *entries)
+        # take_due picks users whose score is a window old
+        backoff = settings.NOTIFICATION_RETRY_BACKOFF_SECONDS * 2 ** (attempts[user_id] - 1)
+        due = now - settings.NOTIFICATION_DIGEST_WINDOW_SECONDS + backoff
+        pipe.zadd(DUE_KEY, {user_id: due}, nx=True)
+    if dropped:
+        pipe.ltrim(DEAD_LETTER_KEY, 0, settings.NOTIFICATION_DEAD_LETTER_SIZE - 1)
+    pipe.execute()
+    return dropped
+
+
+def digest_message(user, reports, kinds):
+    """One EmailMessage listing the user's changed reports"""
+    lines = []
+    for report in reports:
+        changes = []
+        if report.needs_retake:
+            changes.append(
+                f"the photo could not be analysed ({report.get_retake_reason_display().lower()}), "
+                "please submit a clearer one"
+            )
+        elif "severity" in kinds[report.id]:
+            changes.append(f"severity {report.get_severity_display()}")
+        if "status" in kinds[report.id]:
+            changes.append(f"status {report.get_status_display()}")
+        lines.append(f"- {report.name} (#{report.id}): {', '.join(changes)}")
+
+    if len(reports) == 1:
+        subject = f"Update on your report: {reports[0].name}"
+    else:
+        subject = f"Updates on {len(reports)} of your reports"
+    body = (
+        f"Hello {user.username},\n\n"
+        "There are updates on your Asphalt Aid reports:\n\n"
+        + "\n".join(lines)
+        + "\n\nThank you for helping keep our roads safe.\n"
+    )
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def build_digests(pending):
+    """{user id: EmailMessage} for the queued entries, in two queries"""
+    from reports_app.models import Report
+
+    kinds = {}
+    for entries in pending.values():
+        for entry in entries:
+            report_id, _, kind = entry.partition(":")
+            kinds.setdefault(int(report_id), set()).add(kind)
+
+    users = get_user_model().objects.filter(id__in=pending, is_active=True).exclude(email="")
+    users = {user.id: user for user in users.only("id", "username", "email")}
+    # Archived or deleted reports drop out of the digest
+    reports = {}
+    for report in (
+        Report.objects.filter(id__in=kinds, user_id__in=users)
+        .only("id", "user_id", "name", "severity", "status", "needs_retake", "retake_reason")
+        .order_by("id")
+    ):
+        reports.setdefault(report.user_id, []).append(report)
+
+    return {
+        user_id: digest_message(users[user_id], user_reports, kinds)
+        for user_id, user_reports in reports.items()
+    }
+
+
+def send_digests(limit=None):
+    """Send every digest that is due; returns how many were sent"""
+    redis = get_redis_connection("default")
+    now = time.time()
+    pending = take_due(redis, now, limit or settings.NOTIFICATION_BATCH_SIZE)
+    if not pending:
+        return 0
+
+    emailed = set()
+    # Sent, or not worth retrying: no email address, no report left, refused
+    done = set()
+    try:
+        messages = build_digests(pending)
+        done.update(user_id for user_id in pending if user_id not in messages)
+        # One SMTP connection for the whole run
+        with get_connection() as connection:
+            for user_id, message in messages.items():
+                try:
+                    connection.send_messages([message])
+                    emailed.add(user_id)
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.warning(f"✗ Digest for user {user_id} refused: {str(e)}")
+                except Exception as e:
+                    logger.warning(f"✗ Could not email digest to user {user_id}: {str(e)}")
+                    continue
+                done.add(user_id)
+    except Exception as e:
+        logger.error(f"✗ Could not send notification digests: {str(e)}")
+
+    failed = {user_id: entries for user_id, entries in pending.items() if user_id not in done}
+    dropped = requeue(redis, failed, now) if failed else {}
+    if done:
+        redis.hdel(ATTEMPTS_KEY, *done)
+    NOTIFICATION_EMAILS.labels(result="sent").inc(len(emailed))
+    NOTIFICATION_EMAILS.labels(result="failed").inc(len(failed) - len(dropped))
+    NOTIFICATION_EMAILS.labels(result="dropped").inc(len(dropped))
+    if dropped:
+        logger.error(
+            f"✗ Gave up on notification digests for users {sorted(dropped)} after "
+            f"{settings.NOTIFICATION_MAX_ATTEMPTS} attempts"
+        )
+    logger.info(
+        f"✓ Sent {len(emailed)} notification digests, "
+        f"{len(failed) - len(dropped)} queued for retry"
+    )
+    return len(emailed)
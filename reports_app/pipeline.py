@@ -0,0 +1,270 @@
+"""
+Pipelined, batched AI analysis for Celery workers.
+
+With ANALYSIS_PIPELINE on, queued analyses go to ``analyze_report_batch``
+(reports_app/tasks.py), which receives up to ANALYSIS_BATCH_SIZE of them at
+once and hands their reports to ``analyze_batch``. The reports are cut into
+chunks of ANALYSIS_PREDICT_BATCH_SIZE, and each chunk goes through:
+
+- read: image bytes from storage, on ANALYSIS_IO_THREADS threads
+- decode: quality gate, perceptual hash, RGB decode and resizing to the
+  model inputs, on ANALYSIS_CPU_THREADS threads. Images that fail the gate
+  stop here and never reach the model
+- predict: one model call per chunk (per model, with the cascade)
+
+While one chunk is on the model, the next one is read and decoded (double
+buffering), so the model only waits when preprocessing is the slower side.
+Results are written with a single ``bulk_update`` per batch, and owners get
+one ``severity_batch`` event each.
+
+Each batch logs, and observes on asphalt_aid_analysis_pipeline_stage_seconds,
+the time spent per stage. read and decode are summed over their threads;
+"wait" is how long the model sat idle waiting for them. A large wait means
+preprocessing is the bottleneck (add threads); a small one means the model is.
+
+With AI_INFERENCE_DAEMON the model lives in the daemon. Images are still read
+and hashed ahead, then sent to the daemon one at a time. If the daemon cannot
+be reached, the chunk and every chunk after it are left unanalysed, and
+returned separately so the task can retry them.
+"""
+
+import io
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+from ai_service.phash import perceptual_hash, to_signed
+from ai_service.quality import check_quality
+from asphalt_aid.metrics import ANALYSIS_PIPELINE_STAGE
+from reports_app.analysis import (
+    ANALYSIS_FIELDS,
+    apply_classification,
+    count_duplicate,
+    flag_retake,
+    link_duplicate,
+)
+from reports_app.events import publish_report_batch
+from reports_app.priority import priority_score
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("read", "decode", "wait", "predict", "write")
+
+
+@lru_cache(maxsize=None)
+def executors():
+    """(I/O pool, CPU pool), created in the worker process that uses them"""
+    return (
+        ThreadPoolExecutor(
+            max_workers=settings.ANALYSIS_IO_THREADS, thread_name_prefix="analysis-io"
+        ),
+        ThreadPoolExecutor(
+            max_workers=settings.ANALYSIS_CPU_THREADS, thread_name_prefix="analysis-cpu"
+        ),
+    )
+
+
+class StageTimer:
+    """Seconds spent per stage; safe to add to from the pool threads"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def add(self, stage, started):
+        # float += is atomic enough under the GIL for these coarse totals
+        self.seconds[stage] += time.perf_counter() - started
+
+    def report(self, count, started):
+        for stage in STAGES:
+            ANALYSIS_PIPELINE_STAGE.labels(stage=stage).observe(self.seconds[stage])
+        total = time.perf_counter() - started
+        logger.info(
+            f"✓ Analysed {count} reports in {total * 1000:.0f}ms ("
+            + ", ".join(
+                f"{stage} {self.seconds[stage] * 1000:.0f}ms" for stage in STAGES
+            )
+            + ")"
+        )
+
+
+def read_image(report):
+    with report.image.open("rb") as image:
+        return image.read()
+
+
+def decode_image(data, models):
+    """Check, hash and preprocess image bytes for the given (loaded, stage1) models"""
+    from ai_service import pothole_classifier
+
+    prepared = {
+        "data": data,
+        "retake": check_quality(io.BytesIO(data)),
+        "phash": None,
+        "inputs": None,
+    }
+    if prepared["retake"] is not None:
+        return prepared
+    if settings.DUPLICATE_DETECTION_ENABLED:
+        prepared["phash"] = to_signed(perceptual_hash(io.BytesIO(data)))
+    if models is not None:
+        image = pothole_classifier.load_image(io.BytesIO(data))
+        if image is not None:
+            prepared["inputs"] = pothole_classifier.batch_inputs(image, *models)
+    return prepared
+
+
+def prepare(report, models, timer):
+    """Read on the I/O pool, then decode on the CPU pool; returns a Future"""
+    io_pool, cpu_pool = executors()
+    done = Future()
+
+    def decode(data):
+        started = time.perf_counter()
+        try:
+            done.set_result(decode_image(data, models))
+        except Exception as e:
+            done.set_exception(e)
+        finally:
+            timer.add("decode", started)
+
+    def read():
+        started = time.perf_counter()
+        try:
+            data = read_image(report)
+        except Exception as e:
+            done.set_exception(e)
+            return
+        finally:
+            timer.add("read", started)
+        cpu_pool.submit(decode, data)
+
+    io_pool.submit(read)
+    return done
+
+
+def local_models():
+    """(loaded, stage1) to preprocess for, or None when inference is remote"""
+    if settings.AI_INFERENCE_DAEMON:
+        return None
+    from ai_service.registry import registry
+
+    loaded = registry.current()
+    return None if loaded is None else (loaded, registry.stage1)
+
+
+def predict_chunk(reports, prepared, models):
+    """Classification results for the reports that are not duplicates"""
+    from ai_service.client import classify_batch, fallback_result
+
+    names = [os.path.basename(report.image.name) for report in reports]
+    if models is None:
+        # One batch request to the daemon; unreadable images keep the fallback
+        results = [fallback_result() for _ in prepared]
+        positions = [index for index, entry in enumerate(prepared) if entry is not None]
+        if positions:
+            answers = classify_batch([prepared[index]["data"] for index in positions])
+            for index, answer in zip(positions, answers):
+                results[index] = answer
+        return results
+
+    from ai_service import pothole_classifier
+
+    inputs = [entry and entry["inputs"] for entry in prepared]
+    return pothole_classifier.classify_batch(*models, inputs, names)
+
+
+def analyze_batch(reports):
+    """Analyse many reports at once and store the results
+
+    Returns (analysed reports, reports left for a retry because the inference
+    daemon was unavailable). Reports without an image are skipped.
+    """
+    from ai_service.client import InferenceUnavailable
+
+    started = time.perf_counter()
+    timer = StageTimer()
+    reports = [report for report in reports if report.image]
+    if not reports:
+        return [], []
+
+    # Versions stay fixed for the whole batch, even if new ones are swapped in
+    models = local_models()
+    size = settings.ANALYSIS_PREDICT_BATCH_SIZE
+    chunks = [reports[start : start + size] for start in range(0, len(reports), size)]
+    linked = []
+    unavailable = []
+
+    upcoming = [prepare(report, models, timer) for report in chunks[0]]
+    for position, chunk in enumerate(chunks):
+        current = upcoming
+        if position + 1 < len(chunks):
+            upcoming = [prepare(report, models, timer) for report in chunks[position + 1]]
+
+        waited = time.perf_counter()
+        prepared = []
+        for report, future in zip(chunk, current):
+            try:
+                prepared.append(future.result())
+            except Exception as e:
+                logger.error(f"✗ Could not preprocess image of report {report.id}: {str(e)}")
+                prepared.append(None)
+        timer.add("wait", waited)
+
+        to_classify = []
+        for report, entry in zip(chunk, prepared):
+            if entry is not None and flag_retake(report, entry["retake"]):
+                continue
+            previous_original_id = report.duplicate_of_id
+            original = link_duplicate(report, entry and entry["phash"]) if entry else None
+            if original is None:
+                to_classify.append((report, entry))
+            else:
+                linked.append((report, original, previous_original_id))
+
+        if to_classify and unavailable:
+            unavailable.extend(report for report, _ in to_classify)
+        elif to_classify:
+            predicted = time.perf_counter()
+            try:
+                results = predict_chunk(
+                    [report for report, _ in to_classify],
+                    [entry for _, entry in to_classify],
+                    models,
+                )
+            except InferenceUnavailable as e:
+                logger.warning(f"✗ Inference unavailable, leaving reports for a retry: {str(e)}")
+                unavailable.extend(report for report, _ in to_classify)
+                continue
+            for (report, _), result in zip(to_classify, results):
+                apply_classification(report, result)
+            timer.add("predict", predicted)
+
+    left = {report.id for report in unavailable}
+    analysed = [report for report in reports if report.id not in left]
+    written = time.perf_counter()
+    write_results(analysed, linked)
+    timer.add("write", written)
+    timer.report(len(analysed), started)
+    return analysed, unavailable
+
+
+def write_results(reports, linked):
+    """One UPDATE statement per batch, then duplicate counts and events"""
+    from reports_app.models import Report
+
+    now = timezone.now()
+    for report in reports:
+        report.updated_at = now
+        report.priority_score = priority_score(
+            report.severity, report.report_type, report.duplicate_count, report.created_at
+        )
+    Report.objects.bulk_update(reports, [*ANALYSIS_FIELDS, "priority_score"])
+    for report, original, previous_original_id in linked:
+        count_duplicate(report, original, previous_original_id)
+    publish_report_batch(reports, "severity")
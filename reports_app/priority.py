@@ -0,0 +1,109 @@
+"""
+Triage priority of open reports.
+
+A report's priority at time ``t`` is
+
+    severity points + report type points + duplicate points
+    + hours since creation / PRIORITY_AGE_HOURS_PER_POINT
+
+Every report ages at the same rate, so the order between two reports never
+changes with time alone. ``Report.priority_score`` therefore stores the
+priority minus the part that grows with time (measured from a fixed
+epoch). It only changes when severity, type or duplicate count do, and a
+plain index on it serves the triage queue. ``current_priority`` adds the
+time back for display.
+
+Changing the weights in settings needs ``manage.py recompute_priorities``.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+
+PRIORITY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# Fields the stored score depends on
+PRIORITY_INPUTS = {"severity", "report_type", "duplicate_count", "created_at"}
+OPEN_STATUSES = ("pending", "in_progress")
+# The condition of the partial triage index, as a literal: SQLite only uses
+# a partial index when the query spells out its condition, not as parameters
+OPEN_STATUS_SQL = "reports_app_report.status IN ({})".format(
+    ", ".join(f"'{status}'" for status in OPEN_STATUSES)
+)
+
+
+def age_points(moment):
+    hours = (moment - PRIORITY_EPOCH).total_seconds() / 3600
+    return hours / settings.PRIORITY_AGE_HOURS_PER_POINT
+
+
+def priority_score(severity, report_type, duplicate_count, created_at):
+    """Stored score; higher is more urgent, and older reports score higher"""
+    duplicates = min(duplicate_count, settings.PRIORITY_DUPLICATE_CAP)
+    return (
+        settings.PRIORITY_SEVERITY_POINTS.get(severity, 0)
+        + settings.PRIORITY_TYPE_POINTS.get(report_type, 0)
+        + duplicates * settings.PRIORITY_DUPLICATE_POINTS
+        - age_points(created_at or timezone.now())
+    )
+
+
+def current_priority(score, now=None):
+    """Priority points right now, age included"""
+    return score + age_points(now or timezone.now())
+
+
+def adjust_duplicate_count(report_id, delta):
+    """Count a duplicate linked to (or removed from) a report and rescore it"""
+    from reports_app.models import Report
+
+    Report.objects.filter(pk=report_id).update(
+        duplicate_count=F("duplicate_count") + delta
+    )
+    # Rescore from the row as it is now, so concurrent changes both count
+    report = Report.objects.filter(pk=report_id).first()
+    if report is not None:
+        report.save(update_fields=["priority_score"])
+
+
+def recompute_all(report_model, batch_size=1000):
+    """Recount duplicates and rescore every report; returns how many were written"""
+    duplicate_counts = dict(
+        report_model.objects.filter(duplicate_of__isnull=False)
+        .values("duplicate_of")
+        .annotate(count=Count("id"))
+        .values_list("duplicate_of", "count")
+    )
+    batch = []
+    updated = 0
+    rows = report_model.objects.order_by("pk").values_list(
+        "pk", "severity", "report_type", "created_at"
+    )
+    for pk, severity, report_type, created_at in rows.iterator(chunk_size=batch_size):
+        duplicate_count = duplicate_counts.get(pk, 0)
+        batch.append(
+            report_model(
+                pk=pk,
+                duplicate_count=duplicate_count,
+                priority_score=priority_score(
+                    severity, report_type, duplicate_count, created_at
+                ),
+            )
+        )
+        if len(batch) >= batch_size:
+            updated += report_model.objects.bulk_update(
+                batch, ["duplicate_count", "priority_score"]
+            )
+            batch = []
+    if batch:
+        updated += report_model.objects.bulk_update(
+            batch, ["duplicate_count", "priority_score"]
+        )
+    return updated
+
+
+def duplicate_deleted(sender, instance, **kwargs):
+    """post_delete: a deleted duplicate no longer raises its original's priority"""
+    if instance.duplicate_of_id:
+        adjust_duplicate_count(instance.duplicate_of_id, -1)
@@ -0,0 +1,302 @@
+"""
+Scheduling of AI analysis tasks.
+
+Each analysis goes to one of several Celery queues ("lanes"). Workers consume
+them in strict priority order (see CELERY_BROKER_TRANSPORT_OPTIONS):
+
+- ``high``: staff or municipal submitters, and reports whose text mentions a hazard
+- ``normal``: everything else
+- ``bulk``: a user's work beyond ANALYSIS_FAIR_SHARE reports in flight, so one
+  bulk uploader cannot starve other users
+- ``retry``: failed analyses, which run last
+
+While the total backlog is above ANALYSIS_BACKLOG_THRESHOLD, a user's
+over-share work is also delayed in proportion to how far over share they are.
+
+Delayed work (that, and retry backoff) waits in a Redis sorted set scored
+by its due time, not in the broker: with the Redis transport a countdown
+task is handed to a worker at once and held there unacknowledged, which
+defeats the prefetch limit and lane order, and gets it redelivered past
+the visibility timeout. ``release_deferred`` (a Celery beat task) moves due
+work into its lane. If the broker cannot be reached, work is held the same
+way until it can.
+"""
+
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django_redis import get_redis_connection
+from kombu.exceptions import OperationalError
+from redis.exceptions import RedisError
+
+from asphalt_aid.metrics import ANALYSIS_ENQUEUED, ANALYSIS_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+LANES = ("high", "normal", "bulk", "retry")
+
+INFLIGHT_KEY = "analysis:inflight:{user_id}"
+WAIT_STATS_KEY = "analysis:wait:{lane}"
+DEFERRED_KEY = "analysis:deferred"
+# Refreshed on every enqueue; bounds the damage of a lost decrement
+INFLIGHT_TTL = 3600
+
+# Raised by apply_async when the broker is unreachable
+BROKER_ERRORS = (OperationalError, RedisError, OSError)
+
+# Atomically take the entries that are due, so two beat runs never both send one
+TAKE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+HAZARD_PATTERN = re.compile(
+    r"\b(" + "|".join(map(re.escape, settings.ANALYSIS_HAZARD_KEYWORDS)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def queue_name(lane):
+    return f"analysis.{lane}"
+
+
+def redis_connection():
+    """Cache connection holding fair-share counters and wait statistics"""
+    return get_redis_connection("default")
+
+
+@lru_cache(maxsize=None)
+def broker_connection():
+    """Connection to the Celery broker database, where the lanes live"""
+    return redis.Redis.from_url(
+        settings.CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2
+    )
+
+
+def is_priority_submitter(user):
+    if user.is_staff:
+        return True
+    return user.groups.filter(name__in=settings.ANALYSIS_PRIORITY_GROUPS).exists()
+
+
+def mentions_hazard(report):
+    return bool(HAZARD_PATTERN.search(f"{report.name} {report.description}"))
+
+
+def choose_lane(report):
+    """Lane a fresh (non-retry) analysis belongs to, before fair-share limits"""
+    if is_priority_submitter(report.user) or mentions_hazard(report):
+        return "high"
+    return "normal"
+
+
+def enqueue_analysis(report):
+    """Queue AI analysis of a newly created report"""
+    lane = choose_lane(report)
+    inflight = increment_inflight(report.user_id)
+
+    countdown = 0
+    over_share = inflight - settings.ANALYSIS_FAIR_SHARE
+    if over_share > 0:
+        lane = "bulk"
+        if total_backlog() > settings.ANALYSIS_BACKLOG_THRESHOLD:
+            countdown = min(
+                settings.ANALYSIS_MAX_DEFER_SECONDS,
+                over_share * settings.ANALYSIS_BACKLOG_DEFER_SECONDS,
+            )
+
+    try:
+        send(report.id, report.user_id, lane, countdown=countdown)
+    except BROKER_ERRORS:
+        release(report.user_id)
+        raise
+    return lane
+
+
+def enqueue_retry(report_id, user_id, attempt):
+    """Queue another attempt of a failed analysis, with exponential backoff"""
+    increment_inflight(user_id)
+    countdown = min(
+        settings.ANALYSIS_MAX_DEFER_SECONDS,
+        settings.ANALYSIS_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1),
+    )
+    try:
+        send(report_id, user_id, "retry", countdown=countdown, attempt=attempt)
+    except BROKER_ERRORS:
+        release(user_id)
+        raise
+
+
+def send(report_id, user_id, lane, countdown=0, attempt=0):
+    """Queue an analysis on its lane, now or after ``countdown`` seconds
+
+    Raises one of BROKER_ERRORS if it could neither be queued nor held.
+    """
+    eligible_at = time.time() + countdown
+    if countdown:
+        try:
+            defer(report_id, user_id, lane, attempt, eligible_at)
+        except RedisError as e:
+            # Better early than lost
+            logger.warning(f"✗ Could not defer analysis of report {report_id}: {str(e)}")
+            publish(report_id, user_id, lane, attempt, time.time())
+    else:
+        try:
+            publish(report_id, user_id, lane, attempt, eligible_at)
+        except BROKER_ERRORS as e:
+            logger.warning(
+                f"✗ Broker unavailable, holding analysis of report {report_id}: {str(e)}"
+            )
+            defer(report_id, user_id, lane, attempt, eligible_at)
+    ANALYSIS_ENQUEUED.labels(lane=lane).inc()
+    logger.info(
+        f"Queued analysis of report {report_id} on lane {lane}"
+        + (f" (deferred {countdown}s)" if countdown else "")
+    )
+
+
+def publish(report_id, user_id, lane, attempt, eligible_at):
+    from reports_app.tasks import analyze_report_batch, analyze_report_image
+
+    task = analyze_report_batch if settings.ANALYSIS_PIPELINE else analyze_report_image
+    task.apply_async(
+        kwargs={
+            "report_id": report_id,
+            "user_id": user_id,
+            "lane": lane,
+            "attempt": attempt,
+            "eligible_at": eligible_at,
+        },
+        queue=queue_name(lane),
+    )
+
+
+def defer(report_id, user_id, lane, attempt, eligible_at):
+    """Hold an analysis in DEFERRED_KEY until ``eligible_at``"""
+    entry = json.dumps(
+        {
+            "report_id": report_id,
+            "user_id": user_id,
+            "lane": lane,
+            "attempt": attempt,
+            "eligible_at": eligible_at,
+        }
+    )
+    redis_connection().zadd(DEFERRED_KEY, {entry: eligible_at})
+
+
+def release_deferred(limit=None):
+    """Queue the held analyses that are due on their lanes; returns how many"""
+    limit = limit or settings.ANALYSIS_DEFER_RELEASE_BATCH
+    connection = redis_connection()
+    take_due = connection.register_script(TAKE_DUE_SCRIPT)
+    released = 0
+    while True:
+        try:
+            due = take_due(keys=[DEFERRED_KEY], args=[time.time(), limit])
+        except RedisError as e:
+            logger.warning(f"✗ Could not read deferred analyses: {str(e)}")
+            return released
+        for position, entry in enumerate(due):
+            job = json.loads(entry)
+            try:
+                publish(**job)
+            except BROKER_ERRORS as e:
+                logger.warning(f"✗ Broker unavailable, keeping deferred analyses: {str(e)}")
+                connection.zadd(
+                    DEFERRED_KEY,
+                    {held: json.loads(held)["eligible_at"] for held in due[position:]},
+                )
+                return released
+            released += 1
+        if len(due) < limit:
+            return released
+
+
+def increment_inflight(user_id):
+    """Count a queued analysis against the user's fair share"""
+    key = INFLIGHT_KEY.format(user_id=user_id)
+    try:
+        pipe = redis_connection().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, INFLIGHT_TTL)
+        return pipe.execute()[0]
+    except RedisError:
+        return 1
+
+
+def release(user_id):
+    """Called when an analysis finishes, successfully or not"""
+    if user_id is None:
+        return
+    key = INFLIGHT_KEY.format(user_id=user_id)
+    try:
+        if redis_connection().decr(key) <= 0:
+            redis_connection().delete(key)
+    except RedisError:
+        pass
+
+
+def record_started(lane, eligible_at):
+    """Record how long an analysis waited in its lane before a worker took it"""
+    if eligible_at is None:
+        return
+    wait = max(0.0, time.time() - eligible_at)
+    ANALYSIS_QUEUE_WAIT.labels(lane=lane).observe(wait)
+    try:
+        pipe = redis_connection().pipeline()
+        key = WAIT_STATS_KEY.format(lane=lane)
+        pipe.hincrby(key, "count", 1)
+        pipe.hincrbyfloat(key, "total_seconds", wait)
+        pipe.hset(key, "last_seconds", wait)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def total_backlog():
+    return sum(lane["depth"] for lane in lane_stats().values() if lane["depth"])
+
+
+def deferred_count():
+    try:
+        return redis_connection().zcard(DEFERRED_KEY)
+    except RedisError:
+        return None
+
+
+def lane_stats():
+    """Current depth and observed wait time of each lane"""
+    stats = {}
+    try:
+        connection = redis_connection()
+        broker = broker_connection()
+        for lane in LANES:
+            wait = connection.hgetall(WAIT_STATS_KEY.format(lane=lane))
+            count = int(wait.get(b"count", 0))
+            total = float(wait.get(b"total_seconds", 0))
+            stats[lane] = {
+                "queue": queue_name(lane),
+                "depth": broker.llen(queue_name(lane)),
+                "started": count,
+                "avg_wait_seconds": round(total / count, 3) if count else None,
+                "last_wait_seconds": (
+                    round(float(wait[b"last_seconds"]), 3)
+                    if b"last_seconds" in wait
+                    else None
+                ),
+            }
+    except RedisError as e:
+        logger.warning(f"Could not read analysis lane stats: {str(e)}")
+        stats = {
+            lane: {"queue": queue_name(lane), "depth": None} for lane in LANES
+        }
+    return stats
@@ -0,0 +1,196 @@
+"""
+Ranked full-text search over report name, description and address.
+
+The inverted index lives in the database (migration 0007):
+
+- SQLite: an FTS5 table, ``reports_app_report_fts``, with the report table
+  as external content. Triggers keep it in step with every insert, delete
+  and text update, including bulk ones. Django rebuilds SQLite tables for
+  some schema changes, which drops triggers; ``repair_sqlite_index`` puts
+  them back after every migrate.
+- Postgres: a stored ``search_vector`` tsvector column, generated from the
+  three fields (weighted name > description > address), with a GIN index.
+
+Queries are reduced to their words, which must all match; the last one
+also matches as a prefix, so results narrow while typing. Other database
+backends fall back to unranked ``icontains`` filters.
+
+``search_reports`` joins the index. ``search_condition`` gives a filter and
+a rank to combine with other lookups instead (the admin ORs in usernames).
+"""
+
+import logging
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "reports_app_report_fts"
+POSTGRES_SEARCH_CONFIG = "english"
+# bm25 weights for name, description, address
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+MAX_TERMS = 8
+
+WORD_RE = re.compile(r"\w+")
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_insert
+    AFTER INSERT ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts (rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_delete
+    AFTER DELETE ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts
+            (reports_app_report_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_app_report_fts_update
+    AFTER UPDATE OF name, description, address ON reports_app_report
+    BEGIN
+        INSERT INTO reports_app_report_fts
+            (reports_app_report_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+        INSERT INTO reports_app_report_fts (rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END
+    """,
+]
+
+
+def repair_sqlite_index(using="default", **kwargs):
+    """Recreate missing FTS triggers (post_migrate) and reindex if any were gone"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, count(*) FROM sqlite_master WHERE name LIKE %s GROUP BY type",
+            [f"{FTS_TABLE}%"],
+        )
+        found = dict(cursor.fetchall())
+        # Before migration 0007, or already intact
+        if not found.get("table") or found.get("trigger", 0) == len(SQLITE_TRIGGERS):
+            return
+        for sql in SQLITE_TRIGGERS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    logger.info("✓ Restored report search triggers and rebuilt the index")
+
+
+def search_terms(query):
+    return WORD_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def fts_match(terms):
+    # Quoted terms cannot be read as FTS5 operators
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def postgres_tsquery(terms):
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def search_condition(queryset, query):
+    """``(condition, rank)`` for reports matching ``query``
+
+    The condition is a Q object that can be combined with other lookups;
+    the rank is higher for better matches, and None (SQLite) or 0 for rows
+    that only matched those other lookups.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return Q(pk__in=[]), Value(None, output_field=FloatField())
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        match = fts_match(terms)
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        condition = Q(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        )
+        rank = RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE}.rowid = reports_app_report.id AND {FTS_TABLE} MATCH %s)",
+            [match],
+            output_field=FloatField(),
+        )
+    elif vendor == "postgresql":
+        tsquery = postgres_tsquery(terms)
+        condition = Q(
+            RawSQL(
+                "reports_app_report.search_vector @@ to_tsquery(%s, %s)",
+                [POSTGRES_SEARCH_CONFIG, tsquery],
+                output_field=BooleanField(),
+            )
+        )
+        rank = RawSQL(
+            "ts_rank_cd(reports_app_report.search_vector, to_tsquery(%s, %s))",
+            [POSTGRES_SEARCH_CONFIG, tsquery],
+            output_field=FloatField(),
+        )
+    else:
+        condition = contains_terms(terms)
+        rank = Value(0.0)
+    return condition, rank
+
+
+def contains_terms(terms):
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(name__icontains=term)
+            | Q(description__icontains=term)
+            | Q(address__icontains=term)
+        )
+    return condition
+
+
+def search_reports(queryset, query):
+    """Reports in ``queryset`` matching ``query``, best first
+
+    Each result has a ``search_rank`` (higher is better on every backend).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        match = fts_match(terms)
+        # bm25() is lower for better matches
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        queryset = queryset.extra(
+            select={"search_rank": f"-bm25({FTS_TABLE}, {weights})"},
+            tables=[FTS_TABLE],
+            where=[
+                f"{FTS_TABLE}.rowid = reports_app_report.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[match],
+        )
+    elif vendor == "postgresql":
+        tsquery = postgres_tsquery(terms)
+        queryset = queryset.extra(
+            select={
+                "search_rank": "ts_rank_cd(reports_app_report.search_vector, "
+                "to_tsquery(%s, %s))"
+            },
+            select_params=[POSTGRES_SEARCH_CONFIG, tsquery],
+            where=["reports_app_report.search_vector @@ to_tsquery(%s, %s)"],
+            params=[POSTGRES_SEARCH_CONFIG, tsquery],
+        )
+    else:
+        queryset = queryset.filter(contains_terms(terms)).extra(select={"search_rank": "0"})
+
+    return queryset.order_by("-search_rank", "-created_at")
@@ -1,5 +1,5 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from celery_batches import Batches
 from django.conf import settings
 import logging
 
@@ -7,28 +7,121 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task
-def analyze_report_image(report_id):
-    try:
-        from reports_app.models import Report
-        from ai_service.pothole_classifier import classifier
+def analyze_report_image(report_id, user_id=None, lane="normal", attempt=0, eligible_at=None):
+    from reports_app import scheduling
+    from reports_app.analysis import analyze_report
+    from reports_app.models import Report
 
+    scheduling.record_started(lane, eligible_at)
+    try:
         report = Report.objects.get(id=report_id)
 
         if report.image:
-            image_path = report.image.path
-            severity = classifier.predict_severity(image_path)
-
-            report.severity = severity
-            report.save(update_fields=["severity"])
-
-            logger.info(
-                f"Report {report_id} severity updated to {severity} based on AI analysis"
-            )
+            severity = analyze_report(report)
             return f"Report {report_id} analyzed successfully. Severity: {severity}"
         else:
             logger.warning(f"Report {report_id} has no image to analyze")
             return f"Report {report_id} has no image"
 
+    except Report.DoesNotExist:
+        logger.warning(f"Report {report_id} no longer exists")
+        return f"Report {report_id} not found"
+
     except Exception as e:
         logger.error(f"Error analyzing report {report_id}: {str(e)}")
+        if attempt < settings.ANALYSIS_MAX_RETRIES:
+            scheduling.enqueue_retry(report_id, user_id, attempt + 1)
         return f"Error analyzing report {report_id}: {str(e)}"
+
+    finally:
+        scheduling.release(user_id)
+
+
+@shared_task(
+    base=Batches,
+    flush_every=settings.ANALYSIS_BATCH_SIZE,
+    flush_interval=settings.ANALYSIS_BATCH_FLUSH_SECONDS,
+    acks_late=True,
+)
+def analyze_report_batch(requests):
+    """Pipelined analysis of many queued reports at once (ANALYSIS_PIPELINE)
+
+    Each request carries the same arguments as ``analyze_report_image``.
+    """
+    from reports_app import scheduling
+    from reports_app.models import Report
+    from reports_app.pipeline import analyze_batch
+
+    for request in requests:
+        scheduling.record_started(
+            request.kwargs.get("lane", "normal"), request.kwargs.get("eligible_at")
+        )
+    report_ids = {request.kwargs["report_id"] for request in requests}
+    try:
+        reports = list(Report.objects.filter(id__in=report_ids))
+        analysed, unavailable = analyze_batch(reports)
+        analysed = {report.id: report.severity for report in analysed}
+        unavailable = {report.id for report in unavailable}
+        messages = {
+            report_id: (
+                f"Report {report_id} analyzed successfully. Severity: {analysed[report_id]}"
+                if report_id in analysed
+                else f"Inference unavailable for report {report_id}, retrying"
+                if report_id in unavailable
+                else f"Report {report_id} not found or has no image"
+            )
+            for report_id in report_ids
+        }
+        retried = set()
+        for request in requests:
+            report_id = request.kwargs["report_id"]
+            attempt = request.kwargs.get("attempt", 0)
+            if report_id in unavailable and report_id not in retried:
+                retried.add(report_id)
+                if attempt < settings.ANALYSIS_MAX_RETRIES:
+                    scheduling.enqueue_retry(report_id, request.kwargs.get("user_id"), attempt + 1)
+    except Exception as e:
+        logger.error(f"Error analyzing batch of {len(report_ids)} reports: {str(e)}")
+        messages = {}
+        for request in requests:
+            attempt = request.kwargs.get("attempt", 0)
+            if attempt < settings.ANALYSIS_MAX_RETRIES:
+                scheduling.enqueue_retry(
+                    request.kwargs["report_id"], request.kwargs.get("user_id"), attempt + 1
+                )
+            messages[request.kwargs["report_id"]] = f"Error analyzing report: {str(e)}"
+    finally:
+        for request in requests:
+            scheduling.release(request.kwargs.get("user_id"))
+
+    for request in requests:
+        analyze_report_batch.backend.mark_as_done(
+            request.id, messages[request.kwargs["report_id"]], request=request
+        )
+
+
+@shared_task
+def release_deferred_analyses():
+    """Periodic: queue held analyses that are due on their lanes (CELERY_BEAT_SCHEDULE)"""
+    from reports_app.scheduling import release_deferred
+
+    released = release_deferred()
+    return f"Released {released} deferred analyses"
+
+
+@shared_task
+def archive_reports():
+    """Periodic: move long-closed reports to the archive (CELERY_BEAT_SCHEDULE)"""
+    from reports_app.archive import archive_reports as run_archive
+
+    moved = run_archive()
+    return f"Archived {moved} reports"
+
+
+@shared_task
+def send_notification_digests():
+    """Periodic: email owners the digests of their report changes (CELERY_BEAT_SCHEDULE)"""
+    from reports_app.notifications import send_digests
+
+    sent = send_digests()
+    return f"Sent {sent} notification digests"
@@ -1,3 +1,601 @@
-from django.test import TestCase
+import io
+import json
+import random
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.db import connection
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ai_service.phash import hamming_distance
+from reports_app import archive, idempotency, notifications, scheduling
+from reports_app.admin import ReportAdmin
+from reports_app.duplicates import MultiIndexHash
+from reports_app.idempotency import IdempotencyError, run_idempotent
+from reports_app.events import issue_ticket
+from reports_app.models import ArchivedReport, Report
+from reports_app.search import FTS_TABLE, repair_sqlite_index, search_reports
+from reports_app.transitions import transition_reports
+
+User = get_user_model()
+
+
+def make_report(user, **fields):
+    fields.setdefault("image", "reports/test.jpg")
+    fields.setdefault("name", "Pothole")
+    fields.setdefault("description", "Deep hole")
+    fields.setdefault("address", "Main St")
+    return Report.objects.create(user=user, **fields)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(
+            idempotency, "get_redis_connection", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = 0
+
+    def handler(self, status=201):
+        def run():
+            self.calls += 1
+            return status, {"report": {"id": self.calls}}
+
+        return run
+
+    def test_replays_the_stored_response(self):
+        first = run_idempotent(1, "key", "fingerprint", self.handler())
+        second = run_idempotent(1, "key", "fingerprint", self.handler())
+
+        self.assertEqual(first, (201, {"report": {"id": 1}}, False))
+        self.assertEqual(second, (201, {"report": {"id": 1}}, True))
+        self.assertEqual(self.calls, 1)
+
+    def test_keys_are_scoped_per_user(self):
+        run_idempotent(1, "key", "fingerprint", self.handler())
+        _, _, replayed = run_idempotent(2, "key", "fingerprint", self.handler())
+
+        self.assertFalse(replayed)
+        self.assertEqual(self.calls, 2)
+
+    def test_rejects_a_different_request_with_the_same_key(self):
+        run_idempotent(1, "key", "fingerprint", self.handler())
+
+        with self.assertRaises(IdempotencyError) as raised:
+            run_idempotent(1, "key", "other fingerprint", self.handler())
+        self.assertEqual(raised.exception.status, 422)
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_conflicts_while_the_first_request_is_in_flight(self):
+        state, _ = idempotency.claim(1, "key", "fingerprint")
+        self.assertEqual(state, idempotency.OWNER)
+
+        with self.assertRaises(IdempotencyError) as raised:
+            run_idempotent(1, "key", "fingerprint", self.handler())
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(self.calls, 0)
+
+        idempotency.finish(1, "key", "fingerprint", 201, {"report": {"id": 7}})
+        self.assertEqual(
+            run_idempotent(1, "key", "fingerprint", self.handler()),
+            (201, {"report": {"id": 7}}, True),
+        )
+
+    def test_server_errors_are_not_stored(self):
+        run_idempotent(1, "key", "fingerprint", self.handler(status=500))
+        status, _, replayed = run_idempotent(1, "key", "fingerprint", self.handler())
+
+        self.assertEqual((status, replayed), (201, False))
+        self.assertEqual(self.calls, 2)
+
+
+class MultiIndexHashTests(SimpleTestCase):
+    def test_search_matches_a_brute_force_scan(self):
+        rng = random.Random(0)
+        hashes = []
+        for _ in range(200):
+            base = rng.getrandbits(64)
+            hashes.append(base)
+            # Near neighbours at every distance around the search radii
+            for flips in range(1, 14):
+                variant = base
+                for position in rng.sample(range(64), flips):
+                    variant ^= 1 << position
+                hashes.append(variant)
+
+        index = MultiIndexHash()
+        for item, value in enumerate(hashes):
+            index.add(value, item)
+
+        for radius in (0, 3, 8, 10):
+            for query in rng.sample(hashes, 50):
+                expected = sorted(
+                    (hamming_distance(query, value), item)
+                    for item, value in enumerate(hashes)
+                    if hamming_distance(query, value) <= radius
+                )
+                self.assertEqual(index.search(query, radius), expected)
+
+
+class TriageQueueTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user("staff", password="password", is_staff=True)
+        self.client = APIClient()
+        token = Token.objects.create(user=staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        reporter = User.objects.create_user("reporter", password="password")
+        for position in range(23):
+            report = make_report(reporter, status="resolved" if position % 5 == 0 else "pending")
+            # Few distinct scores, so pages break inside runs of equal scores
+            Report.objects.filter(id=report.id).update(priority_score=position % 4)
+
+    def test_cursor_pages_follow_the_full_order(self):
+        expected = list(
+            Report.objects.exclude(status="resolved")
+            .order_by("-priority_score", "-id")
+            .values_list("id", flat=True)
+        )
+
+        seen = []
+        params = {"limit": 4}
+        while True:
+            response = self.client.get("/api/reports/triage/", params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(report["id"] for report in response.data["reports"])
+            if response.data["next_cursor"] is None:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        self.assertEqual(seen, expected)
+
+    def test_rejects_a_malformed_cursor(self):
+        response = self.client.get("/api/reports/triage/", {"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TransitionReportsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("reporter", password="password")
+        self.pending = make_report(user, status="pending")
+        self.in_progress = make_report(user, status="in_progress")
+        self.resolved = make_report(user, status="resolved")
+
+    def test_splits_changed_and_skipped(self):
+        missing = self.resolved.id + 100
+        changed, skipped = transition_reports(
+            [self.pending.id, self.resolved.id, missing, self.pending.id], "rejected"
+        )
+
+        self.assertEqual(changed, [self.pending.id])
+        self.assertEqual(skipped, [self.resolved.id, missing])
+        self.pending.refresh_from_db()
+        self.resolved.refresh_from_db()
+        self.assertEqual(self.pending.status, "rejected")
+        self.assertEqual(self.resolved.status, "resolved")
+
+    def test_from_status_limits_the_sources(self):
+        changed, skipped = transition_reports(
+            [self.pending.id, self.resolved.id], "in_progress", from_status="resolved"
+        )
+
+        self.assertEqual(changed, [self.resolved.id])
+        self.assertEqual(skipped, [self.pending.id])
+
+    def test_disallowed_target_skips_everything(self):
+        changed, skipped = transition_reports(
+            [self.pending.id, self.in_progress.id], "resolved", from_status="pending"
+        )
+
+        self.assertEqual(changed, [])
+        self.assertEqual(skipped, [self.pending.id, self.in_progress.id])
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reporter", password="password")
+
+    def found(self, query):
+        return list(search_reports(Report.objects.all(), query).values_list("id", flat=True))
+
+    def test_insert_update_and_delete_keep_the_index_in_step(self):
+        report = make_report(self.user, description="Crater near the bakery")
+        self.assertEqual(self.found("bakery"), [report.id])
+
+        report.description = "Crater near the library"
+        report.save()
+        self.assertEqual(self.found("bakery"), [])
+        self.assertEqual(self.found("library"), [report.id])
+
+        report.delete()
+        self.assertEqual(self.found("library"), [])
+
+    def test_bulk_update_and_delete_keep_the_index_in_step(self):
+        reports = [make_report(self.user) for _ in range(3)]
+        Report.objects.filter(id__in=[r.id for r in reports[:2]]).update(address="Elm Road")
+        self.assertEqual(sorted(self.found("elm road")), [r.id for r in reports[:2]])
+
+        Report.objects.filter(id=reports[0].id).delete()
+        self.assertEqual(self.found("elm road"), [reports[1].id])
+
+    def test_last_word_matches_as_a_prefix(self):
+        report = make_report(self.user, description="Deep pothole on the bridge")
+
+        self.assertEqual(self.found("bridge poth"), [report.id])
+        # Only the last word is a prefix
+        self.assertEqual(self.found("poth bridge"), [])
+
+    def test_name_matches_rank_above_address_matches(self):
+        in_address = make_report(self.user, address="Harbour Street")
+        in_name = make_report(self.user, name="Harbour crossing")
+
+        self.assertEqual(self.found("harbour"), [in_name.id, in_address.id])
+
+    def test_repair_restores_dropped_triggers_and_reindexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {FTS_TABLE}_insert")
+        report = make_report(self.user, description="Sinkhole by the school")
+        self.assertEqual(self.found("sinkhole"), [])
+
+        repair_sqlite_index()
+
+        self.assertEqual(self.found("sinkhole"), [report.id])
+        later = make_report(self.user, description="Another sinkhole")
+        self.assertEqual(sorted(self.found("sinkhole")), [report.id, later.id])
+
+    def test_search_endpoints(self):
+        match = make_report(self.user, description="Cracked kerb by the station")
+        make_report(self.user, description="Faded lane markings")
+        other = User.objects.create_user("other", password="password")
+        make_report(other, description="Cracked kerb by the station")
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        for url in ("/api/reports/reports/", "/api/reports/async/reports/"):
+            response = client.get(url, {"q": "station kerb"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([r["id"] for r in response.json()["reports"]], [match.id])
+
+
+class ReportAdminSearchTests(TestCase):
+    def test_matches_text_or_part_of_a_username(self):
+        alice = User.objects.create_user("alice_smith", password="password")
+        bob = User.objects.create_user("bob", password="password")
+        by_text = make_report(bob, description="Pothole outside Smithfield market")
+        by_username = make_report(alice)
+        make_report(bob)
+
+        admin = ReportAdmin(Report, None)
+        request = RequestFactory().get("/admin/reports_app/report/", {"q": "smith"})
+        results, _ = admin.get_search_results(request, Report.objects.all(), "smith")
+
+        # Text matches rank before username-only matches
+        self.assertEqual([r.id for r in results], [by_text.id, by_username.id])
+
+
+class ArchiveTests(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        hot, cold = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(hot.cleanup)
+        self.addCleanup(cold.cleanup)
+        storage = "django.core.files.storage.FileSystemStorage"
+        overrides = override_settings(
+            STORAGES={
+                "default": {"BACKEND": storage, "OPTIONS": {"location": hot.name}},
+                "archive": {"BACKEND": storage, "OPTIONS": {"location": cold.name}},
+                "staticfiles": {
+                    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+                },
+            }
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user("reporter", password="password")
+
+    def closed_report(self, **fields):
+        image = default_storage.save("reports/hole.jpg", ContentFile(b"jpeg"))
+        report = make_report(self.user, status="resolved", image=image, **fields)
+        Report.objects.filter(id=report.id).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+        report.refresh_from_db()
+        return report
+
+    def test_moves_closed_reports_and_their_images(self):
+        closed = self.closed_report(description="Filled last spring")
+        still_open = make_report(self.user, status="pending")
+
+        self.assertEqual(archive.archive_reports(older_than_days=30), 1)
+
+        self.assertEqual(list(Report.objects.values_list("id", flat=True)), [still_open.id])
+        archived = ArchivedReport.objects.get(id=closed.id)
+        self.assertEqual(archived.description, "Filled last spring")
+        self.assertEqual(archived.updated_at, closed.updated_at)
+        self.assertTrue(storages["archive"].exists(closed.image.name))
+        self.assertFalse(default_storage.exists(closed.image.name))
+
+    def test_overwrites_a_stale_row_from_an_earlier_run(self):
+        report = self.closed_report(description="Edited after the first copy")
+        ArchivedReport.objects.create(
+            **{field: getattr(report, field) for field in archive.COPIED_FIELDS},
+            image=report.image.name,
+        )
+        ArchivedReport.objects.filter(id=report.id).update(description="First copy")
+
+        archive.archive_reports(older_than_days=30)
+
+        self.assertEqual(
+            ArchivedReport.objects.get(id=report.id).description, "Edited after the first copy"
+        )
+
+    def test_report_reopened_during_the_copy_stays_hot(self):
+        report = self.closed_report()
+        copy_image = archive.copy_image
+
+        def copy_then_reopen(copied):
+            name = copy_image(copied)
+            Report.objects.filter(id=copied.id).update(status="pending")
+            return name
+
+        with mock.patch.object(archive, "copy_image", side_effect=copy_then_reopen):
+            self.assertEqual(archive.archive_reports(older_than_days=30), 0)
+
+        self.assertTrue(Report.objects.filter(id=report.id, status="pending").exists())
+        self.assertFalse(ArchivedReport.objects.filter(id=report.id).exists())
+        self.assertTrue(default_storage.exists(report.image.name))
+        self.assertFalse(storages["archive"].exists(report.image.name))
+
+    def test_archived_reports_are_still_readable(self):
+        report = self.closed_report()
+        archive.archive_reports(older_than_days=30)
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        response = client.get(f"/api/reports/reports/{report.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["report"]["id"], report.id)
+
+        response = client.get("/api/reports/reports/", {"include_archived": "1"})
+        self.assertEqual([r["id"] for r in response.data["reports"]], [report.id])
+        self.assertEqual(client.get("/api/reports/reports/").data["reports"], [])
+
+        other = User.objects.create_user("other", password="password")
+        self.assertIsNone(archive.get_archived_report(other, report.id))
+
+
+class DeferredAnalysisTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for target, value in (
+            ("redis_connection", mock.Mock(return_value=self.redis)),
+            ("publish", mock.Mock()),
+        ):
+            patcher = mock.patch.object(scheduling, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(scheduling.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_deferred_work_waits_in_redis_until_due(self):
+        scheduling.send(1, 7, "bulk", countdown=30)
+        scheduling.send(2, 7, "normal")
+
+        scheduling.publish.assert_called_once_with(2, 7, "normal", 0, self.now)
+        self.assertEqual(scheduling.release_deferred(), 0)
+
+        self.now += 30
+        self.assertEqual(scheduling.release_deferred(), 1)
+        scheduling.publish.assert_called_with(
+            report_id=1, user_id=7, lane="bulk", attempt=0, eligible_at=self.now
+        )
+        self.assertEqual(self.redis.zcard(scheduling.DEFERRED_KEY), 0)
+
+    def test_held_work_survives_a_broker_outage(self):
+        for report_id in (1, 2, 3):
+            scheduling.send(report_id, 7, "retry", countdown=10, attempt=1)
+        self.now += 10
+        scheduling.publish.side_effect = [None, OperationalError("broker down")]
+
+        self.assertEqual(scheduling.release_deferred(), 1)
+        self.assertEqual(self.redis.zcard(scheduling.DEFERRED_KEY), 2)
+
+        scheduling.publish.side_effect = None
+        self.assertEqual(scheduling.release_deferred(), 2)
+
+    def test_work_is_held_while_the_broker_is_down(self):
+        scheduling.publish.side_effect = OperationalError("broker down")
+        scheduling.send(1, 7, "normal")
+
+        self.assertEqual(self.redis.zcard(scheduling.DEFERRED_KEY), 1)
+
+
+@override_settings(REPORT_ANALYSIS_ASYNC=True)
+class BrokerOutageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        user = User.objects.create_user("reporter", password="password")
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_report_is_created_with_its_analysis_pending(self):
+        server = fakeredis.FakeServer()
+        server.connected = False
+        image = io.BytesIO()
+        Image.new("RGB", (32, 32)).save(image, "JPEG")
+        with mock.patch.object(
+            scheduling, "redis_connection", return_value=fakeredis.FakeRedis(server=server)
+        ), mock.patch.object(
+            scheduling, "publish", side_effect=OperationalError("broker down")
+        ):
+            response = self.client.post(
+                "/api/reports/reports/",
+                {
+                    "name": "Pothole",
+                    "description": "Deep hole",
+                    "address": "Main St",
+                    "report_type": "pothole",
+                    "image": SimpleUploadedFile("hole.jpg", image.getvalue()),
+                },
+                format="multipart",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("analysis pending", response.data["detail"])
+        self.assertTrue(Report.objects.filter(id=response.data["report"]["id"]).exists())
+
+
+@override_settings(REPORT_EVENTS_POLL_SECONDS=0)
+class EventTicketTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("reporter", password="password")
+        self.token = Token.objects.create(user=self.user)
+
+    async def poll(self, **params):
+        return await AsyncClient().get("/api/reports/events/", {"poll": "1", **params})
+
+    def test_ticket_needs_the_api_token(self):
+        client = APIClient()
+        self.assertEqual(client.post("/api/reports/events/ticket/").status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        response = client.post("/api/reports/events/ticket/")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data["ticket"])
+
+    async def test_ticket_opens_the_stream(self):
+        ticket = await sync_to_async(issue_ticket)(self.user)
+        response = await self.poll(ticket=ticket)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_rejects_tampered_and_expired_tickets(self):
+        ticket = await sync_to_async(issue_ticket)(self.user)
+        other = await User.objects.acreate(username="other")
+        forged = f"{other.id}:{ticket.partition(':')[2]}"
+        self.assertEqual((await self.poll(ticket=forged)).status_code, 401)
+
+        later = time.time() + 61
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            self.assertEqual((await self.poll(ticket=ticket)).status_code, 401)
+
+    async def test_api_token_is_not_accepted_in_the_url(self):
+        self.assertEqual((await self.poll(token=self.token.key)).status_code, 401)
+
+
+@override_settings(
+    NOTIFICATIONS_ENABLED=True,
+    NOTIFICATION_DIGEST_WINDOW_SECONDS=0,
+    NOTIFICATION_RETRY_BACKOFF_SECONDS=0,
+    NOTIFICATION_MAX_ATTEMPTS=3,
+)
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(
+            notifications, "get_redis_connection", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections = mock.Mock(side_effect=notifications.get_connection)
+        patcher = mock.patch.object(notifications, "get_connection", self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = User.objects.create_user("alice", "alice@example.com", "password")
+        self.bob = User.objects.create_user("bob", "bob@example.com", "password")
+
+    def queue(self, reports, kind):
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications.queue_changes(reports, kind)
+
+    def sample(self, result):
+        return REGISTRY.get_sample_value(
+            "asphalt_aid_notification_emails_total", {"result": result}
+        ) or 0
+
+    def test_changes_coalesce_into_one_email_per_user(self):
+        first = make_report(self.alice, name="Hole on Main St", status="resolved")
+        second = make_report(self.alice, name="Crack on Elm St", status="in_progress")
+        other = make_report(self.bob, name="Hole on Oak St", status="rejected")
+        self.queue([first, second], "severity")
+        self.queue([first, second, other], "status")
+
+        self.assertEqual(notifications.send_digests(), 2)
+
+        self.connections.assert_called_once()
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ["alice@example.com"])
+        self.assertEqual(digest.subject, "Updates on 2 of your reports")
+        self.assertEqual(digest.body.count("Hole on Main St"), 1)
+        self.assertEqual(digest.body.count("Crack on Elm St"), 1)
+        self.assertEqual(notifications.send_digests(), 0)
+
+    def test_persistent_failure_is_dead_lettered(self):
+        report = make_report(self.alice, status="resolved")
+        self.queue([report], "status")
+        dropped = self.sample("dropped")
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("mailbox unavailable"),
+        ):
+            for _ in range(3):
+                self.assertEqual(notifications.send_digests(), 0)
+
+        self.assertEqual(self.redis.zcard(notifications.DUE_KEY), 0)
+        self.assertFalse(self.redis.exists(notifications.pending_key(self.alice.id)))
+        self.assertFalse(self.redis.hexists(notifications.ATTEMPTS_KEY, self.alice.id))
+        letter = json.loads(self.redis.lindex(notifications.DEAD_LETTER_KEY, 0))
+        self.assertEqual(letter["user_id"], self.alice.id)
+        self.assertEqual(letter["entries"], [f"{report.id}:status"])
+        self.assertEqual(letter["attempts"], 3)
+        self.assertEqual(self.sample("dropped"), dropped + 1)
+        self.assertEqual(notifications.send_digests(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_success_resets_the_attempts(self):
+        report = make_report(self.alice, status="resolved")
+        self.queue([report], "status")
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("mailbox unavailable"),
+        ):
+            notifications.send_digests()
+        self.assertEqual(int(self.redis.hget(notifications.ATTEMPTS_KEY, self.alice.id)), 1)
+
+        self.assertEqual(notifications.send_digests(), 1)
+
+        self.assertFalse(self.redis.hexists(notifications.ATTEMPTS_KEY, self.alice.id))
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,73 @@
+"""
+Status changes applied to many reports at once.
+
+Staff name a target status, optionally the only status to move from, and a
+list of report ids. Reports whose current status allows the move (see
+REPORT_STATUS_TRANSITIONS) are locked and changed with one UPDATE; the rest
+are skipped. Owners get one ``status_batch`` event each instead of one event
+per report.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from reports_app.events import publish_report_batch
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ("id", "user_id", "severity", "status", "needs_retake", "updated_at")
+
+
+def source_statuses(to_status, from_status=None):
+    """Statuses a report may be moved to ``to_status`` from"""
+    sources = [
+        status
+        for status, targets in settings.REPORT_STATUS_TRANSITIONS.items()
+        if to_status in targets
+    ]
+    if from_status is not None:
+        return [from_status] if from_status in sources else []
+    return sources
+
+
+def transition_reports(report_ids, to_status, from_status=None):
+    """Move the given reports to ``to_status``; returns (changed ids, skipped ids)
+
+    Skipped ids are missing reports and reports whose status does not allow
+    the transition.
+    """
+    from reports_app.models import Report
+
+    report_ids = list(dict.fromkeys(report_ids))
+    sources = source_statuses(to_status, from_status)
+    if not sources:
+        return [], report_ids
+
+    with transaction.atomic():
+        # Lock first, so the UPDATE changes exactly the reports reported back
+        reports = list(
+            Report.objects.select_for_update()
+            .filter(id__in=report_ids, status__in=sources)
+            .only(*EVENT_FIELDS)
+            .order_by("id")
+        )
+        changed = [report.id for report in reports]
+        if changed:
+            now = timezone.now()
+            Report.objects.filter(id__in=changed, status__in=sources).update(
+                status=to_status, updated_at=now
+            )
+            for report in reports:
+                report.status = to_status
+                report.updated_at = now
+            publish_report_batch(reports, "status")
+
+    changed_set = set(changed)
+    skipped = [report_id for report_id in report_ids if report_id not in changed_set]
+    logger.info(
+        f"✓ Moved {len(changed)} reports to {to_status}, skipped {len(skipped)}"
+    )
+    return changed, skipped